@@ -1,7 +1,25 @@
+from sleeperbot import (
+    metrics,
+    snapshot,
+    warm,
+)
 from sleeperbot.manager import manage
+from sleeperbot.utils import setup_logging
+
+# runs once per container during the lambda init phase
+snapshot.warm_start()
 
 
 def handler(event, context):
+    # a second schedule (sleeperbot schedule --warm) invokes with {"action": "warm"}
+    if isinstance(event, dict) and event.get("action") == "warm":
+        setup_logging()
+
+        try:
+            return f"Warmed cache. Output: {warm.warm()}"
+        finally:
+            metrics.flush()
+
     result = manage()
 
     return f"Ran manager. Output: {result}"
@@ -0,0 +1,376 @@
+import hashlib
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+
+from sleeperbot.cache import RedisCache
+
+BENCHMARKS: dict[str, Callable[[], dict]] = {}
+
+# cumulative import time allowed for the lambda startup path
+IMPORT_BUDGET_MS = 250
+
+# modules the lambda startup path must not import - they are only needed once a
+# request actually misses the cache
+DEFERRED_MODULES = ("requests", "urllib3", "redis")
+
+
+def benchmark(name: str):
+    def outer(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return outer
+
+
+def _import_times(module: str) -> dict[str, int]:
+    """Cumulative import time in microseconds for every module imported by module"""
+    env = {"SLEEPER_TOKEN": "benchmark", "SLEEPER_LEAGUE_ID": "benchmark", **os.environ}
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        check=True,
+        env=env,
+        text=True,
+    )
+
+    times = {}
+
+    # lines look like "import time:       123 |        456 |   package.module"
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+
+    return times
+
+
+def _measure(func: Callable[[], object], setup: Callable[[], object] = lambda: None) -> dict:
+    """Seconds for a single untraced call and peak MB allocated during a second traced call"""
+    setup()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+
+    # tracing slows everything down so memory is measured on its own run
+    setup()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"seconds": round(elapsed, 4), "peak_mb": round(peak / 2**20, 2)}
+
+
+@benchmark("cache-round-trips")
+def cache_round_trips() -> dict:
+    """Redis round trips for a warm League load with and without prefetching"""
+    from sleeperbot import utils
+    from sleeperbot.league import (
+        League,
+        memoized_calls,
+    )
+
+    cache = utils.get_cache()
+
+    if not isinstance(cache, RedisCache):
+        raise RuntimeError("cache-round-trips benchmark requires REDIS_HOST to be configured")
+
+    League()  # make sure every key is cached
+
+    start = cache.round_trips
+    league = League()
+    prefetched = cache.round_trips - start
+
+    # replay the same memoized calls without prefetching them first
+    start = cache.round_trips
+    for func, args, kwargs in memoized_calls() + memoized_calls(league.settings):
+        func(*args, **kwargs)
+    unbatched = cache.round_trips - start
+
+    return {
+        "memoized_calls": len(memoized_calls() + memoized_calls(league.settings)),
+        "round_trips_prefetched": prefetched,
+        "round_trips_unbatched": unbatched,
+    }
+
+
+@benchmark("memoize-keys")
+def memoize_keys(iterations: int = 10000) -> dict:
+    """Cost per call of deriving the memoize key for ktc.get_players(dynasty, settings)"""
+    from sleeperbot.clients import ktc
+    from sleeperbot.models import (
+        LeagueSettings,
+        serialize,
+    )
+
+    def settings() -> LeagueSettings:
+        return LeagueSettings(
+            guid="benchmark",
+            name="benchmark",
+            status="in_season",
+            week=1,
+            season=2023,
+            total_teams=12,
+            roster_positions=["QB", "RB", "RB", "WR", "WR", "TE", "FLEX", "SUPER_FLEX"] + ["BN"] * 15,
+            taxi_slots=3,
+            reserve_slots=3,
+            ppr=1.0,
+            te_ppr=1.5,
+        )
+
+    def legacy_key(args, kwargs):
+        # how keys were derived before models provided their own cache key
+        unsecure_hash = hashlib.new("md5", usedforsecurity=False)
+        unsecure_hash.update(serialize([args, kwargs], sort_keys=True).encode())
+        return unsecure_hash.hexdigest()
+
+    league_settings = settings()
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        legacy_key((), {"dynasty": True, "settings": league_settings})
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        ktc.get_players.cache_key(dynasty=True, settings=league_settings)
+    cached = time.perf_counter() - start
+
+    # a fresh settings instance per call pays for hashing the model every time
+    instances = [settings() for _ in range(iterations)]
+    start = time.perf_counter()
+    for instance in instances:
+        ktc.get_players.cache_key(dynasty=True, settings=instance)
+    uncached = time.perf_counter() - start
+
+    return {
+        "legacy_us_per_call": legacy / iterations * 1e6,
+        "us_per_call": cached / iterations * 1e6,
+        "us_per_call_new_instance": uncached / iterations * 1e6,
+    }
+
+
+@benchmark("season-simulation")
+def season_simulation(teams: int = 12, weeks: int = 10, seasons: int = 20000) -> dict:
+    """Simulated seasons per second for a synthetic league"""
+    import random
+
+    from sleeperbot.simulation import simulate
+
+    rng = random.Random(0)
+    rosters = [str(idx) for idx in range(teams)]
+
+    schedule = []
+    for _ in range(weeks):
+        shuffled = rng.sample(rosters, len(rosters))
+        schedule += list(zip(shuffled[::2], shuffled[1::2]))
+
+    start = time.perf_counter()
+    simulate(
+        records={guid: (rng.randint(0, 4), rng.uniform(500, 700)) for guid in rosters},
+        schedule=schedule,
+        strength={guid: (mean, mean * 0.25) for guid in rosters for mean in [rng.uniform(3, 6)]},
+        playoff_teams=6,
+        seasons=seasons,
+        seed=0,
+    )
+    elapsed = time.perf_counter() - start
+
+    return {"seasons": seasons, "seconds": elapsed, "seasons_per_second": seasons / elapsed}
+
+
+@benchmark("import-time")
+def import_time() -> dict:
+    """Import cost of everything the lambda handler imports before the first request"""
+    times = _import_times("sleeperbot.manager")
+
+    total_ms = times["sleeperbot.manager"] / 1000
+    slowest = sorted(times.items(), key=lambda item: item[1], reverse=True)[1:11]
+
+    return {
+        "total_ms": total_ms,
+        "budget_ms": IMPORT_BUDGET_MS,
+        "eager_imports": [module for module in DEFERRED_MODULES if module in times],
+        "slowest_ms": {name: cumulative / 1000 for name, cumulative in slowest},
+        "passed": total_ms <= IMPORT_BUDGET_MS and not any(module in times for module in DEFERRED_MODULES),
+    }
+
+
+@benchmark("league-scale")
+def league_scale(league_counts: tuple[int, ...] = (1, 10, 100), teams: int = 12) -> dict:
+    """Time and peak memory to build and optimize every league as the number of synthetic leagues grows"""
+    from sleeperbot import (
+        config,
+        synthetic,
+        utils,
+    )
+    from sleeperbot.league import League
+
+    results = {}
+
+    for count in league_counts:
+        backend = synthetic.generate(synthetic.Scale(leagues=count, teams=teams))
+
+        def run():
+            for league_id in backend.league_ids:
+                config.SLEEPER_LEAGUE_ID = league_id
+                League().optimize_all_rosters()
+
+        with synthetic.serve(backend) as adapter:
+            cold = _measure(run, setup=utils.get_cache().flush)
+            requests = adapter.requests // 2  # cold runs are measured twice
+            warm = _measure(run)
+
+        results[f"leagues={count}"] = {
+            "cold": cold,
+            "warm": warm,
+            "cold_seconds_per_league": round(cold["seconds"] / count, 4),
+            "warm_seconds_per_league": round(warm["seconds"] / count, 4),
+            "requests": requests,
+        }
+
+    return results
+
+
+@benchmark("roster-scale")
+def roster_scale(sizes: tuple[tuple[int, int], ...] = ((10, 10), (12, 15), (16, 20), (32, 25))) -> dict:
+    """Per step time and peak memory for a single synthetic league at (teams, bench) sizes"""
+    from sleeperbot import (
+        synthetic,
+        utils,
+    )
+    from sleeperbot.league import League
+    from sleeperbot.models import (
+        deserialize,
+        serialize,
+    )
+
+    results = {}
+
+    for teams, bench in sizes:
+        backend = synthetic.generate(synthetic.Scale(teams=teams, bench=bench))
+
+        with synthetic.serve(backend):
+            league = League()
+            blob = league.to_snapshot()
+            players = list(league.players.values())
+            raw = serialize(players)
+
+            results[f"teams={teams} bench={bench}"] = {
+                "players": len({player.guid for player in players}),
+                "snapshot_kb": round(len(blob) / 1024, 1),
+                "build_cold": _measure(League, setup=utils.get_cache().flush),
+                "build_warm": _measure(League),
+                "optimize_all_rosters": _measure(league.optimize_all_rosters),
+                "serialize_players": _measure(lambda: serialize(players)),
+                "deserialize_players": _measure(lambda: deserialize(raw)),
+                "snapshot_round_trip": _measure(lambda: League.from_snapshot(league.to_snapshot())),
+            }
+
+    return results
+
+
+@benchmark("player-map-subset")
+def player_map_subset(teams: int = 12) -> dict:
+    """Reading only the rostered players from the keyed player map against decoding all of it"""
+    from sleeperbot import (
+        synthetic,
+        utils,
+    )
+    from sleeperbot.clients import sleeper
+
+    backend = synthetic.generate(synthetic.Scale(teams=teams))
+
+    with synthetic.serve(backend):
+        player_ids = [player_id for roster in sleeper.get_rosters() for player_id in roster.player_ids]
+
+        cache = utils.get_cache()
+        key = sleeper.get_player_map.cache_key()
+
+        if cache.stores_objects:
+            raise RuntimeError("player-map-subset benchmark measures serialized entries - unset CACHE_STORE_OBJECTS")
+
+        sleeper.get_player_map()  # make sure the map is cached
+
+        everything = dict(cache.hscan(key))
+        rostered = [value for value in cache.hmget(key, player_ids) if value is not None]
+
+        return {
+            "players": len(everything),
+            "rostered": len(rostered),
+            "kb_all": round(sum(len(value) for value in everything.values()) / 1024, 1),
+            "kb_rostered": round(sum(len(value) for value in rostered) / 1024, 1),
+            "all": _measure(sleeper.get_player_map),
+            "rostered_only": _measure(lambda: sleeper.get_player_map.get_many(player_ids)),
+        }
+
+
+_bench_state = None
+
+
+def _hold(state):
+    global _bench_state
+    _bench_state = state
+
+
+def _attach_table(name: str):
+    from sleeperbot.player_table import PlayerTable
+
+    _hold(PlayerTable.attach(name))
+
+
+def _worker_rss(_) -> int:
+    time.sleep(0.05)  # keep each worker busy long enough that every worker gets a task
+
+    # peak rss would include the parent's pages from before the spawned worker exec'd
+    with open("/proc/self/statm") as fp:
+        return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+@benchmark("player-table")
+def player_table(teams: int = 16, depth: float = 12.0, processes: int = 4) -> dict:
+    """Linux only - pool startup and worker memory attaching the shared player table against pickling the league"""
+    import multiprocessing
+    import pickle
+    from concurrent.futures import ProcessPoolExecutor
+
+    from sleeperbot import synthetic
+    from sleeperbot.league import League
+    from sleeperbot.player_table import PlayerTable
+
+    # spawned workers receive the initializer arguments pickled - forked workers would inherit the league
+    context = multiprocessing.get_context("spawn")
+
+    def start(initializer, initargs) -> dict:
+        begin = time.perf_counter()
+
+        with ProcessPoolExecutor(processes, mp_context=context, initializer=initializer, initargs=initargs) as pool:
+            rss = list(pool.map(_worker_rss, range(processes * 2)))
+
+        return {"seconds": round(time.perf_counter() - begin, 3), "worker_rss_mb": round(max(rss) / 2**20, 1)}
+
+    with synthetic.serve(synthetic.generate(synthetic.Scale(teams=teams, depth=depth))):
+        league = League()
+
+        build_start = time.perf_counter()
+        table = PlayerTable.from_league(league)
+        build_seconds = time.perf_counter() - build_start
+
+        with table:
+            return {
+                "players": len(table),
+                "pickled_kb": round(len(pickle.dumps(league)) / 1024, 1),
+                "table_kb": round(table.size / 1024, 1),
+                "table_build_seconds": round(build_seconds, 4),
+                "pickled": start(_hold, (league,)),
+                "shared": start(_attach_table, (table.name,)),
+            }
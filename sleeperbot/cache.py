@@ -0,0 +1,375 @@
+import abc
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+
+
+class Cache(abc.ABC):
+    """
+    Interface shared by every memoize backend. Every method is a single round trip -
+    multi-key methods exist so callers can batch instead of issuing one command per key.
+    A backend missing any method fails as soon as it is constructed.
+    """
+
+    # whether memoize may store live objects instead of serialized JSON
+    stores_objects = False
+
+    @abc.abstractmethod
+    def get(self, key: str) -> bytes | None: ...
+
+    @abc.abstractmethod
+    def set(self, key: str, value: str | bytes, ttl: int): ...
+
+    @abc.abstractmethod
+    def add(self, key: str, value: str | bytes, ttl: int) -> bool:
+        """Set key only when it isn't already cached - returns whether it was set"""
+
+    @abc.abstractmethod
+    def incr(self, key: str, ttl: int) -> int:
+        """Atomically add one to the counter at key (0 when not cached) and return it - resetting its ttl"""
+
+    @abc.abstractmethod
+    def mget(self, keys: list[str]) -> list[bytes | None]: ...
+
+    @abc.abstractmethod
+    def mset(self, values: dict[str, str | bytes], ttl: int | dict[str, int]): ...
+
+    @abc.abstractmethod
+    def hset(self, key: str, values: dict[str, str | bytes], ttl: int):
+        """Replace key with a hash of values - fields can then be read individually"""
+
+    @abc.abstractmethod
+    def hupdate(self, key: str, values: dict[str, str | bytes], removed: list[str], ttl: int):
+        """Write only values and remove the removed fields of the hash at key - resetting its ttl"""
+
+    @abc.abstractmethod
+    def hmget(self, key: str, fields: list[str]) -> list[bytes | None]: ...
+
+    @abc.abstractmethod
+    def hscan(self, key: str) -> Iterator[tuple[str, bytes]]:
+        """Every (field, value) of the hash at key in batches - nothing when key is not cached"""
+
+    @abc.abstractmethod
+    def ttl(self, key: str) -> int | None:
+        """Seconds until key expires or None when key is not cached"""
+
+    @abc.abstractmethod
+    def delete(self, *keys: str): ...
+
+    @abc.abstractmethod
+    def flush(self): ...
+
+
+class RedisCache(Cache):
+    def __init__(self, client):
+        self.client = client
+
+        # number of commands/pipelines sent to redis by this process
+        self.round_trips = 0
+
+    def get(self, key: str) -> bytes | None:
+        self.round_trips += 1
+        return self.client.get(key)
+
+    def set(self, key: str, value: str | bytes, ttl: int):
+        self.round_trips += 1
+        self.client.set(key, value, ex=ttl)
+
+    def add(self, key: str, value: str | bytes, ttl: int) -> bool:
+        self.round_trips += 1
+        return bool(self.client.set(key, value, ex=ttl, nx=True))
+
+    def incr(self, key: str, ttl: int) -> int:
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.incr(key)
+        pipeline.expire(key, ttl)
+
+        self.round_trips += 1
+        count, _ = pipeline.execute()
+
+        return count
+
+    def mget(self, keys: list[str]) -> list[bytes | None]:
+        if not keys:
+            return []
+
+        self.round_trips += 1
+        return self.client.mget(keys)
+
+    def mset(self, values: dict[str, str | bytes], ttl: int | dict[str, int]):
+        if not values:
+            return
+
+        pipeline = self.client.pipeline(transaction=False)
+
+        for key, value in values.items():
+            pipeline.set(key, value, ex=ttl[key] if isinstance(ttl, dict) else ttl)
+
+        self.round_trips += 1
+        pipeline.execute()
+
+    def hset(self, key: str, values: dict[str, str | bytes], ttl: int):
+        # replaced in a transaction so readers never see a partially written hash
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.delete(key)
+
+        if values:
+            pipeline.hset(key, mapping=values)
+            pipeline.expire(key, ttl)
+
+        self.round_trips += 1
+        pipeline.execute()
+
+    def hupdate(self, key: str, values: dict[str, str | bytes], removed: list[str], ttl: int):
+        pipeline = self.client.pipeline(transaction=True)
+
+        if values:
+            pipeline.hset(key, mapping=values)
+
+        if removed:
+            pipeline.hdel(key, *removed)
+
+        pipeline.expire(key, ttl)
+
+        self.round_trips += 1
+        pipeline.execute()
+
+    def hmget(self, key: str, fields: list[str]) -> list[bytes | None]:
+        if not fields:
+            return []
+
+        self.round_trips += 1
+        return self.client.hmget(key, fields)
+
+    def hscan(self, key: str, batch: int = 1000) -> Iterator[tuple[str, bytes]]:
+        cursor = None
+
+        while cursor != 0:
+            self.round_trips += 1
+            cursor, values = self.client.hscan(key, cursor or 0, count=batch)
+
+            for field, value in values.items():
+                yield field.decode(), value
+
+    def ttl(self, key: str) -> int | None:
+        self.round_trips += 1
+        remaining = self.client.ttl(key)
+
+        # -2 means the key does not exist and -1 means it never expires
+        if remaining == -2:
+            return None
+
+        return remaining
+
+    def delete(self, *keys: str):
+        if keys:
+            self.round_trips += 1
+            self.client.delete(*keys)
+
+    def flush(self):
+        self.round_trips += 1
+        self.client.flushdb()
+
+
+class _Hash(dict):
+    """Value of an in-memory hash entry - kept apart from dicts memoize stores as live objects"""
+
+
+def _sizeof(value) -> int:
+    """Rough deep size of a live object - good enough to keep the in-memory cache bounded"""
+    size, seen, stack = 0, set(), [value]
+
+    while stack:
+        obj = stack.pop()
+
+        if id(obj) in seen:
+            continue
+
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set)):
+            stack.extend(obj)
+        elif hasattr(obj, "__dict__"):
+            stack.append(obj.__dict__)
+
+    return size
+
+
+class InMemoryCache(Cache):
+    """
+    Process local cache with per-key expiry and LRU eviction once the stored values
+    exceed max_bytes.
+
+    When store_objects is set memoize stores results as live objects instead of
+    serialized JSON, skipping serialize/deserialize entirely. Cached objects are then
+    shared by every caller so results must not be mutated.
+    """
+
+    def __init__(self, max_bytes: int | None = None, store_objects: bool = False):
+        self.max_bytes = max_bytes
+        self.stores_objects = store_objects
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[object, float, int]] = OrderedDict()
+        self._size = 0
+
+    @property
+    def size(self) -> int:
+        """Approximate bytes currently held by the cache"""
+        return self._size
+
+    def _pop(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._size -= size
+
+    def _get(self, key: str):
+        """Must be called holding the lock"""
+        if key not in self._entries:
+            return None
+
+        value, expires, _ = self._entries[key]
+
+        if expires <= time.time():
+            self._pop(key)
+            return None
+
+        self._entries.move_to_end(key)
+
+        return value
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._get(key)
+
+        if isinstance(value, _Hash):
+            raise TypeError(f"{key} holds a hash")
+
+        return value
+
+    def _hash(self, key: str) -> _Hash:
+        """Must be called holding the lock"""
+        value = self._get(key)
+
+        if value is not None and not isinstance(value, _Hash):
+            raise TypeError(f"{key} does not hold a hash")
+
+        return value or _Hash()
+
+    def hset(self, key: str, values: dict, ttl: int):
+        with self._lock:
+            if not values:
+                if key in self._entries:
+                    self._pop(key)
+                return
+
+            self._store(key, _Hash(values), ttl)
+
+    def hupdate(self, key: str, values: dict, removed: list[str], ttl: int):
+        with self._lock:
+            # copied rather than modified in place so running hscans never see the update
+            updated = _Hash(self._hash(key))
+            updated.update(values)
+
+            for field in removed:
+                updated.pop(field, None)
+
+            self._store(key, updated, ttl)
+
+    def hmget(self, key: str, fields: list[str]) -> list:
+        with self._lock:
+            values = self._hash(key)
+
+        return [values.get(field) for field in fields]
+
+    def hscan(self, key: str) -> Iterator[tuple[str, object]]:
+        with self._lock:
+            values = self._hash(key)
+
+        # entries are replaced rather than modified in place so iterating outside the lock is safe
+        yield from values.items()
+
+    def _store(self, key: str, value, ttl: int):
+        """Must be called holding the lock"""
+        if isinstance(value, str):
+            value = value.encode()
+
+        if isinstance(value, _Hash):
+            value = _Hash({field: item.encode() if isinstance(item, str) else item for field, item in value.items()})
+            size = sum(len(item) if isinstance(item, bytes) else _sizeof(item) for item in value.values())
+        else:
+            size = len(value) if isinstance(value, bytes) else _sizeof(value)
+
+        if key in self._entries:
+            self._pop(key)
+
+        self._entries[key] = (value, time.time() + ttl, size)
+        self._size += size
+
+        self._evict()
+
+    def set(self, key: str, value, ttl: int):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key: str, value, ttl: int) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[1] > time.time():
+                return False
+
+            self._store(key, value, ttl)
+
+            return True
+
+    def incr(self, key: str, ttl: int) -> int:
+        with self._lock:
+            count = int(self._get(key) or 0) + 1
+            self._store(key, str(count), ttl)
+
+        return count
+
+    def _evict(self):
+        if self.max_bytes is None or self._size <= self.max_bytes:
+            return
+
+        now = time.time()
+        for key in [key for key, (_, expires, _) in self._entries.items() if expires <= now]:
+            self._pop(key)
+
+        # least recently used entries are at the front
+        while self._size > self.max_bytes and self._entries:
+            self._pop(next(iter(self._entries)))
+
+    def mget(self, keys: list[str]) -> list:
+        return [self.get(key) for key in keys]
+
+    def mset(self, values: dict[str, str | bytes], ttl: int | dict[str, int]):
+        for key, value in values.items():
+            self.set(key, value, ttl[key] if isinstance(ttl, dict) else ttl)
+
+    def ttl(self, key: str) -> int | None:
+        with self._lock:
+            if key not in self._entries:
+                return None
+
+            remaining = int(self._entries[key][1] - time.time())
+
+        return remaining if remaining > 0 else None
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._pop(key)
+
+    def flush(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
@@ -2,9 +2,21 @@ from __future__ import annotations
 
 import click
 
-from sleeperbot import config
+from sleeperbot import (
+    benchmarks,
+    jobs,
+    scheduler,
+    snapshot,
+    warm,
+)
 from sleeperbot.clients import sleeper
 from sleeperbot.league import League
+from sleeperbot.manager import manage
+from sleeperbot.simulation import season_outlook
+from sleeperbot.utils import (
+    get_cache,
+    setup_logging,
+)
 
 
 @click.group()
@@ -14,14 +26,157 @@ def cli():
 
 @cli.command()
 def clear_cache():
-    config.redis.flushdb()
+    get_cache().flush()
     click.echo("Cache cleared...")
 
 
+@cli.command()
+@click.argument("name", type=click.Choice(sorted(benchmarks.BENCHMARKS)))
+def benchmark(name: str):
+    results = benchmarks.BENCHMARKS[name]()
+
+    for key, value in results.items():
+        click.echo(f"{key}: {value}")
+
+    if results.get("passed") is False:
+        raise click.ClickException(f"{name} benchmark failed")
+
+
+@cli.command()
+@click.option("--processes", type=int, default=None, help="Solve rosters in a process pool of this size")
+def lineup_report(processes: int | None):
+    league = League.cached()
+
+    reports = sorted(league.optimize_all_rosters(processes=processes), key=lambda report: report.value_lost)
+
+    for report in reports:
+        click.echo(
+            f"{report.owner or report.roster:<20} actual: {report.actual_value:6.3f}  "
+            f"optimal: {report.optimal_value:6.3f}  lost: {report.value_lost:6.3f}"
+        )
+
+
+@cli.command()
+@click.option("--seasons", type=int, default=20000, help="Number of seasons to simulate")
+def playoff_odds(seasons: int):
+    for outlook in season_outlook(League.cached(), seasons=seasons):
+        click.echo(
+            f"{outlook.owner or outlook.roster:<20} wins: {outlook.wins:4.1f}  projected: {outlook.projected_wins:4.1f}  "
+            f"playoffs: {outlook.playoff_odds:6.1%}  seed: {outlook.projected_seed:4.1f}"
+        )
+
+
+@cli.command()
+@click.option("--send", multiple=True, help="Player or draft pick (season_round_roster) IDs to trade away")
+@click.option("--receive", multiple=True, help="Player or draft pick (season_round_roster) IDs to receive")
+def evaluate_trade(send: tuple[str, ...], receive: tuple[str, ...]):
+    league = League.cached()
+
+    try:
+        value = league.evaluate_trade(list(send), list(receive))
+    except KeyError as error:
+        raise click.BadParameter(f"unknown player or draft pick {error}")
+
+    click.secho(f"Dynasty value change: {value:+.3f}", fg="green" if value >= 0 else "red")
+
+
+@cli.command("schedule")
+@click.option("--format", "output_format", type=click.Choice(["json", "crontab", "eventbridge"]), default="json")
+@click.option("--output", type=click.File("w"), default="-", help="File to write the schedule to")
+@click.option("--warm", "warm_schedule", is_flag=True, help="Emit the cache warming times instead of the run times")
+def emit_schedule(output_format: str, output, warm_schedule: bool):
+    times = scheduler.schedule()
+
+    if warm_schedule:
+        times = scheduler.warm_times(times)
+
+    output.write(scheduler.emit(times, output_format) + "\n")
+
+
+@cli.command()
+@click.option("--warm/--no-warm", "warm_cache", default=True, help="Warm the cache shortly before each run")
+def run_scheduler(warm_cache: bool):
+    setup_logging()
+    scheduler.run_forever(manage, warm_job=warm.warm if warm_cache else None)
+
+
+@cli.command()
+@click.option("--margin", type=int, default=None, help="Refresh entries expiring within this many seconds")
+@click.option("--force", is_flag=True, help="Refresh every entry regardless of when it expires")
+def warm_cache(margin: int | None, force: bool):
+    setup_logging()
+    result = warm.warm(margin, force=force)
+
+    click.echo(f"Refreshed {len(result['refreshed'])} entries in {result['seconds']}s...")
+
+    if result["failed"]:
+        raise click.ClickException(f"Unable to refresh {result['failed']}")
+
+
+@cli.command()
+@click.argument("league_ids", nargs=-1, required=True)
+@click.option(
+    "--token-ref",
+    default="SLEEPER_TOKEN",
+    help="Worker environment variable (SLEEPER_TOKEN or SLEEPER_TOKEN_*) holding the league's token",
+)
+@click.option("--manage-roster/--no-manage-roster", default=None)
+@click.option("--manage-taxi/--no-manage-taxi", default=None)
+@click.option("--only-on-change/--always", default=None, help="Only optimize when the roster changed")
+def enqueue(
+    league_ids: tuple[str, ...],
+    token_ref: str,
+    manage_roster: bool | None,
+    manage_taxi: bool | None,
+    only_on_change: bool | None,
+):
+    options = {
+        name: value
+        for name, value in [
+            ("MANAGE_ROSTER", manage_roster),
+            ("MANAGE_TAXI", manage_taxi),
+            ("MANAGE_ONLY_ON_CHANGE", only_on_change),
+        ]
+        if value is not None
+    }
+
+    guids = jobs.enqueue(
+        [jobs.Job(league_id=league_id, token_ref=token_ref, options=options) for league_id in league_ids]
+    )
+
+    for league_id, guid in zip(league_ids, guids):
+        click.echo(f"{league_id}: {guid}")
+
+
+@cli.command()
+@click.option("--once", is_flag=True, help="Exit once the queue is empty")
+def worker(once: bool):
+    setup_logging()
+    jobs.run_worker(once=once)
+
+
+@cli.command()
+@click.option("--limit", type=int, default=20)
+def job_results(limit: int):
+    for result in jobs.results(limit):
+        click.echo(
+            f"{result.league_id:<20} {result.status:<10} attempts: {result.attempts}  "
+            f"queued: {result.queued_seconds:7.1f}s  run: {result.run_seconds:6.1f}s  {result.error or ''}"
+        )
+
+
+@cli.command("snapshot")
+@click.option("--path", default=None, help="Where to write the snapshot (defaults to SNAPSHOT_PATH)")
+@click.option("--force", is_flag=True, help="Refetch every upstream instead of reading through the cache")
+def build_snapshot(path: str | None, force: bool):
+    entries = snapshot.build(path, force=force)
+    click.echo(f"Snapshot written with {entries} entries...")
+
+
 @cli.command()
 @click.argument("owner_id")
 def optimize_roster(owner_id: str):
-    league = League()
+    league = League.cached()
 
     try:
         owner = next(
@@ -78,6 +233,9 @@ def optimize_roster(owner_id: str):
         sleeper.update_taxi(league.settings, league.me.roster)
         click.secho("Taxi applied", fg="green")
 
+    # rosters may have changed so the next command must rebuild the league
+    league.invalidate()
+
 
 def main():
     return cli()
@@ -0,0 +1,5 @@
+# value source clients register themselves with sleeperbot.sources on import
+from sleeperbot.clients import (
+    fantasy_calc,
+    ktc,
+)
@@ -0,0 +1,122 @@
+import functools
+import time
+
+import structlog
+
+from sleeperbot import (
+    config,
+    metrics,
+)
+from sleeperbot.utils import get_cache
+
+log = structlog.get_logger()
+
+EVENTS = metrics.Counter("circuit_breaker_events_total", "Count", "Circuit breaker failures, trips and rejections")
+
+# breaker state outlives any single run so a source that is down stays skipped across runs
+STATE_TTL = 24 * 3600
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Stops calling a flaky upstream once it has failed (or been slower than BREAKER_LATENCY)
+    BREAKER_FAILURES times in a row. While open every call fails immediately and after
+    BREAKER_COOLDOWN seconds a single call is let through to test whether it recovered.
+
+    State lives in the cache so every process sharing the cache shares the breaker - the
+    failure count is only ever incremented atomically and the trial call is claimed with
+    Cache.add so concurrent callers never both get through.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    @property
+    def _failures_key(self) -> str:
+        return f"circuit_{self.name}_failures"
+
+    @property
+    def _opened_key(self) -> str:
+        return f"circuit_{self.name}_opened"
+
+    @property
+    def _trial_key(self) -> str:
+        return f"circuit_{self.name}_trial"
+
+    def _load(self) -> tuple[int, float | None]:
+        """(consecutive failures, when the breaker opened) in a single round trip"""
+        failures, opened = get_cache().mget([self._failures_key, self._opened_key])
+        return int(failures or 0), None if opened is None else float(opened)
+
+    @staticmethod
+    def _cooling_down(opened: float | None) -> bool:
+        return opened is not None and time.time() - opened < config.BREAKER_COOLDOWN
+
+    @property
+    def is_open(self) -> bool:
+        _, opened = self._load()
+        return self._cooling_down(opened)
+
+    def _admit(self, opened: float | None) -> bool:
+        """Whether a call may go through - once cooled down only the caller claiming the trial may"""
+        if opened is None:
+            return True
+
+        if self._cooling_down(opened):
+            return False
+
+        # the claim expires on its own in case the process making the trial call dies
+        return get_cache().add(self._trial_key, "1", config.BREAKER_COOLDOWN)
+
+    def _record_failure(self, event: str, trial: bool):
+        EVENTS.incr(source=self.name, event=event)
+
+        cache = get_cache()
+        failures = cache.incr(self._failures_key, STATE_TTL)
+
+        if trial:
+            # a failed trial call reopens the breaker for another cooldown
+            cache.set(self._opened_key, str(time.time()), STATE_TTL)
+            cache.delete(self._trial_key)
+
+        elif failures >= config.BREAKER_FAILURES and cache.add(self._opened_key, str(time.time()), STATE_TTL):
+            log.warning("circuit opened", source=self.name, failures=failures)
+            EVENTS.incr(source=self.name, event="opened")
+
+    def _reset(self):
+        log.info("circuit closed", source=self.name)
+        get_cache().delete(self._failures_key, self._opened_key, self._trial_key)
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            failures, opened = self._load()
+
+            if not self._admit(opened):
+                EVENTS.incr(source=self.name, event="rejected")
+                raise CircuitOpenError(f"Circuit for {self.name} is open")
+
+            trial = opened is not None
+
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                self._record_failure("failure", trial)
+                raise
+
+            if time.perf_counter() - start > config.BREAKER_LATENCY:
+                # the result is still good but a slow source counts toward tripping the breaker
+                self._record_failure("slow", trial)
+            elif failures or trial:
+                self._reset()
+
+            return result
+
+        inner.breaker = self
+
+        return inner
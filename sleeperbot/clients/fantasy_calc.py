@@ -1,19 +1,36 @@
-from sleeperbot.clients.session import Session
+import functools
+
+from sleeperbot import (
+    config,
+    history,
+    sources,
+)
+from sleeperbot.clients.breaker import CircuitBreaker
 from sleeperbot.models import (
     LeagueSettings,
     Player,
     PlayerValue,
 )
+from sleeperbot.ttl import SchedulePolicy
 from sleeperbot.utils import memoize
 
-_session = Session()
-_session.headers.update(
-    {
-        "Accept": "application/json",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Content-Type": "application/json",
-    }
-)
+
+@functools.cache
+def _session():
+    # created on first use so runs served entirely from cache never import requests
+    from sleeperbot.clients.session import Session
+
+    session = Session()
+    session.headers.update(
+        {
+            "Accept": "application/json",
+            "Accept-Language": "en-US,en;q=0.9",
+            "Content-Type": "application/json",
+        }
+    )
+
+    return session
+
 
 # some values can be above 10k but not by much...
 MAX_VALUE = 10000
@@ -23,7 +40,8 @@ def _normalize_value(value: int) -> float:
     return value / MAX_VALUE
 
 
-@memoize(ttl=600)
+@memoize(ttl=SchedulePolicy(volatile=600, default=3600, quiet=6 * 3600), fallback_ttl=config.LAST_KNOWN_GOOD_TTL)
+@CircuitBreaker("fantasy_calc")
 def get_players(dynasty: bool, settings: LeagueSettings) -> list[Player]:
     def map_player(player) -> Player:
         first, last = player["player"]["name"].split(maxsplit=1)
@@ -48,7 +66,7 @@ def get_players(dynasty: bool, settings: LeagueSettings) -> list[Player]:
 
         return _player
 
-    resp = _session.get(
+    resp = _session().get(
         "https://api.fantasycalc.com/values/current",
         params={
             "isDynasty": dynasty,
@@ -59,4 +77,17 @@ def get_players(dynasty: bool, settings: LeagueSettings) -> list[Player]:
         },
     )
 
-    return [map_player(player) for player in resp.json()]
+    players = [map_player(player) for player in resp.json()]
+    history.record("fantasy_calc", dynasty, players)
+
+    return players
+
+
+sources.register(
+    sources.ValueSource(
+        name="fantasy_calc",
+        fetch=get_players,
+        id_strategy="guid",
+        is_pick=lambda player: player.position == "PICK",
+    )
+)
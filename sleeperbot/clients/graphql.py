@@ -0,0 +1,78 @@
+import functools
+import re
+from dataclasses import dataclass
+
+_VARIABLE = re.compile(r"\$(\w+)")
+
+
+class Document:
+    """
+    A single parameterized GraphQL operation compiled once at import time.
+
+    The selection must be a single top-level field so that several documents can be
+    merged into one request by aliasing each field and prefixing its variables.
+    """
+
+    def __init__(self, name: str, selection: str, variables: dict[str, str] | None = None, kind: str = "query"):
+        self.name = name
+        self.kind = kind
+        self.variables = variables or {}
+        self.selection = " ".join(selection.split())
+
+    def __call__(self, **variables) -> "Operation":
+        missing = set(self.variables) - set(variables)
+
+        if missing:
+            raise ValueError(f"Missing variables {missing} for {self.name}")
+
+        return Operation(document=self, variables=variables)
+
+    def __repr__(self):
+        return f"Document({self.name})"
+
+
+@dataclass
+class Operation:
+    document: Document
+    variables: dict
+
+
+@functools.cache
+def _compile(documents: tuple[Document, ...]) -> tuple[str, str]:
+    """Build (and cache) the merged query text for an ordered set of documents"""
+    kinds = {document.kind for document in documents}
+
+    if len(kinds) != 1:
+        raise ValueError("Queries and mutations cannot be batched into the same request")
+
+    name = documents[0].name if len(documents) == 1 else "batch_" + "_".join(doc.name for doc in documents)
+
+    definitions, fields = [], []
+
+    for idx, document in enumerate(documents):
+        definitions += [f"$op{idx}_{var}: {tipe}" for var, tipe in document.variables.items()]
+        fields.append(f"op{idx}: " + _VARIABLE.sub(rf"$op{idx}_\1", document.selection))
+
+    signature = f"({', '.join(definitions)})" if definitions else ""
+
+    # top-level mutation fields are executed serially so the order of documents is
+    # also the order in which their side effects are applied
+    return name, f"{kinds.pop()} {name}{signature} {{ {' '.join(fields)} }}"
+
+
+def execute(session, url: str, operations: list[Operation]) -> list:
+    """Run every operation in a single request and return the data for each in order"""
+    name, query = _compile(tuple(operation.document for operation in operations))
+
+    variables = {
+        f"op{idx}_{var}": value
+        for idx, operation in enumerate(operations)
+        for var, value in operation.variables.items()
+    }
+
+    body = session.post(url, json={"operationName": name, "variables": variables, "query": query}).json()
+
+    if "errors" in body:
+        raise RuntimeError(body["errors"])
+
+    return [body["data"][f"op{idx}"] for idx in range(len(operations))]
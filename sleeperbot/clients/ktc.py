@@ -1,28 +1,44 @@
+import functools
 import json
 import re
 
-from sleeperbot.clients.session import Session
+from sleeperbot import (
+    config,
+    history,
+    sources,
+)
+from sleeperbot.clients.breaker import CircuitBreaker
 from sleeperbot.models import (
     LeagueSettings,
     Player,
     PlayerValue,
 )
+from sleeperbot.ttl import SchedulePolicy
 from sleeperbot.utils import memoize
 
-_session = Session()
-_session.headers.update(
-    {
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
-        "Accept-Encoding": "gzip, deflate, br",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Cache-Control": "max-age=0",
-        "Host": "keeptradecut.com",
-        "User-Agent": (
-            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0"
-            " Safari/537.36"
-        ),
-    }
-)
+
+@functools.cache
+def _session():
+    # created on first use so runs served entirely from cache never import requests
+    from sleeperbot.clients.session import Session
+
+    session = Session()
+    session.headers.update(
+        {
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
+            "Accept-Encoding": "gzip, deflate, br",
+            "Accept-Language": "en-US,en;q=0.9",
+            "Cache-Control": "max-age=0",
+            "Host": "keeptradecut.com",
+            "User-Agent": (
+                "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0"
+                " Safari/537.36"
+            ),
+        }
+    )
+
+    return session
+
 
 MAX_VALUE = 10000
 
@@ -73,7 +89,7 @@ def _normalize_value(value: int) -> float:
 
 
 def _get_players(url) -> list[dict]:
-    response = _session.get(url, timeout=10)
+    response = _session().get(url, timeout=10)
 
     matches = list(re.finditer(r"var playersArray = (.*);", response.text, re.MULTILINE))
 
@@ -83,7 +99,8 @@ def _get_players(url) -> list[dict]:
     return json.loads(matches[0].groups()[0])
 
 
-@memoize(ttl=24 * 3600)
+@memoize(ttl=SchedulePolicy(volatile=3600, default=24 * 3600, quiet=24 * 3600), fallback_ttl=config.LAST_KNOWN_GOOD_TTL)
+@CircuitBreaker("ktc")
 def get_players(dynasty: bool, settings: LeagueSettings) -> list[Player]:
     url = f'https://keeptradecut.com/{"dynasty" if dynasty else "fantasy"}-rankings'
 
@@ -127,4 +144,18 @@ def get_players(dynasty: bool, settings: LeagueSettings) -> list[Player]:
 
         return _player
 
-    return [map_player(player) for player in _get_players(url)]
+    players = [map_player(player) for player in _get_players(url)]
+    history.record("ktc", dynasty, players)
+
+    return players
+
+
+sources.register(
+    sources.ValueSource(
+        name="ktc",
+        fetch=get_players,
+        id_strategy="alternate_id",  # ktc has no mapping back to sleeper IDs
+        require_mapped=True,
+        is_pick=lambda player: player.first_name.isdigit(),  # draft picks are named like "2024 Mid 1st"
+    )
+)
@@ -0,0 +1,179 @@
+import threading
+import time
+from dataclasses import dataclass
+
+import structlog
+
+from sleeperbot import (
+    config,
+    metrics,
+)
+
+log = structlog.get_logger()
+
+# requests per minute allowed per upstream host - sleeper documents staying under
+# 1000 calls a minute for their API, the other hosts are unofficial so stay polite
+RATE_LIMITS = {
+    "api.sleeper.app": 1000,
+    "sleeper.com": 1000,
+    "api.fantasycalc.com": 60,
+    "keeptradecut.com": 30,
+}
+
+DEFAULT_RATE_LIMIT = 60
+
+# how many seconds worth of requests can be made in a single burst
+BURST_SECONDS = 10
+
+# the bucket is only evaluated inside redis so every process sharing the redis
+# instance also shares a single clock and a single budget per host
+_REDIS_ACQUIRE = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call("HMGET", KEYS[1], "tokens", "updated")
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+
+local wait = 0
+if tokens < 1 then
+    wait = (1 - tokens) / rate
+end
+
+local blocked = redis.call("PTTL", KEYS[2])
+if blocked > 0 then
+    wait = math.max(wait, blocked / 1000)
+end
+
+redis.call("HSET", KEYS[1], "tokens", tokens - 1, "updated", now)
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate) + 1)
+
+return tostring(wait)
+"""
+
+
+@dataclass
+class TokenBucket:
+    """In-process token bucket - used when no redis instance is configured"""
+
+    rate: float
+    capacity: float
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    def acquire(self) -> float:
+        """Reserve a token and return how many seconds the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            wait = max(0.0, (1 - self._tokens) / self.rate, self._blocked_until - now)
+            self._tokens -= 1
+
+            return wait
+
+    def block(self, seconds: float):
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+@dataclass
+class RedisTokenBucket:
+    """
+    Token bucket stored in redis so concurrent lambdas and CLI runs share a budget. While
+    redis is unreachable requests are limited by an in-process bucket instead of failing.
+    """
+
+    host: str
+    rate: float
+    capacity: float
+
+    def __post_init__(self):
+        self._script = None
+        self._fallback = TokenBucket(rate=self.rate, capacity=self.capacity)
+
+    @property
+    def _keys(self) -> list[str]:
+        return [f"rate_limit_{self.host}", f"rate_limit_{self.host}_blocked"]
+
+    def _fall_back(self, action: str):
+        log.warning("shared rate limit unavailable - limiting in process", host=self.host, action=action, exc_info=True)
+        FALLBACKS.incr(host=self.host)
+
+    def acquire(self) -> float:
+        try:
+            if self._script is None:
+                # registered once - the script is only sent again if redis no longer has it
+                self._script = config.redis.register_script(_REDIS_ACQUIRE)
+
+            return float(self._script(keys=self._keys, args=[self.rate, self.capacity]))
+        except Exception:
+            self._fall_back("acquire")
+            return self._fallback.acquire()
+
+    def block(self, seconds: float):
+        milliseconds = int(seconds * 1000)
+
+        try:
+            # never shorten a block another process already set
+            if milliseconds > config.redis.pttl(self._keys[1]):
+                config.redis.set(self._keys[1], 1, px=milliseconds)
+        except Exception:
+            self._fall_back("block")
+            self._fallback.block(seconds)
+
+
+_buckets: dict[str, TokenBucket | RedisTokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+THROTTLED_SECONDS = metrics.Counter("rate_limit_wait_seconds_total", "Seconds", "Time spent waiting on rate limits")
+FALLBACKS = metrics.Counter(
+    "rate_limit_fallbacks_total", "Count", "Requests limited in process because the shared limit was unavailable"
+)
+
+
+def _get_bucket(host: str) -> TokenBucket | RedisTokenBucket:
+    with _buckets_lock:
+        if host not in _buckets:
+            rate = RATE_LIMITS.get(host, DEFAULT_RATE_LIMIT) / 60
+            capacity = max(1.0, rate * BURST_SECONDS)
+
+            if config.RATE_LIMIT_SHARED and config.redis:
+                _buckets[host] = RedisTokenBucket(host=host, rate=rate, capacity=capacity)
+            else:
+                _buckets[host] = TokenBucket(rate=rate, capacity=capacity)
+
+        return _buckets[host]
+
+
+def acquire(host: str):
+    """Block until a request to the provided host fits within its rate limit"""
+    if not config.RATE_LIMIT_ENABLED:
+        return
+
+    wait = _get_bucket(host).acquire()
+
+    if wait > 0:
+        log.debug("throttling request", host=host, wait=wait)
+        THROTTLED_SECONDS.incr(wait, host=host)
+        time.sleep(wait)
+
+
+def block(host: str, seconds: float):
+    """Stop every process sharing the budget from hitting host for the provided seconds"""
+    _get_bucket(host).block(seconds)
+
+
+def throttled_time() -> dict[str, float]:
+    """Seconds spent waiting on the rate limiter per host since metrics were last flushed"""
+    return {dict(labels)["host"]: seconds for labels, seconds in THROTTLED_SECONDS.series().items()}
@@ -1,11 +1,65 @@
+import functools
+import re
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+from requests import RequestException
 from requests import Session as _Session
 from requests.adapters import (
     HTTPAdapter,
     Retry,
 )
 
+from sleeperbot import metrics
+from sleeperbot.clients import rate_limit
+
 DEFAULT_TIMEOUT = 5
 
+# 429s are handled by the session itself (and not urllib3) so a throttle seen by one
+# process is shared with every other process using the same rate limit budget
+MAX_THROTTLE_RETRIES = 3
+THROTTLE_BACKOFF = 1.0
+
+REQUEST_SECONDS = metrics.Histogram("http_request_seconds", "Seconds", "Upstream request latency")
+RESPONSE_BYTES = metrics.Histogram(
+    "http_response_bytes", "Bytes", "Upstream response body size", buckets=metrics.SIZE_BUCKETS
+)
+REQUESTS = metrics.Counter("http_requests_total", "Count", "Upstream requests by status code")
+RETRIES = metrics.Counter("http_retries_total", "Count", "Upstream requests retried for 5xx or 429 responses")
+
+_ID = re.compile(r"/\d+(?=/|$)")
+
+
+@functools.lru_cache(maxsize=1024)
+def _endpoint(path: str) -> str:
+    """Path with numeric segments (league IDs, weeks) collapsed so endpoints aggregate"""
+    return _ID.sub("/:id", path) or "/"
+
+
+def _retry_after(response) -> float | None:
+    value = response.headers.get("Retry-After")
+
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    date = parsedate_to_datetime(response.headers["Date"]) if "Date" in response.headers else None
+
+    if date is None:
+        return None
+
+    return max(0.0, (retry_at - date).total_seconds())
+
 
 class Session(_Session):
     def __init__(self, *args, **kwargs):
@@ -13,8 +67,8 @@ class Session(_Session):
 
         retry = Retry(
             total=3,
-            backoff_factor=0.1,
-            status_forcelist=[429, 500, 502, 503, 504],
+            backoff_factor=0.5,
+            status_forcelist=[500, 502, 503, 504],
         )
 
         self.mount("http://", HTTPAdapter(max_retries=retry))
@@ -25,11 +79,40 @@ class Session(_Session):
         # connections
         self.headers.update({"Connection": "close"})
 
-    def request(self, *args, **kwargs):
+    def request(self, method, url, *args, **kwargs):
         timeout = kwargs.pop("timeout", DEFAULT_TIMEOUT)
         kwargs["timeout"] = timeout
 
-        response = super().request(*args, **kwargs)
+        parsed = urlparse(url)
+        host, endpoint = parsed.hostname or "", _endpoint(parsed.path)
+
+        for attempt in range(MAX_THROTTLE_RETRIES + 1):
+            rate_limit.acquire(host)
+
+            start = time.perf_counter()
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except RequestException:
+                REQUESTS.incr(host=host, endpoint=endpoint, status="error")
+                raise
+
+            REQUEST_SECONDS.observe(time.perf_counter() - start, host=host, endpoint=endpoint)
+            REQUESTS.incr(host=host, endpoint=endpoint, status=str(response.status_code))
+
+            # retries for 5xx responses happen inside urllib3 and are only visible on the raw response
+            retries = getattr(response.raw, "retries", None)
+            if retries is not None and retries.history:
+                RETRIES.incr(len(retries.history), host=host, reason="server_error")
+
+            if response.status_code != 429 or attempt == MAX_THROTTLE_RETRIES:
+                break
+
+            RETRIES.incr(host=host, reason="throttled")
+            delay = _retry_after(response)
+            rate_limit.block(host, THROTTLE_BACKOFF * 2**attempt if delay is None else delay)
+
         response.raise_for_status()
 
+        RESPONSE_BYTES.observe(len(response.content), host=host, endpoint=endpoint)
+
         return response
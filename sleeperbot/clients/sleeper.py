@@ -1,68 +1,209 @@
+import dataclasses
+import functools
 import json
+import time
 from collections import defaultdict
 
 from sleeperbot import config
-from sleeperbot.clients.session import Session
+from sleeperbot.clients import graphql
 from sleeperbot.models import (
+    DraftPick,
     Game,
     LeagueSettings,
     Matchup,
     Owner,
     Player,
+    PlayerChange,
+    Projections,
     Roster,
     Team,
+    Transaction,
 )
-from sleeperbot.utils import memoize
-
-_graphql = Session()
-_graphql.headers.update(
-    {
-        "Accept": "application/json",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Content-Type": "application/json",
-        "Authorization": config.SLEEPER_TOKEN,
-    }
+from sleeperbot.ttl import SchedulePolicy
+from sleeperbot.utils import (
+    get_cache,
+    memoize,
+)
+
+
+@functools.cache
+def _graphql():
+    # sessions (and requests itself) are created on first use so runs served entirely
+    # from cache never pay for them
+    from sleeperbot.clients.session import Session
+
+    session = Session()
+    session.headers.update(
+        {
+            "Accept": "application/json",
+            "Accept-Language": "en-US,en;q=0.9",
+            "Content-Type": "application/json",
+            "Authorization": config.SLEEPER_TOKEN,
+        }
+    )
+
+    return session
+
+
+@functools.cache
+def _rest():
+    from sleeperbot.clients.session import Session
+
+    return Session()
+
+
+GRAPHQL_URL = "https://sleeper.com/graphql"
+
+INITIALIZE_APP = graphql.Document(
+    name="initialize_app",
+    selection="""
+        me {
+            user_id
+        }
+    """,
+)
+
+BATCH_SCORES = graphql.Document(
+    name="batch_scores",
+    variables={"season": "String!", "week": "Int!"},
+    selection="""
+        scores(sport: "nfl", season_type: "regular", season: $season, week: $week) {
+            date
+            game_id
+            metadata
+            status
+            start_time
+        }
+    """,
 )
 
-_rest = Session()
+TEAMS = graphql.Document(
+    name="teams",
+    selection="""
+        teams(sport: "nfl") {
+            active
+            aliases
+            metadata
+            name
+            sport
+            team
+        }
+    """,
+)
+
+LEAGUE_CREATE_TRANSACTION = graphql.Document(
+    name="league_create_transaction",
+    kind="mutation",
+    variables={
+        "league_id": "String!",
+        "k_adds": "[String]",
+        "v_adds": "[Int]",
+        "k_drops": "[String]",
+        "v_drops": "[Int]",
+    },
+    selection="""
+        league_create_transaction(
+            league_id: $league_id, type: "free_agent", k_adds: $k_adds, v_adds: $v_adds, k_drops: $k_drops, v_drops: $v_drops
+        ) {
+            adds
+            consenter_ids
+            created
+            creator
+            drops
+            league_id
+            leg
+            metadata
+            roster_ids
+            settings
+            status
+            status_updated
+            transaction_id
+            type
+            player_map
+        }
+    """,
+)
+
+ROSTER_UPDATE_TAXI = graphql.Document(
+    name="roster_update_taxi",
+    kind="mutation",
+    variables={"league_id": "String!", "roster_id": "Int!", "taxi": "[String]"},
+    selection="""
+        roster_update_taxi(league_id: $league_id, roster_id: $roster_id, taxi: $taxi) {
+            league_id
+        }
+    """,
+)
+
+ROSTER_UPDATE_RESERVE = graphql.Document(
+    name="roster_update_reserve",
+    kind="mutation",
+    variables={"league_id": "String!", "roster_id": "Int!", "reserve": "[String]"},
+    selection="""
+        roster_update_reserve(league_id: $league_id, roster_id: $roster_id, reserve: $reserve) {
+            league_id
+        }
+    """,
+)
+
+UPDATE_MATCHUP_LEG = graphql.Document(
+    name="update_matchup_leg",
+    kind="mutation",
+    variables={
+        "league_id": "String!",
+        "roster_id": "Int!",
+        "week": "Int!",
+        "starters": "[String]",
+        "starters_games": "Map",
+    },
+    selection="""
+        update_matchup_leg(
+            league_id: $league_id, roster_id: $roster_id, leg: $week, round: $week, starters: $starters,
+            starters_games: $starters_games
+        ) {
+            league_id
+        }
+    """,
+)
 
 
-def _check_graphql_errors(response) -> dict:
-    body = response.json()
+# the week's scores recorded apart from _initialize_app for ttl policies to read - written
+# before _initialize_app's own result is stored (so its ttl follows the games just fetched)
+# and kept long past it so an expired entry being recomputed still has a calendar
+SCHEDULE_KEY = "nfl_schedule"
+SCHEDULE_TTL = 7 * 24 * 3600
+
+
+# scores carry game statuses so they are refetched often while games are on
+@memoize(ttl=SchedulePolicy(volatile=300, default=3600, quiet=6 * 3600), config_keys=("SLEEPER_TOKEN",))
+def _initialize_app(season: int, week: int) -> dict:
+    """Everything league setup needs from graphql fetched in a single round trip"""
+    me, scores, teams = graphql.execute(
+        _graphql(),
+        GRAPHQL_URL,
+        [
+            INITIALIZE_APP(),
+            BATCH_SCORES(season=str(season), week=week),
+            TEAMS(),
+        ],
+    )
 
-    if "errors" in body:
-        raise RuntimeError(body["errors"])
+    get_cache().set(SCHEDULE_KEY, json.dumps(scores), SCHEDULE_TTL)
 
-    return body
+    return {"me": me, "scores": scores, "teams": teams}
 
 
-@memoize()
 def get_my_user_id() -> str:
     """Use the provided token to figure out the corresponding user ID"""
-    body = _check_graphql_errors(
-        _graphql.post(
-            "https://sleeper.com/graphql",
-            json={
-                "operationName": "initialize_app",
-                "variables": {},
-                "query": """
-                query initialize_app {
-                    me {
-                        user_id
-                    }
-                }
-            """,
-            },
-        )
-    )
+    league_settings = get_league_settings()
 
-    return body["data"]["me"]["user_id"]
+    return _initialize_app(league_settings.season, league_settings.week)["me"]["user_id"]
 
 
-@memoize()
+@memoize(config_keys=("SLEEPER_LEAGUE_ID",))
 def get_league_settings() -> LeagueSettings:
-    nfl_state = _rest.get("https://api.sleeper.app/v1/state/nfl").json()
-    league_state = _rest.get(f"https://api.sleeper.app/v1/league/{config.SLEEPER_LEAGUE_ID}").json()
+    nfl_state = _rest().get("https://api.sleeper.app/v1/state/nfl").json()
+    league_state = _rest().get(f"https://api.sleeper.app/v1/league/{config.SLEEPER_LEAGUE_ID}").json()
 
     ppr = league_state["scoring_settings"]["rec"]
     te_ppr = ppr + (league_state["scoring_settings"].get("bonus_rec_te") or 0)
@@ -79,10 +220,13 @@ def get_league_settings() -> LeagueSettings:
         reserve_slots=league_state["settings"]["reserve_slots"],
         ppr=ppr,
         te_ppr=te_ppr,
+        playoff_teams=int(league_state["settings"].get("playoff_teams") or 6),
+        playoff_week_start=int(league_state["settings"].get("playoff_week_start") or 15),
+        draft_rounds=int(league_state["settings"].get("draft_rounds") or 4),
     )
 
 
-@memoize()
+@memoize(config_keys=("SLEEPER_LEAGUE_ID",))
 def get_owners() -> list[Owner]:
     def map_owner(user) -> Owner:
         return Owner(
@@ -91,12 +235,12 @@ def get_owners() -> list[Owner]:
             avatar=user["avatar"],
         )
 
-    _users = _rest.get(f"https://api.sleeper.app/v1/league/{config.SLEEPER_LEAGUE_ID}/users").json()
+    _users = _rest().get(f"https://api.sleeper.app/v1/league/{config.SLEEPER_LEAGUE_ID}/users").json()
 
     return [map_owner(user) for user in _users]
 
 
-@memoize()
+@memoize(config_keys=("SLEEPER_LEAGUE_ID",))
 def get_rosters() -> list[Roster]:
     def map_roster(roster) -> Roster:
         bench_ids = (
@@ -105,6 +249,7 @@ def get_rosters() -> list[Roster]:
             - set(roster["reserve"] or [])
             - set(roster["taxi"] or [])
         )
+        settings = roster.get("settings") or {}
 
         return Roster(
             guid=str(roster["roster_id"]),
@@ -114,128 +259,127 @@ def get_rosters() -> list[Roster]:
             taxi=roster["taxi"],
             bench=list(bench_ids),
             player_ids=roster["players"],
+            wins=settings.get("wins") or 0,
+            losses=settings.get("losses") or 0,
+            ties=settings.get("ties") or 0,
+            points_for=(settings.get("fpts") or 0) + (settings.get("fpts_decimal") or 0) / 100,
         )
 
-    _rosters = _rest.get(f"https://api.sleeper.app/v1/league/{config.SLEEPER_LEAGUE_ID}/rosters").json()
+    _rosters = _rest().get(f"https://api.sleeper.app/v1/league/{config.SLEEPER_LEAGUE_ID}/rosters").json()
 
     return [map_roster(roster) for roster in _rosters]
 
 
-def drop_players(league: LeagueSettings, roster: Roster, player_ids: list[str]):
-    _check_graphql_errors(
-        _graphql.post(
-            "https://sleeper.com/graphql",
-            json={
-                "operationName": "league_create_transaction",
-                "variables": {
-                    "k_adds": [],
-                    "v_adds": [],
-                    "k_drops": player_ids,
-                    "v_drops": [int(roster.guid)],
-                },
-                "query": """
-            mutation league_create_transaction($k_adds: [String], $v_adds: [Int], $k_drops: [String], $v_drops: [Int]) {{
-                league_create_transaction(league_id: "{LEAGUE_ID}", type: "free_agent", k_adds: $k_adds, v_adds: $v_adds, k_drops: $k_drops, v_drops: $v_drops){{
-                    adds
-                    consenter_ids
-                    created
-                    creator
-                    drops
-                    league_id
-                    leg
-                    metadata
-                    roster_ids
-                    settings
-                    status
-                    status_updated
-                    transaction_id
-                    type
-                    player_map
-                }}
-            }}
-            """.format(
-                    LEAGUE_ID=league.guid,
-                ),
-            },
-        )
+def _drop_players(league: LeagueSettings, roster: Roster, player_ids: list[str]) -> graphql.Operation:
+    return LEAGUE_CREATE_TRANSACTION(
+        league_id=league.guid,
+        k_adds=[],
+        v_adds=[],
+        k_drops=player_ids,
+        v_drops=[int(roster.guid)],
     )
 
 
-def update_taxi(league: LeagueSettings, roster: Roster):
-    _check_graphql_errors(
-        _graphql.post(
-            "https://sleeper.com/graphql",
-            json={
-                "operationName": "roster_update_taxi",
-                "variables": {},
-                "query": """
-                mutation roster_update_taxi {{
-                    roster_update_taxi(league_id: "{LEAGUE_ID}",roster_id: {ROSTER_ID},taxi: {TAXI}){{
-                        league_id
-                    }}
-                }}
-            """.format(
-                    LEAGUE_ID=league.guid,
-                    ROSTER_ID=roster.guid,
-                    TAXI=json.dumps(roster.taxi),
-                ),
-            },
-        )
+def _update_taxi(league: LeagueSettings, roster: Roster) -> graphql.Operation:
+    return ROSTER_UPDATE_TAXI(league_id=league.guid, roster_id=int(roster.guid), taxi=roster.taxi)
+
+
+def _update_injured_reserve(league: LeagueSettings, roster: Roster) -> graphql.Operation:
+    return ROSTER_UPDATE_RESERVE(league_id=league.guid, roster_id=int(roster.guid), reserve=roster.reserve)
+
+
+def _update_starters(league: LeagueSettings, roster: Roster) -> graphql.Operation:
+    return UPDATE_MATCHUP_LEG(
+        league_id=league.guid,
+        roster_id=int(roster.guid),
+        week=league.week,
+        starters=roster.starters,
+        starters_games=None,
     )
 
 
+def drop_players(league: LeagueSettings, roster: Roster, player_ids: list[str]):
+    graphql.execute(_graphql(), GRAPHQL_URL, [_drop_players(league, roster, player_ids)])
+
+
+def update_taxi(league: LeagueSettings, roster: Roster):
+    graphql.execute(_graphql(), GRAPHQL_URL, [_update_taxi(league, roster)])
+
+
 def update_injured_reserve(league: LeagueSettings, roster: Roster):
-    _check_graphql_errors(
-        _graphql.post(
-            "https://sleeper.com/graphql",
-            json={
-                "operationName": "roster_update_reserve",
-                "variables": {},
-                "query": """
-                mutation roster_update_reserve {{
-                    roster_update_reserve(league_id: "{LEAGUE_ID}",roster_id: {ROSTER_ID},reserve: {RESERVES}){{
-                        league_id
-                    }}
-                }}
-            """.format(
-                    LEAGUE_ID=league.guid,
-                    ROSTER_ID=roster.guid,
-                    RESERVES=json.dumps(roster.reserve),
-                ),
-            },
-        )
-    )
+    graphql.execute(_graphql(), GRAPHQL_URL, [_update_injured_reserve(league, roster)])
 
 
 def update_starters(league: LeagueSettings, roster: Roster) -> Roster:
-    _check_graphql_errors(
-        _graphql.post(
-            "https://sleeper.com/graphql",
-            json={
-                "operationName": "update_matchup_leg",
-                "variables": {},
-                "query": """
-                mutation update_matchup_leg($starters_games: Map) {{
-                    update_matchup_leg(league_id: "{LEAGUE_ID}",roster_id: {ROSTER_ID},leg: {WEEK},round: {WEEK},starters: {STARTERS},starters_games: $starters_games){{
-                        league_id
-                    }}
-                }}
-            """.format(
-                    LEAGUE_ID=league.guid,
-                    ROSTER_ID=roster.guid,
-                    WEEK=league.week,
-                    STARTERS=json.dumps(roster.starters),
-                ),
-            },
-        )
-    )
+    graphql.execute(_graphql(), GRAPHQL_URL, [_update_starters(league, roster)])
 
     return roster
 
 
-@memoize()
+def update_roster(league: LeagueSettings, roster: Roster, drop_player_ids: list[str], taxi: bool = False) -> Roster:
+    """
+    Apply every roster change in at most two requests.
+
+    Sleeper requires all non-IR eligible players to be moved from IR and roster size
+    to be correct before starters can be adjusted - mutations run in the order given.
+    Drops are sent on their own first since the rest of a batch still runs when one of
+    its mutations fails, and nothing else is applied when they fail.
+    """
+    if drop_player_ids:
+        drop_players(league, roster, drop_player_ids)
+
+    operations = [_update_injured_reserve(league, roster), _update_starters(league, roster)]
+
+    if taxi:
+        operations.append(_update_taxi(league, roster))
+
+    graphql.execute(_graphql(), GRAPHQL_URL, operations)
+
+    return roster
+
+
+@memoize(config_keys=("SLEEPER_LEAGUE_ID",))
+def get_traded_picks() -> list[DraftPick]:
+    """Only picks that changed hands - every other pick is still owned by its original roster"""
+
+    def map_pick(pick) -> DraftPick:
+        return DraftPick(
+            season=int(pick["season"]),
+            round=int(pick["round"]),
+            roster=str(pick["roster_id"]),
+            owner=str(pick["owner_id"]),
+        )
+
+    picks = _rest().get(f"https://api.sleeper.app/v1/league/{config.SLEEPER_LEAGUE_ID}/traded_picks").json()
+
+    return [map_pick(pick) for pick in picks]
+
+
+def get_transactions(week: int) -> list[Transaction]:
+    """Not memoized - this is the feed used to decide whether anything changed"""
+
+    def map_transaction(transaction) -> Transaction:
+        return Transaction(
+            guid=str(transaction["transaction_id"]),
+            type=transaction["type"],
+            status=transaction["status"],
+            week=int(transaction.get("leg") or week),
+            updated=int(transaction.get("status_updated") or 0),
+            roster_ids=[str(roster_id) for roster_id in transaction.get("roster_ids") or []],
+            adds={player_id: str(roster_id) for player_id, roster_id in (transaction.get("adds") or {}).items()},
+            drops={player_id: str(roster_id) for player_id, roster_id in (transaction.get("drops") or {}).items()},
+        )
+
+    transactions = _rest().get(
+        f"https://api.sleeper.app/v1/league/{config.SLEEPER_LEAGUE_ID}/transactions/{str(week)}"
+    ).json()
+
+    return sorted((map_transaction(transaction) for transaction in transactions), key=lambda tx: tx.updated)
+
+
+@memoize(config_keys=("SLEEPER_LEAGUE_ID",))
 def get_matchups(week: int) -> list[Matchup]:
-    matchups = _rest.get(f"https://api.sleeper.app/v1/league/{config.SLEEPER_LEAGUE_ID}/matchups/{str(week)}").json()
+    matchups = _rest().get(f"https://api.sleeper.app/v1/league/{config.SLEEPER_LEAGUE_ID}/matchups/{str(week)}").json()
 
     # matchups are singular by matchup_id can be used to group the pairs
     _matchups: dict[str, list] = defaultdict(list)
@@ -253,7 +397,108 @@ def get_matchups(week: int) -> list[Matchup]:
     return [map_matchup(guid, matchups) for guid, matchups in _matchups.items()]
 
 
-@memoize(ttl=24 * 3600)  # api docs ask to not hit this API more than once a day :shrug:
+@memoize(ttl=SchedulePolicy(volatile=900, default=3600, quiet=6 * 3600))
+def get_projections(season: int, week: int, ppr: float, te_ppr: float) -> Projections:
+    """Projected points for every player in a week scored with the league's reception scoring"""
+    entries = _rest().get(
+        f"https://api.sleeper.app/projections/nfl/{season}/{week}",
+        params={"season_type": "regular", "position[]": ["QB", "RB", "WR", "TE", "K", "DEF"]},
+        timeout=10,
+    ).json()
+
+    player_ids, points = [], []
+
+    for entry in entries:
+        stats = entry.get("stats") or {}
+        receptions = stats.get("rec") or 0
+
+        # standard points plus the league's own per reception bonus (and TE premium)
+        reception_points = te_ppr if (entry.get("player") or {}).get("position") == "TE" else ppr
+
+        player_ids.append(str(entry["player_id"]))
+        points.append((stats.get("pts_std") or 0) + reception_points * receptions)
+
+    return Projections(season=season, week=week, player_ids=player_ids, points=points)
+
+
+# refreshes of the players dump record which players changed here so runs can tell whether
+# any rostered player moved. the log is a hash with an "{at}:{player ID}" field per change
+# holding the changed fields - refreshes only ever add fields so concurrent refreshes (ex.
+# job workers) never overwrite each other's changes. a replaced map is logged as "{at}:"
+PLAYER_CHANGES_KEY = "player_change_log"
+PLAYER_CHANGES_TTL = 7 * 24 * 3600
+
+# fields that come from the dump - values and bye weeks are filled in by League
+PLAYER_FIELDS = tuple(
+    field.name for field in dataclasses.fields(Player) if field.name not in ("dynasty", "redraft", "bye_week")
+)
+
+
+def _load_player_changes() -> list[tuple[float, str, list[str]]]:
+    """Every logged (at, player ID, fields) - player ID is empty when the map was replaced"""
+    entries = []
+
+    for field, raw in get_cache().hscan(PLAYER_CHANGES_KEY):
+        at, player_id = field.split(":", 1)
+        entries.append((float(at), player_id, json.loads(raw)))
+
+    return entries
+
+
+def _record_player_changes(previous: dict[str, Player] | None, current: dict[str, Player]):
+    now = time.time()
+    entries = {}
+
+    if previous is None:
+        # the map was replaced without anything to diff against so any player may have changed
+        entries[f"{now}:"] = "[]"
+    else:
+        for player_id in sorted(previous.keys() | current.keys()):
+            old, new = previous.get(player_id), current.get(player_id)
+
+            if old is None or new is None:
+                fields = ["active"]
+            else:
+                fields = [name for name in PLAYER_FIELDS if getattr(old, name) != getattr(new, name)]
+
+            if fields:
+                entries[f"{now}:{player_id}"] = json.dumps(fields)
+
+    expired = [
+        at for at, _ in get_cache().hscan(PLAYER_CHANGES_KEY) if float(at.split(":")[0]) <= now - PLAYER_CHANGES_TTL
+    ]
+
+    get_cache().hupdate(PLAYER_CHANGES_KEY, entries, expired, PLAYER_CHANGES_TTL)
+
+
+def get_player_changes(since: float) -> tuple[list[PlayerChange], float | None]:
+    """
+    Players changed by refreshes after since and when the map was last replaced wholesale
+    after since (None when it wasn't) - anything may have changed at that point.
+    """
+    entries = [entry for entry in _load_player_changes() if entry[0] > since]
+
+    changes = [PlayerChange(guid=guid, at=at, fields=fields) for at, guid, fields in sorted(entries) if guid]
+    resets = [at for at, guid, _ in entries if not guid]
+
+    return changes, max(resets, default=None)
+
+
+def player_changes_cursor() -> float:
+    """Time of the latest recorded refresh - pass it as since to only see later changes"""
+    return max((at for at, _, _ in _load_player_changes()), default=0.0)
+
+
+# api docs ask to not hit this API more than once a day :shrug: - except while injury
+# statuses are flipping on game days and after injury reports.
+# keyed so callers needing a few players use get_player_map.get_many(player_ids) instead of decoding all of them.
+# a baseline copy outlives the ttl so refreshing an expired map still records only what changed
+@memoize(
+    ttl=SchedulePolicy(volatile=1800, default=24 * 3600, quiet=24 * 3600),
+    keyed=True,
+    on_change=_record_player_changes,
+    baseline_ttl=PLAYER_CHANGES_TTL,
+)
 def get_player_map() -> dict[str, Player]:
     def map_player(player) -> Player:
         return Player(
@@ -269,36 +514,12 @@ def get_player_map() -> dict[str, Player]:
 
     return {
         player_id: map_player(player)
-        for player_id, player in _rest.get("https://api.sleeper.app/v1/players/nfl").json().items()
+        for player_id, player in _rest().get("https://api.sleeper.app/v1/players/nfl").json().items()
         if player.get("active")
     }
 
 
-@memoize()
-def get_games() -> dict[str, Game]:
-    league_settings = get_league_settings()
-
-    body = _check_graphql_errors(
-        _graphql.post(
-            "https://sleeper.com/graphql",
-            json={
-                "operationName": "batch_scores",
-                "variables": {},
-                "query": """
-                    query batch_scores {{
-                        scores(sport: "nfl",season_type: "regular",season: "{SEASON}",week: {WEEK}){{
-                            date
-                            game_id
-                            metadata
-                            status
-                            start_time
-                        }}
-                    }}
-                """.format(SEASON=league_settings.season, WEEK=league_settings.week),
-            },
-        )
-    )
-
+def _map_games(scores: list[dict]) -> dict[str, Game]:
     def map_game(game) -> Game:
         return Game(
             guid=game["game_id"],
@@ -307,34 +528,26 @@ def get_games() -> dict[str, Game]:
             status=game["status"],
         )
 
-    games = [map_game(game) for game in body["data"]["scores"]]
+    games = [map_game(game) for game in scores]
 
     return {team: game for game in games for team in game.teams}
 
 
-@memoize()
+def get_games() -> dict[str, Game]:
+    league_settings = get_league_settings()
+    return _map_games(_initialize_app(league_settings.season, league_settings.week)["scores"])
+
+
+def peek_games() -> dict[str, Game] | None:
+    """The most recently fetched week's games - None rather than fetching when none were recorded"""
+    raw = get_cache().get(SCHEDULE_KEY)
+
+    return None if raw is None else _map_games(json.loads(raw))
+
+
 def get_teams() -> list[Team]:
-    body = _check_graphql_errors(
-        _graphql.post(
-            "https://sleeper.com/graphql",
-            json={
-                "operationName": "teams",
-                "variables": {},
-                "query": """
-                    query teams {
-                        teams(sport: "nfl") {
-                            active
-                            aliases
-                            metadata
-                            name
-                            sport
-                            team
-                        }
-                    }
-            """,
-            },
-        )
-    )
+    league_settings = get_league_settings()
+    teams = _initialize_app(league_settings.season, league_settings.week)["teams"]
 
     games = get_games()
 
@@ -346,4 +559,4 @@ def get_teams() -> list[Team]:
             game=games.get(team["team"]),
         )
 
-    return [map_team(team) for team in body["data"]["teams"]]
+    return [map_team(team) for team in teams]
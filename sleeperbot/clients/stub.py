@@ -0,0 +1,54 @@
+import json
+from urllib.parse import (
+    parse_qs,
+    urlparse,
+)
+
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+class StubAdapter(BaseAdapter):
+    """
+    Transport adapter answering every request from a local backend instead of the
+    network - mounted on the client sessions to run against synthetic leagues.
+
+    backend.handle(method, host, path, query, body) returns (status code, payload) where
+    payload is either text or anything json serializable.
+    """
+
+    def __init__(self, backend):
+        super().__init__()
+        self.backend = backend
+        self.requests = 0
+
+    def send(self, request, **kwargs):
+        url = urlparse(request.url)
+        body = request.body.decode() if isinstance(request.body, bytes) else request.body
+
+        status, payload = self.backend.handle(
+            request.method,
+            url.hostname,
+            url.path,
+            parse_qs(url.query),
+            json.loads(body) if body else None,
+        )
+
+        self.requests += 1
+
+        response = Response()
+        response.status_code = status
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.encoding = "utf-8"
+        response.headers = CaseInsensitiveDict(
+            {"Content-Type": "text/html" if isinstance(payload, str) else "application/json"}
+        )
+        response._content = (payload if isinstance(payload, str) else json.dumps(payload)).encode()
+
+        return response
+
+    def close(self):
+        pass
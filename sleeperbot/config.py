@@ -3,8 +3,10 @@ from dataclasses import (
     dataclass,
     field,
 )
+from typing import TYPE_CHECKING
 
-import redis
+if TYPE_CHECKING:
+    import redis
 
 
 def load_from_env(name, tipe=str, required=False, default=None):
@@ -40,21 +42,64 @@ class Config:
     REDIS_DB: int = load_from_env("REDIS_DB", tipe=int, default=0)
     REDIS_SSL: bool = load_from_env("REDIS_ENABLE_SSL", tipe=bool, default=False)
 
+    # only used when redis is not configured
+    CACHE_MEMORY_BYTES: int = load_from_env("CACHE_MEMORY_BYTES", tipe=int, default=128 * 1024 * 1024)
+    CACHE_STORE_OBJECTS: bool = load_from_env("CACHE_STORE_OBJECTS", tipe=bool, default=False)
+
+    RATE_LIMIT_ENABLED: bool = load_from_env("RATE_LIMIT_ENABLED", tipe=bool, default=True)
+    RATE_LIMIT_SHARED: bool = load_from_env("RATE_LIMIT_SHARED", tipe=bool, default=True)
+
+    SNAPSHOT_PATH: str = load_from_env("SNAPSHOT_PATH", tipe=str, default="/tmp/sleeperbot.snapshot")
+    SNAPSHOT_BUNDLE_PATH: str = load_from_env("SNAPSHOT_BUNDLE_PATH", tipe=str, default="sleeperbot.snapshot")
+    SNAPSHOT_MAX_AGE: int = load_from_env("SNAPSHOT_MAX_AGE", tipe=int, default=12 * 3600)
+
+    LEAGUE_SNAPSHOT_TTL: int = load_from_env("LEAGUE_SNAPSHOT_TTL", tipe=int, default=3600)
+
+    # directory for the append-only value history - empty disables recording
+    VALUE_HISTORY_PATH: str = load_from_env("VALUE_HISTORY_PATH", tipe=str, default="")
+
+    # value sources are skipped for BREAKER_COOLDOWN seconds after BREAKER_FAILURES consecutive
+    # failures or responses slower than BREAKER_LATENCY seconds
+    BREAKER_FAILURES: int = load_from_env("BREAKER_FAILURES", tipe=int, default=3)
+    BREAKER_LATENCY: float = load_from_env("BREAKER_LATENCY", tipe=float, default=8.0)
+    BREAKER_COOLDOWN: int = load_from_env("BREAKER_COOLDOWN", tipe=int, default=900)
+
+    # how long the last successfully fetched values are kept to fall back on
+    LAST_KNOWN_GOOD_TTL: int = load_from_env("LAST_KNOWN_GOOD_TTL", tipe=int, default=7 * 24 * 3600)
+
+    # warm-cache refreshes memoized entries expiring within WARM_MARGIN seconds (or before the
+    # next scheduled run) - MANAGE_WARM_CACHE runs it at the end of every manager run
+    WARM_MARGIN: int = load_from_env("WARM_MARGIN", tipe=int, default=900)
+    WARM_WORKERS: int = load_from_env("WARM_WORKERS", tipe=int, default=8)
+    MANAGE_WARM_CACHE: bool = load_from_env("MANAGE_WARM_CACHE", tipe=bool, default=False)
+
     WEIGHT_KTC: float = load_from_env("WEIGHT_KTC", tipe=float, default=1.0)
     WEIGHT_FANTASY_CALC: float = load_from_env("WEIGHT_FANTASY_CALC", tipe=float, default=1.0)
 
     MANAGE_ROSTER: bool = load_from_env("MANAGE_ROSTER", tipe=bool, default=False)
     MANAGE_TAXI: bool = load_from_env("MANAGE_TAXI", tipe=bool, default=False)
 
+    # skip optimizing (and mutating) the roster when nothing affecting it changed since the last run
+    MANAGE_ONLY_ON_CHANGE: bool = load_from_env("MANAGE_ONLY_ON_CHANGE", tipe=bool, default=False)
+
+    # prometheus or emf (CloudWatch embedded metric format) - empty disables writing metrics
+    METRICS_FORMAT: str = load_from_env("METRICS_FORMAT", tipe=str, default="")
+    # file metrics are written to at the end of a run (ex. a node exporter textfile) - stdout when empty
+    METRICS_PATH: str = load_from_env("METRICS_PATH", tipe=str, default="")
+    METRICS_NAMESPACE: str = load_from_env("METRICS_NAMESPACE", tipe=str, default="sleeperbot")
+
     LOG_LEVEL: str = load_from_env("LOG_LEVEL", tipe=str, default="INFO")
     LOG_CONSOLE: bool = load_from_env("LOG_CONSOLE", tipe=bool, default=False)
 
     @property
-    def redis(self) -> redis.Redis | None:
+    def redis(self) -> "redis.Redis | None":
         if not self.REDIS_HOST:
             return None
 
         if not hasattr(self, "_redis"):
+            # imported here so runs without redis configured never pay for importing it
+            import redis
+
             self._redis = redis.Redis(
                 host=self.REDIS_HOST,
                 port=self.REDIS_PORT,
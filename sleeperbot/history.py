@@ -0,0 +1,261 @@
+import bisect
+import json
+import os
+import struct
+import time
+from array import array
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import (
+    UTC,
+    date,
+    datetime,
+    timedelta,
+)
+
+import brotli
+import structlog
+
+from sleeperbot import config
+from sleeperbot.models import Player
+
+log = structlog.get_logger()
+
+# history is one append-only file per UTC day holding a frame per fetched valuation
+# snapshot. each frame is length prefixed with its meta left uncompressed (so frames of
+# other sources are skipped without decompressing them) ahead of brotli compressed columns:
+#
+#     4 byte frame length | 4 byte meta length | meta json | compressed columns
+#
+# columns are ids | alternate ids | id order | alternate id order | float32 values | float32 trends
+# where the orders are the rows sorted by each ID so a player is found by binary search.
+# entries without a sleeper ID (ex. draft picks) are stored with an empty ID
+_LENGTH = struct.Struct("<I")
+_COLUMN_TYPE = "f"
+_ORDER_TYPE = "I"
+
+
+@dataclass
+class Frame:
+    timestamp: float
+    source: str
+    dynasty: bool
+    ids: list[str]
+    alternate_ids: list[str]
+    values: array
+    trends: array
+    order: array
+    alternate_order: array
+
+    def index(self, player_id: str) -> int | None:
+        if not player_id:
+            return None
+
+        for ids, order in ((self.ids, self.order), (self.alternate_ids, self.alternate_order)):
+            position = bisect.bisect_left(order, player_id, key=ids.__getitem__)
+
+            if position < len(order) and ids[order[position]] == player_id:
+                return order[position]
+
+        return None
+
+
+@dataclass
+class Point:
+    timestamp: float
+    value: float
+    trend: float
+
+    @property
+    def when(self) -> datetime:
+        return datetime.utcfromtimestamp(self.timestamp)
+
+
+def _day_path(day: date) -> str:
+    return os.path.join(config.VALUE_HISTORY_PATH, f"{day.isoformat()}.values")
+
+
+def record(source: str, dynasty: bool, players: list[Player], timestamp: float | None = None):
+    """Append a valuation snapshot - a no-op unless VALUE_HISTORY_PATH is configured"""
+    if not config.VALUE_HISTORY_PATH:
+        return
+
+    try:
+        _record(source, dynasty, players, timestamp or time.time())
+    except Exception:
+        # history is for analysis only and must never fail a run
+        log.exception("Unable to record value history", source=source)
+
+
+def _order(ids: list[str]) -> array:
+    return array(_ORDER_TYPE, sorted(range(len(ids)), key=ids.__getitem__))
+
+
+def _record(source: str, dynasty: bool, players: list[Player], timestamp: float):
+    values, trends = array(_COLUMN_TYPE), array(_COLUMN_TYPE)
+
+    for player in players:
+        player_value = player.dynasty if dynasty else player.redraft
+        values.append(player_value.values.get(source) or 0.0)
+        trends.append(player_value.trends.get(source) or 0.0)
+
+    ids = [player.guid or "" for player in players]
+    alternate_ids = [player.alternate_id for player in players]
+
+    raw_ids, raw_alternate_ids = "\n".join(ids).encode(), "\n".join(alternate_ids).encode()
+
+    meta = json.dumps(
+        {
+            "timestamp": timestamp,
+            "source": source,
+            "dynasty": dynasty,
+            "ids": len(raw_ids),
+            "alternate_ids": len(raw_alternate_ids),
+            "count": len(players),
+        }
+    ).encode()
+
+    columns = brotli.compress(
+        raw_ids
+        + raw_alternate_ids
+        + _order(ids).tobytes()
+        + _order(alternate_ids).tobytes()
+        + values.tobytes()
+        + trends.tobytes()
+    )
+    frame = _LENGTH.pack(len(meta)) + meta + columns
+
+    os.makedirs(config.VALUE_HISTORY_PATH, exist_ok=True)
+
+    with open(_day_path(datetime.utcfromtimestamp(timestamp).date()), "ab") as fp:
+        fp.write(_LENGTH.pack(len(frame)) + frame)
+
+
+def _decode(meta: dict, raw: bytes) -> Frame:
+    count = meta["count"]
+    offset = 0
+
+    def take(size: int) -> bytes:
+        nonlocal offset
+
+        offset += size
+        return raw[offset - size : offset]
+
+    def column(tipe: str) -> array:
+        values = array(tipe)
+        values.frombytes(take(count * values.itemsize))
+        return values
+
+    ids = take(meta["ids"]).decode().split("\n") if count else []
+    alternate_ids = take(meta["alternate_ids"]).decode().split("\n") if count else []
+
+    order, alternate_order = column(_ORDER_TYPE), column(_ORDER_TYPE)
+
+    return Frame(
+        timestamp=meta["timestamp"],
+        source=meta["source"],
+        dynasty=meta["dynasty"],
+        ids=ids,
+        alternate_ids=alternate_ids,
+        values=column(_COLUMN_TYPE),
+        trends=column(_COLUMN_TYPE),
+        order=order,
+        alternate_order=alternate_order,
+    )
+
+
+def frames(start: date, end: date, source: str | None = None, dynasty: bool | None = None) -> Iterator[Frame]:
+    """Every recorded snapshot between start and end (inclusive) in the order recorded"""
+    day = start
+
+    while day <= end:
+        try:
+            with open(_day_path(day), "rb") as fp:
+                raw = fp.read()
+        except FileNotFoundError:
+            raw = b""
+
+        offset = 0
+        while offset < len(raw):
+            (size,) = _LENGTH.unpack_from(raw, offset)
+            (meta_size,) = _LENGTH.unpack_from(raw, offset + _LENGTH.size)
+
+            start = offset + 2 * _LENGTH.size
+            offset += _LENGTH.size + size
+
+            meta = json.loads(raw[start : start + meta_size])
+
+            if source not in (None, meta["source"]) or dynasty not in (None, meta["dynasty"]):
+                continue
+
+            yield _decode(meta, brotli.decompress(raw[start + meta_size : offset]))
+
+        day += timedelta(days=1)
+
+
+def series(source: str, dynasty: bool, player_id: str, start: date, end: date) -> list[Point]:
+    """Value history of a single player - player_id may be the source ID or alternate ID"""
+    points = []
+
+    for frame in frames(start, end, source=source, dynasty=dynasty):
+        idx = frame.index(player_id)
+
+        if idx is not None:
+            points.append(Point(timestamp=frame.timestamp, value=frame.values[idx], trend=frame.trends[idx]))
+
+    return points
+
+
+def values_at(source: str, dynasty: bool, when: datetime) -> dict[str, float]:
+    """
+    Latest recorded value per player at or before when - keyed by alternate ID. A naive when
+    is UTC (ex. datetime.utcnow()) rather than the host's local time.
+    """
+    when = when.replace(tzinfo=UTC) if when.tzinfo is None else when.astimezone(UTC)
+    latest = None
+
+    for frame in frames(when.date() - timedelta(days=7), when.date(), source=source, dynasty=dynasty):
+        if frame.timestamp <= when.timestamp():
+            latest = frame
+
+    if latest is None:
+        return {}
+
+    return dict(zip(latest.alternate_ids, latest.values))
+
+
+def downsample(points: list[Point], interval: timedelta, how: str = "last") -> list[Point]:
+    """Collapse points into one per interval using either the last or mean value"""
+    buckets: dict[int, list[Point]] = {}
+
+    for point in points:
+        buckets.setdefault(int(point.timestamp // interval.total_seconds()), []).append(point)
+
+    def collapse(bucket: list[Point]) -> Point:
+        if how == "last":
+            return bucket[-1]
+
+        if how == "mean":
+            return Point(
+                timestamp=bucket[-1].timestamp,
+                value=sum(point.value for point in bucket) / len(bucket),
+                trend=sum(point.trend for point in bucket) / len(bucket),
+            )
+
+        raise ValueError(f"Unknown downsample method {how}")
+
+    return [collapse(buckets[key]) for key in sorted(buckets)]
+
+
+def trend(points: list[Point], window: timedelta) -> float | None:
+    """Change in value over the trailing window ending at the last point"""
+    if not points:
+        return None
+
+    cutoff = points[-1].timestamp - window.total_seconds()
+    baseline = next((point for point in reversed(points) if point.timestamp <= cutoff), None)
+
+    if baseline is None:
+        return None
+
+    return points[-1].value - baseline.value
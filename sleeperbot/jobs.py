@@ -0,0 +1,371 @@
+import contextlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from dataclasses import (
+    asdict,
+    dataclass,
+    field,
+)
+
+import structlog
+
+from sleeperbot import (
+    config,
+    manager,
+    metrics,
+)
+from sleeperbot.clients import sleeper
+
+log = structlog.get_logger()
+
+# reliable queue - workers atomically move a job ID from pending to processing and hold a
+# lease on it while working. jobs whose lease expired (the worker died) are requeued.
+PENDING = "jobs_pending"
+PROCESSING = "jobs_processing"
+RESULTS = "jobs_results"
+
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+
+# a job lands in processing a moment before its lease is set so a job without a lease is
+# only treated as abandoned once it has been seen without one for this long
+CLAIM_GRACE = 60
+
+RESULT_TTL = 7 * 24 * 3600
+MAX_RESULTS = 1000
+
+# config a job may override - everything else comes from the worker's environment
+JOB_OPTIONS = ("MANAGE_ROSTER", "MANAGE_TAXI", "MANAGE_ONLY_ON_CHANGE")
+
+# jobs may only name token variables with this prefix (ex. SLEEPER_TOKEN_LEAGUE2) so whoever
+# enqueues can't make a worker send any other variable (ex. cloud credentials) upstream
+TOKEN_REF_PREFIX = "SLEEPER_TOKEN"
+
+JOB_SECONDS = metrics.Histogram("job_seconds", "Seconds", "Time to run a queued league job")
+
+
+class JobError(RuntimeError):
+    """A job that can never succeed on this worker - failed without being retried"""
+
+
+@dataclass
+class Job:
+    league_id: str
+
+    # worker environment variable holding the league's sleeper token - tokens never enter the queue
+    token_ref: str = "SLEEPER_TOKEN"
+
+    options: dict[str, bool] = field(default_factory=dict)
+
+    guid: str = field(default_factory=lambda: uuid.uuid4().hex)
+    attempts: int = 0
+    enqueued: float = field(default_factory=time.time)
+
+
+@dataclass
+class JobResult:
+    job: str
+    league_id: str
+
+    # complete
+    # failed - raised on its last attempt
+    # abandoned - the worker died on its last attempt
+    # retrying - only returned by process when the job was requeued, never stored
+    status: str
+
+    attempts: int
+    worker: str | None
+    queued_seconds: float
+    run_seconds: float
+    finished: float
+    output: dict | None = None
+    error: str | None = None
+
+
+def _redis():
+    if not config.redis:
+        raise RuntimeError("The job queue requires REDIS_HOST to be configured")
+
+    return config.redis
+
+
+def _job_key(guid: str) -> str:
+    return f"job_{guid}"
+
+
+def _lease_key(guid: str) -> str:
+    return f"job_lease_{guid}"
+
+
+def _result_key(guid: str) -> str:
+    return f"job_result_{guid}"
+
+
+def _orphaned_key(guid: str) -> str:
+    return f"job_orphaned_{guid}"
+
+
+def _valid_token_ref(token_ref: str) -> bool:
+    return token_ref == TOKEN_REF_PREFIX or token_ref.startswith(f"{TOKEN_REF_PREFIX}_")
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue(jobs: list[Job]) -> list[str]:
+    for job in jobs:
+        unknown = set(job.options) - set(JOB_OPTIONS)
+
+        if unknown:
+            raise ValueError(f"Jobs can't override {unknown}")
+
+        if not _valid_token_ref(job.token_ref):
+            raise ValueError(f"Job token_ref must start with {TOKEN_REF_PREFIX} - got {job.token_ref}")
+
+    pipeline = _redis().pipeline(transaction=True)
+
+    for job in jobs:
+        pipeline.set(_job_key(job.guid), json.dumps(asdict(job)), ex=RESULT_TTL)
+        pipeline.lpush(PENDING, job.guid)
+
+    pipeline.execute()
+
+    return [job.guid for job in jobs]
+
+
+def _load(guid: str) -> Job | None:
+    raw = _redis().get(_job_key(guid))
+    return Job(**json.loads(raw)) if raw else None
+
+
+def claim(timeout: int = 5) -> Job | None:
+    """Take the oldest pending job and lease it to this worker"""
+    redis = _redis()
+
+    guid = redis.blmove(PENDING, PROCESSING, timeout, "RIGHT", "LEFT")
+    if guid is None:
+        return None
+
+    guid = guid.decode()
+
+    pipeline = redis.pipeline(transaction=True)
+    pipeline.set(_lease_key(guid), worker_id(), ex=LEASE_SECONDS)
+    # a reaper may have seen the job before the lease was set
+    pipeline.delete(_orphaned_key(guid))
+    pipeline.execute()
+
+    job = _load(guid)
+    if job is None:
+        # the payload expired while queued - nothing left to run
+        redis.lrem(PROCESSING, 1, guid)
+        return None
+
+    job.attempts += 1
+    redis.set(_job_key(guid), json.dumps(asdict(job)), ex=RESULT_TTL)
+
+    return job
+
+
+def _finish(job: Job, result: JobResult):
+    pipeline = _redis().pipeline(transaction=True)
+
+    pipeline.set(_result_key(job.guid), json.dumps(asdict(result)), ex=RESULT_TTL)
+    pipeline.lpush(RESULTS, job.guid)
+    pipeline.ltrim(RESULTS, 0, MAX_RESULTS - 1)
+    pipeline.lrem(PROCESSING, 1, job.guid)
+    pipeline.delete(_lease_key(job.guid), _job_key(job.guid), _orphaned_key(job.guid))
+
+    pipeline.execute()
+
+
+def _retry(job: Job):
+    pipeline = _redis().pipeline(transaction=True)
+
+    pipeline.lrem(PROCESSING, 1, job.guid)
+    pipeline.lpush(PENDING, job.guid)
+    pipeline.delete(_lease_key(job.guid), _orphaned_key(job.guid))
+
+    pipeline.execute()
+
+
+def reap() -> int:
+    """Requeue jobs whose worker stopped renewing its lease - returns how many were requeued"""
+    redis = _redis()
+    requeued = 0
+
+    for raw in redis.lrange(PROCESSING, 0, -1):
+        guid = raw.decode()
+
+        if redis.exists(_lease_key(guid)):
+            continue
+
+        # the job may have only just been claimed - give its worker CLAIM_GRACE to set the lease
+        pipeline = redis.pipeline(transaction=True)
+        pipeline.set(_orphaned_key(guid), time.time(), nx=True, ex=RESULT_TTL)
+        pipeline.get(_orphaned_key(guid))
+        _, orphaned = pipeline.execute()
+
+        if time.time() - float(orphaned) < CLAIM_GRACE:
+            continue
+
+        # only whoever removes the job from processing gets to requeue it
+        if not redis.lrem(PROCESSING, 1, guid):
+            continue
+
+        redis.delete(_orphaned_key(guid))
+
+        job = _load(guid)
+        if job is None:
+            continue
+
+        if job.attempts >= MAX_ATTEMPTS:
+            log.warning("abandoning job", job=guid, league_id=job.league_id, attempts=job.attempts)
+            _finish(job, _result(job, "abandoned", worker=None, run_seconds=0.0, error="lease expired"))
+            continue
+
+        log.warning("requeueing job with expired lease", job=guid, league_id=job.league_id)
+        redis.lpush(PENDING, guid)
+        requeued += 1
+
+    return requeued
+
+
+def _result(job: Job, status: str, worker: str | None, run_seconds: float, **kwargs) -> JobResult:
+    finished = time.time()
+
+    return JobResult(
+        job=job.guid,
+        league_id=job.league_id,
+        status=status,
+        attempts=job.attempts,
+        worker=worker,
+        queued_seconds=max(0.0, finished - run_seconds - job.enqueued),
+        run_seconds=run_seconds,
+        finished=finished,
+        **kwargs,
+    )
+
+
+@contextlib.contextmanager
+def _lease(job: Job):
+    """Keep renewing the job's lease until the block exits"""
+    stop = threading.Event()
+
+    def renew():
+        while not stop.wait(LEASE_SECONDS / 3):
+            _redis().expire(_lease_key(job.guid), LEASE_SECONDS)
+
+    thread = threading.Thread(target=renew, daemon=True)
+    thread.start()
+
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+@contextlib.contextmanager
+def _job_config(job: Job):
+    """Point config at the job's league and token for the duration of the block"""
+    # checked again since jobs can be pushed to redis without enqueue
+    if not _valid_token_ref(job.token_ref):
+        raise JobError(f"Jobs can't read {job.token_ref}")
+
+    token = os.environ.get(job.token_ref)
+    if not token:
+        raise JobError(f"{job.token_ref} is not set on this worker")
+
+    overrides = {
+        "SLEEPER_LEAGUE_ID": job.league_id,
+        "SLEEPER_TOKEN": token,
+        **{name: bool(value) for name, value in job.options.items() if name in JOB_OPTIONS},
+    }
+
+    previous = {name: getattr(config, name) for name in overrides}
+
+    for name, value in overrides.items():
+        setattr(config, name, value)
+
+    # the graphql session carries the token in its headers
+    sleeper._graphql.cache_clear()
+
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(config, name, value)
+
+        sleeper._graphql.cache_clear()
+
+
+def process(job: Job) -> JobResult:
+    """
+    Run a claimed job - failed jobs are requeued until they run out of attempts unless they
+    raised JobError (retrying can't help)
+    """
+    log.info("running job", job=job.guid, league_id=job.league_id, attempt=job.attempts)
+    start = time.perf_counter()
+
+    try:
+        with _lease(job), _job_config(job):
+            output = manager.run()
+    except Exception as error:
+        run_seconds = time.perf_counter() - start
+        JOB_SECONDS.observe(run_seconds, status="failed")
+
+        if job.attempts < MAX_ATTEMPTS and not isinstance(error, JobError):
+            log.exception("job failed - requeueing", job=job.guid, league_id=job.league_id)
+            _retry(job)
+            return _result(job, "retrying", worker=worker_id(), run_seconds=run_seconds, error=repr(error))
+
+        log.exception("job failed", job=job.guid, league_id=job.league_id)
+        result = _result(job, "failed", worker=worker_id(), run_seconds=run_seconds, error=repr(error))
+    else:
+        run_seconds = time.perf_counter() - start
+        JOB_SECONDS.observe(run_seconds, status="complete")
+
+        result = _result(job, "complete", worker=worker_id(), run_seconds=run_seconds, output=output)
+
+    _finish(job, result)
+    log.info("job finished", job=job.guid, league_id=job.league_id, status=result.status, seconds=run_seconds)
+
+    return result
+
+
+def run_worker(once: bool = False):
+    """Pull and run jobs until stopped - or until the queue is empty when once is set"""
+    last_reap = 0.0
+
+    while True:
+        if time.monotonic() - last_reap > LEASE_SECONDS / 2:
+            reap()
+            last_reap = time.monotonic()
+
+        job = claim()
+
+        if job is None:
+            if once:
+                return
+
+            continue
+
+        try:
+            process(job)
+        finally:
+            metrics.flush()
+
+
+def results(limit: int = 20) -> list[JobResult]:
+    """Most recently finished jobs first"""
+    redis = _redis()
+    guids = [raw.decode() for raw in redis.lrange(RESULTS, 0, limit - 1)]
+
+    raw_results = redis.mget([_result_key(guid) for guid in guids]) if guids else []
+
+    return [JobResult(**json.loads(raw)) for raw in raw_results if raw]
@@ -1,19 +1,48 @@
+import dataclasses
+import re
+from collections import defaultdict
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
 from datetime import datetime
+from itertools import repeat
 
+import brotli
 import structlog
 
-from sleeperbot.clients import (
-    fantasy_calc,
-    ktc,
-    sleeper,
-)
+from sleeperbot import config
+from sleeperbot.clients import sleeper
 from sleeperbot.models import (
+    DraftPick,
+    LeagueSettings,
+    LineupReport,
     Player,
+    PlayerValue,
+    Projections,
     Roster,
+    deserialize,
+    serialize,
+)
+from sleeperbot.player_table import PlayerTable
+from sleeperbot.sources import SOURCES
+from sleeperbot.ttl import SchedulePolicy
+from sleeperbot.utils import (
+    discard_prefetched,
+    get_cache,
+    prefetch,
+    resolve_ttl,
 )
 
 log = structlog.get_logger()
 
+# bump whenever the shape of League.to_snapshot changes
+SNAPSHOT_VERSION = 3
+
+# the joined league is no fresher than its scores and projections so it expires as soon
+# as they do while games are on
+SNAPSHOT_TTL = SchedulePolicy(volatile=300, default=config.LEAGUE_SNAPSHOT_TTL, quiet=config.LEAGUE_SNAPSHOT_TTL)
+
 # keys are roster positions that can be included in a starting
 # lineup mapped to the roster positions that can fill that slot
 LINEUP_POSITION_MAP = {
@@ -24,20 +53,97 @@ LINEUP_POSITION_MAP = {
     "FLEX": ["RB", "WR", "TE"],
 }
 
+_PICK_NAMES = (
+    re.compile(r"^(?P<season>\d{4}) (?:(?:Early|Mid|Late) )?(?P<round>\d)(?:st|nd|rd|th)$"),
+    re.compile(r"^(?P<season>\d{4}) Pick (?P<round>\d+)\.\d+$"),
+    re.compile(r"^(?P<season>\d{4}) Round (?P<round>\d+)$"),
+)
+
+
+def _parse_pick(name: str) -> tuple[int, int] | None:
+    """(season, round) of a draft pick named by a value source"""
+    for pattern in _PICK_NAMES:
+        match = pattern.match(name)
+
+        if match:
+            return int(match["season"]), int(match["round"])
+
+    return None
+
+
+def memoized_calls(settings: LeagueSettings | None = None) -> list[tuple]:
+    """
+    Every memoized (function, args, kwargs) call League makes. Calls that depend on the
+    league settings are only known once the settings themselves have been loaded.
+    """
+    if settings is None:
+        return [
+            (sleeper.get_league_settings, (), {}),
+            (sleeper.get_owners, (), {}),
+            (sleeper.get_rosters, (), {}),
+            (sleeper.get_player_map, (), {}),
+        ]
+
+    return [
+        (sleeper.get_traded_picks, (), {}),
+        (sleeper._initialize_app, (settings.season, settings.week), {}),
+        (sleeper.get_matchups, (), {"week": settings.week}),
+        (sleeper.get_projections, (settings.season, settings.week, settings.ppr, settings.te_ppr), {}),
+    ] + [
+        (source.fetch, (), {"dynasty": dynasty, "settings": settings})
+        for source in SOURCES.values()
+        for dynasty in (True, False)
+    ]
+
 
 class League:
-    def __init__(self):
-        self.owners = {owner.guid: owner for owner in sleeper.get_owners()}
+    def __init__(self, rostered_only: bool = False):
+        """
+        rostered_only reads just the rostered players from the players dump - enough to set
+        lineups - instead of decoding all of it. Values are then only applied to those players
+        so trades involving anyone else can't be evaluated.
+        """
+        self.rostered_only = rostered_only
+
+        prefetched: list[str] = []
+
+        try:
+            self._load(prefetched)
+        finally:
+            # entries a failed build never read must not be served later (ex. by a long running scheduler)
+            discard_prefetched(prefetched)
+
+    def _load(self, prefetched: list[str]):
+        # warm every memoized key in two round trips instead of one per call
+        prefetched += prefetch(memoized_calls())
+        self.settings = sleeper.get_league_settings()
+        prefetched += prefetch(memoized_calls(self.settings))
+
+        # memoized results may be the cached objects themselves (CACHE_STORE_OBJECTS) so
+        # everything League goes on to modify is copied first
+        self.owners = {owner.guid: dataclasses.replace(owner) for owner in sleeper.get_owners()}
 
         my_user_id = sleeper.get_my_user_id()
         self.me = self.owners[my_user_id]
 
-        self.settings = sleeper.get_league_settings()
         self.teams = {team.guid: team for team in sleeper.get_teams()}
 
+        self.projections = sleeper.get_projections(
+            self.settings.season, self.settings.week, self.settings.ppr, self.settings.te_ppr
+        )
+
+        rosters = sleeper.get_rosters()
+
+        if self.rostered_only:
+            player_ids = {player_id for roster in rosters for player_id in roster.player_ids}
+            entries = sleeper.get_player_map.get_many(player_ids).items()
+        else:
+            entries = sleeper.get_player_map.scan()
+
         self.players = {}
-        for player in sleeper.get_player_map().values():
+        for _, player in entries:
             if player.position in self.settings.roster_positions:
+                player = player.copy()
                 self.players[player.guid] = player
                 self.players[player.alternate_id] = player
 
@@ -47,9 +153,14 @@ class League:
                     pass
 
         matchups = sleeper.get_matchups(week=self.settings.week)
+        self.matchups = {matchup.guid: matchup for matchup in matchups}
 
-        for roster in sleeper.get_rosters():
-            roster.players = [self.players[player_id] for player_id in roster.player_ids]
+        self.rosters = {}
+        for roster in rosters:
+            roster = dataclasses.replace(
+                roster, players=[self.players[player_id] for player_id in roster.player_ids], picks=[]
+            )
+            self.rosters[roster.guid] = roster
 
             matchup = next(matchup for matchup in matchups if roster.guid in (matchup.away_roster, matchup.home_roster))
 
@@ -58,34 +169,239 @@ class League:
                     owner.roster = roster
                     owner.matchup = matchup
 
+        self._load_picks()
         self._load_player_value()
 
+    @staticmethod
+    def snapshot_key(settings: LeagueSettings, rostered_only: bool = False) -> str:
+        kind = "_rostered" if rostered_only else ""
+        return f"league_snapshot_v{SNAPSHOT_VERSION}{kind}_{settings.guid}_{settings.season}_{settings.week}"
+
+    @classmethod
+    def snapshot_keys(cls, settings: LeagueSettings) -> list[str]:
+        """Every cached snapshot of the league - full and rostered only"""
+        return [cls.snapshot_key(settings), cls.snapshot_key(settings, rostered_only=True)]
+
+    @classmethod
+    def cached(cls, rostered_only: bool = False) -> "League":
+        """
+        Read-through League - loads the fully joined league from the snapshot stored in
+        the cache and only builds (and stores) a new one when there is none. A full
+        snapshot also serves rostered_only callers.
+        """
+        cache = get_cache()
+        settings = sleeper.get_league_settings()
+
+        keys = cls.snapshot_keys(settings) if rostered_only else [cls.snapshot_key(settings)]
+
+        for key, blob in zip(keys, cache.mget(keys)):
+            if isinstance(blob, bytes):
+                try:
+                    return cls.from_snapshot(blob)
+                except Exception:
+                    log.exception("Unable to load league snapshot", key=key)
+
+        league = cls(rostered_only=rostered_only)
+        league.store()
+
+        return league
+
+    def store(self):
+        """Cache the snapshot cached() loads"""
+        # a league missing values from a failing source is rebuilt on the next run instead
+        if not self.missing_sources:
+            key = self.snapshot_key(self.settings, self.rostered_only)
+            get_cache().set(key, self.to_snapshot(), resolve_ttl(SNAPSHOT_TTL))
+
+    def invalidate(self):
+        """Drop the cached snapshots - call after changing league state (ex. roster moves)"""
+        get_cache().delete(*self.snapshot_keys(self.settings))
+
+    def to_snapshot(self) -> bytes:
+        """Versioned, compressed blob of the fully joined league state"""
+        owners = {owner.guid: owner for owner in self.owners.values()}
+        players = {player.guid: player for player in self.players.values()}
+
+        state = {
+            "version": SNAPSHOT_VERSION,
+            "rostered_only": self.rostered_only,
+            "settings": self.settings,
+            "me": self.me.guid,
+            "teams": list(self.teams.values()),
+            "projections": self.projections,
+            "players": list(players.values()),
+            "picks": list(self.picks.values()),
+            "matchups": list(self.matchups.values()),
+            # players, picks, rosters and matchups are stored once and linked back up on load
+            "rosters": [dataclasses.replace(roster, players=[], picks=[]) for roster in self.rosters.values()],
+            "owners": [dataclasses.replace(owner, roster=None, matchup=None) for owner in owners.values()],
+            "links": {
+                owner.guid: [owner.roster and owner.roster.guid, owner.matchup and owner.matchup.guid]
+                for owner in owners.values()
+            },
+        }
+
+        return brotli.compress(serialize(state).encode(), quality=5)
+
+    @classmethod
+    def from_snapshot(cls, blob: bytes) -> "League":
+        state = deserialize(brotli.decompress(blob).decode())
+
+        if state["version"] != SNAPSHOT_VERSION:
+            raise RuntimeError(f"Unsupported league snapshot version {state['version']}")
+
+        league = cls.__new__(cls)
+
+        league.rostered_only = state["rostered_only"]
+        league.settings = state["settings"]
+        league.teams = {team.guid: team for team in state["teams"]}
+        league.projections = state["projections"]
+        league.matchups = {matchup.guid: matchup for matchup in state["matchups"]}
+        league.picks = {pick.guid: pick for pick in state["picks"]}
+
+        league.players = {}
+        for player in state["players"]:
+            league.players[player.guid] = player
+            league.players[player.alternate_id] = player
+
+        league.rosters = {}
+        for roster in state["rosters"]:
+            roster.players = [league.players[player_id] for player_id in roster.player_ids]
+            roster.picks = [pick for pick in league.picks.values() if pick.owner == roster.guid]
+            league.rosters[roster.guid] = roster
+
+        league.owners = {}
+        for owner in state["owners"]:
+            roster_guid, matchup_guid = state["links"][owner.guid]
+            owner.roster = league.rosters.get(roster_guid)
+            owner.matchup = league.matchups.get(matchup_guid)
+            league.owners[owner.guid] = owner
+
+        league.me = league.owners[state["me"]]
+        league.missing_sources = []
+
+        return league
+
     def _load_player_value(self):
-        for player in fantasy_calc.get_players(dynasty=True, settings=self.settings):
-            if player.position not in ("PICK",):
-                self.players[player.guid].update_value(player)
+        tasks = [(source, dynasty) for source in SOURCES.values() for dynasty in (True, False)]
 
-        for player in fantasy_calc.get_players(dynasty=False, settings=self.settings):
-            if player.position not in ("PICK",):
-                self.players[player.guid].update_value(player)
+        def fetch(task) -> tuple[list[Player], list[Player]]:
+            source, dynasty = task
 
-        d_players = {player.alternate_id: player for player in ktc.get_players(dynasty=True, settings=self.settings)}
-        r_players = {player.alternate_id: player for player in ktc.get_players(dynasty=False, settings=self.settings)}
+            try:
+                return source.get_players(dynasty=dynasty, settings=self.settings)
+            except Exception:
+                # lineups only need sleeper data so a source with no usable values is skipped
+                log.exception("Unable to load player values", source=source.name, dynasty=dynasty)
+                self.missing_sources.append(source.name)
+                return [], []
+
+        self.missing_sources: list[str] = []
+
+        # every source is fetched concurrently but applied in registry order so merged
+        # values don't depend on which request finished first
+        with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+            results = list(executor.map(fetch, tasks))
+
+        for (source, dynasty), (players, picks) in zip(tasks, results):
+            unmapped = []
+
+            for player in players:
+                try:
+                    self.players[getattr(player, source.id_strategy)].update_value(player)
+                except KeyError:
+                    unmapped.append(player)
+
+            # only rostered players are loaded so most of a source's players have no match
+            if unmapped and source.require_mapped and dynasty and not self.rostered_only:
+                raise RuntimeError(f"Unable to map all {source.name} player values!")
 
-        for player in self.players.values():
-            dynasty = d_players.pop(player.alternate_id, {})
             if dynasty:
-                player.update_value(dynasty)
+                self._load_pick_value(source.name, picks)
+
+    def _load_picks(self):
+        traded = {pick.guid: pick for pick in sleeper.get_traded_picks()}
+
+        self.picks: dict[str, DraftPick] = {}
+
+        for season in self.settings.pick_seasons:
+            for draft_round in range(1, self.settings.draft_rounds + 1):
+                for roster in self.rosters.values():
+                    pick = DraftPick(season=season, round=draft_round, roster=roster.guid, owner=roster.guid)
+                    if pick.guid in traded:
+                        pick = dataclasses.replace(traded[pick.guid], dynasty=traded[pick.guid].dynasty.copy())
+
+                    self.picks[pick.guid] = pick
+
+        for pick in self.picks.values():
+            if pick.owner in self.rosters:
+                self.rosters[pick.owner].picks.append(pick)
 
-            redraft = r_players.pop(player.alternate_id, {})
-            if redraft:
-                player.update_value(redraft)
+    def _load_pick_value(self, source: str, picks: list[Player]):
+        # sources value picks by tier ("2024 Early 1st") or slot ("2024 Pick 1.05") but we only
+        # know the season and round of future picks so use the average for the round
+        round_values: dict[tuple[int, int], list[float]] = defaultdict(list)
 
-        d_players = [p for p in d_players.values() if not p.first_name.isdigit()]  # filter out draft picks
-        if len(d_players) > 0:
-            raise RuntimeError("Unable to map all ktc player values!")
+        for pick in picks:
+            parsed = _parse_pick(pick.name)
+            value = pick.dynasty.values.get(source)
+
+            if parsed and value is not None:
+                round_values[parsed].append(value)
+
+        for pick in self.picks.values():
+            values = round_values.get((pick.season, pick.round))
+
+            if values:
+                pick.dynasty.update(PlayerValue(values={source: sum(values) / len(values)}))
+
+    def asset_value(self, guid: str) -> float:
+        """Dynasty value of a player or draft pick"""
+        if guid in self.picks:
+            return self.picks[guid].dynasty._compute_value()
+
+        return self.players[guid].dynasty._compute_value()
+
+    def roster_value(self, roster: Roster) -> float:
+        """Dynasty value of every player and draft pick held by roster"""
+        return sum(self.asset_value(player.guid) for player in roster.players) + sum(
+            self.asset_value(pick.guid) for pick in roster.picks
+        )
+
+    def evaluate_trade(self, send: list[str], receive: list[str]) -> float:
+        """Dynasty value gained (positive) or lost by trading away send for receive"""
+        return sum(self.asset_value(guid) for guid in receive) - sum(self.asset_value(guid) for guid in send)
+
+    def locked_teams(self, now: datetime | None = None) -> set[str]:
+        """NFL teams whose game has kicked off - their players can't be moved"""
+        now = now or datetime.utcnow()
+
+        return {guid for guid, team in self.teams.items() if team.game and team.game.kickoff <= now}
+
+    def value_ranks(self) -> dict[str, int]:
+        """
+        Rank of every rostered player (0 is the best) by projected points this week with
+        redraft value breaking ties - so redraft value alone when there are no projections
+        """
+        rostered = list({player.guid: player for roster in self.rosters.values() for player in roster.players}.values())
+        points = self.projections.lookup([player.guid for player in rostered])
+
+        ranked = sorted(zip(points, rostered), key=lambda item: (item[0], item[1].redraft), reverse=True)
+
+        return {player.guid: idx for idx, (_, player) in enumerate(ranked)}
+
+    def optimize_roster(
+        self,
+        roster: Roster,
+        locked_teams: set[str] | None = None,
+        ranks: dict[str, int] | None = None,
+    ) -> tuple[Roster, list[str]]:
+        """
+        Build the optimal lineup for roster. locked_teams and ranks can be computed once
+        and shared when optimizing many rosters (see optimize_all_rosters).
+        """
+        locked_teams = self.locked_teams() if locked_teams is None else locked_teams
 
-    def optimize_roster(self, roster: Roster) -> tuple[Roster, list[str]]:
         # the order of the IDs matches the order of self.settings.roster_positions - so if QB
         # is the first position in roster_positions then the first ID in starters must be a QB
         # or "0" which represents an empty position
@@ -101,17 +417,14 @@ class League:
             if player.guid in taxi:
                 continue
 
-            if player.team in self.teams and self.teams[player.team].game:
-                if self.teams[player.team].game.kickoff > datetime.utcnow():
-                    movable_players[player.guid] = player
-                elif player.guid in roster.starters:
-                    starters[roster.starters.index(player.guid)] = player.guid
-                elif player.guid in roster.bench:
-                    bench.append(player.guid)
-                elif player.guid in roster.reserve:
-                    reserve.append(player.guid)
-            else:
+            if player.team not in locked_teams:
                 movable_players[player.guid] = player
+            elif player.guid in roster.starters:
+                starters[roster.starters.index(player.guid)] = player.guid
+            elif player.guid in roster.bench:
+                bench.append(player.guid)
+            elif player.guid in roster.reserve:
+                reserve.append(player.guid)
 
         # move players to IR and bye week/out players to the bench
         for player in list(movable_players.values()):
@@ -131,7 +444,14 @@ class League:
                 bench.append(player.guid)
                 movable_players.pop(player.guid)
 
-        sorted_players = sorted(movable_players.values(), key=lambda player: player.redraft, reverse=True)
+        if ranks is not None:
+            sorted_players = sorted(movable_players.values(), key=lambda player: ranks[player.guid])
+        else:
+            sorted_players = sorted(
+                movable_players.values(),
+                key=lambda player: (self.projections.get(player.guid), player.redraft),
+                reverse=True,
+            )
 
         # fill out open starter slots with most value player that fits that position
         for idx, slot in enumerate(starters):
@@ -171,3 +491,78 @@ class League:
         )
 
         return optimal_roster, drop
+
+    def lineup_value(self, starters: list[str]) -> float:
+        """Projected points for a lineup - falls back to summed redraft value without projections"""
+        if len(self.projections):
+            return sum(self.projections.lookup(starters))
+
+        return sum(self.players[guid].redraft._compute_value() for guid in starters if guid in self.players)
+
+    def optimize_all_rosters(self, processes: int | None = None) -> list[LineupReport]:
+        """
+        Optimize every roster in the league at once. Lock status and value ranks are
+        computed a single time and shared by every roster. When processes is set the
+        rosters are solved in a process pool whose workers attach to a shared memory copy
+        of the players instead of each unpickling the whole league.
+        """
+        locked_teams = self.locked_teams()
+        ranks = self.value_ranks()
+
+        rosters = list(self.rosters.values())
+
+        if processes:
+            # rosters are sent without their players - workers look them up in the table
+            stripped = [dataclasses.replace(roster, players=[], picks=[]) for roster in rosters]
+
+            with (
+                PlayerTable.from_league(self) as table,
+                ProcessPoolExecutor(
+                    processes, initializer=_init_worker, initargs=(table.name, self.settings)
+                ) as executor,
+            ):
+                results = list(executor.map(_optimize_in_worker, stripped, repeat(locked_teams), repeat(ranks)))
+
+            for roster, (optimal, _) in zip(rosters, results):
+                optimal.players = roster.players
+        else:
+            results = [self.optimize_roster(roster, locked_teams, ranks) for roster in rosters]
+
+        owners = {owner.roster.guid: owner.display_name for owner in self.owners.values() if owner.roster}
+
+        return [
+            LineupReport(
+                roster=roster.guid,
+                owner=owners.get(roster.guid),
+                actual_value=self.lineup_value(roster.starters),
+                optimal_value=self.lineup_value(optimal.starters),
+                optimal=optimal,
+                drop=drop,
+            )
+            for roster, (optimal, drop) in zip(rosters, results)
+        ]
+
+
+_worker_league: League | None = None
+
+
+def _init_worker(table_name: str, settings: LeagueSettings):
+    """Worker side League with just what optimize_roster needs - players come from the shared table"""
+    global _worker_league
+
+    league = League.__new__(League)
+    league.settings = settings
+    league.players = PlayerTable.attach(table_name)
+    league.projections = Projections(season=settings.season, week=settings.week)
+
+    _worker_league = league
+
+
+def _optimize_in_worker(roster: Roster, locked_teams: set[str], ranks: dict[str, int]) -> tuple[Roster, list[str]]:
+    roster.players = [_worker_league.players[player_id] for player_id in roster.player_ids]
+    optimal, drop = _worker_league.optimize_roster(roster, locked_teams, ranks)
+
+    # the parent puts its own players back
+    optimal.players = []
+
+    return optimal, drop
@@ -1,11 +1,25 @@
 import functools
+import hashlib
+import json
 
 import structlog
 
-from sleeperbot import config
-from sleeperbot.clients import sleeper
+from sleeperbot import (
+    config,
+    metrics,
+    sync,
+    warm,
+)
+from sleeperbot.clients import (
+    rate_limit,
+    sleeper,
+)
 from sleeperbot.league import League
-from sleeperbot.utils import setup_logging
+from sleeperbot.models import Roster
+from sleeperbot.utils import (
+    get_cache,
+    setup_logging,
+)
 
 log = structlog.get_logger()
 
@@ -21,29 +35,93 @@ def log_unhandled_errors(func):
     return inner
 
 
-@log_unhandled_errors
-def manage():
-    setup_logging()
+# how long an applied roster change is remembered so a retried run doesn't apply it again
+MUTATION_TTL = 24 * 3600
 
-    log.info("running sleeperbot manager")
-    league = League()
 
-    if config.MANAGE_ROSTER:
-        league.me.roster, drop_players = league.optimize_roster(league.me.roster)
+def _apply_once(league: League, current: Roster, roster: Roster, drop_players: list[str]) -> bool:
+    """
+    Apply the changes from current to roster unless they were already applied to this exact
+    roster - runs are retried (lambda retries, requeued jobs) so mutations must be idempotent.
+    The roster the plan starts from is part of the key so a lineup that moved away from the
+    plan since (a manual edit or another run) is still corrected.
+    """
+    plan = json.dumps(
+        [
+            league.settings.week,
+            [current.starters, current.reserve, current.taxi, sorted(current.player_ids)],
+            [roster.starters, roster.reserve, roster.taxi, sorted(drop_players)],
+        ]
+    )
+    digest = hashlib.blake2b(plan.encode(), digest_size=16).hexdigest()
+    key = f"mutation_{league.settings.guid}_{roster.guid}_{digest}"
+
+    if not get_cache().add(key, "1", MUTATION_TTL):
+        log.info("roster changes already applied - skipping", roster=roster.guid)
+        return False
+
+    try:
+        sleeper.update_roster(league.settings, roster, drop_players, taxi=config.MANAGE_TAXI)
+    except Exception:
+        # nothing was applied so a retry must be allowed to try again
+        get_cache().delete(key)
+        raise
+
+    return True
+
+
+def run() -> dict:
+    """A single manager run for the configured league - raises on failure"""
+    changes = sync.sync()
+
+    if changes.bootstrapped or changes.transactions:
+        # rosters changed since they were cached so both the rosters and league must be rebuilt
+        sleeper.get_rosters.invalidate()
+        get_cache().delete(*League.snapshot_keys(sleeper.get_league_settings()))
+    elif changes.player_changes or changes.players_reset:
+        # player statuses are baked into the league snapshot
+        get_cache().delete(*League.snapshot_keys(sleeper.get_league_settings()))
 
-        if drop_players:
-            # sleeper requires all non-IR illegible players to be moved from IR and
-            # roster size to be correct before starters can be adjusted
-            sleeper.drop_players(league.settings, league.me.roster, drop_players)
+    # setting lineups only needs the rostered players
+    league = League.cached(rostered_only=True)
+    result = {
+        "transactions": len(changes.transactions),
+        "player_changes": len(changes.player_changes),
+        "applied": False,
+        "dropped": [],
+    }
 
-        sleeper.update_injured_reserve(league, league.me.roster)
+    if config.MANAGE_ONLY_ON_CHANGE and not changes.affects(league.me.roster.guid):
+        log.info("no changes affecting roster - skipping optimization")
 
-        sleeper.update_starters(league, league.me.roster)
+    elif config.MANAGE_ROSTER:
+        current = league.me.roster
+        league.me.roster, drop_players = league.optimize_roster(current)
+
+        result["applied"] = _apply_once(league, current, league.me.roster, drop_players)
+        result["dropped"] = drop_players if result["applied"] else []
+
+        league.invalidate()
+
+    return result
+
+
+@log_unhandled_errors
+def manage():
+    setup_logging()
+
+    log.info("running sleeperbot manager")
 
-        if config.MANAGE_TAXI:
-            sleeper.update_taxi(league, league.me.roster)
+    try:
+        result = run()
+        log.info("sleeperbot manager complete", throttled=rate_limit.throttled_time(), **result)
 
-    log.info("sleeperbot manager complete")
+        if config.MANAGE_WARM_CACHE:
+            # after the run so warming never delays roster changes
+            warm.warm()
+    finally:
+        # metrics are written even when the run fails - that is when they matter most
+        metrics.flush()
 
 
 def main():
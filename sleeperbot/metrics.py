@@ -0,0 +1,209 @@
+import json
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+from sleeperbot import config
+
+# every metric by name - metrics register themselves when they are declared
+REGISTRY: dict[str, "Metric"] = {}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = tuple(4**power for power in range(4, 14))  # 256B to 64MB
+
+_lock = threading.Lock()
+
+
+def _key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, unit: str, description: str):
+        self.name = name
+        self.unit = unit
+        self.description = description
+
+        self._series: dict[tuple, object] = {}
+
+        REGISTRY[name] = self
+
+    def series(self) -> dict[tuple, object]:
+        with _lock:
+            return dict(self._series)
+
+    def reset(self):
+        with _lock:
+            self._series.clear()
+
+
+class _BoundCounter:
+    def __init__(self, counter: "Counter", key: tuple):
+        self._series = counter._series
+        self._key = key
+
+    def incr(self, value: float = 1.0):
+        with _lock:
+            self._series[self._key] = self._series.get(self._key, 0.0) + value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def incr(self, value: float = 1.0, **labels):
+        key = _key(labels)
+
+        with _lock:
+            self._series[key] = self._series.get(key, 0.0) + value
+
+    def labels(self, **labels) -> _BoundCounter:
+        """Counter with fixed labels - skips building the series key on every increment"""
+        return _BoundCounter(self, _key(labels))
+
+
+class _Observations:
+    __slots__ = ("counts", "sums", "sum", "count")
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * (buckets + 1)
+        # sum of the observations in each bucket - their mean stands in for them in emf
+        self.sums = [0.0] * (buckets + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, unit: str, description: str, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, unit, description)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels):
+        key = _key(labels)
+
+        with _lock:
+            observations = self._series.get(key)
+
+            if observations is None:
+                observations = self._series[key] = _Observations(len(self.buckets))
+
+            bucket = bisect_left(self.buckets, value)
+
+            observations.counts[bucket] += 1
+            observations.sums[bucket] += value
+            observations.sum += value
+            observations.count += 1
+
+
+def _labels(labels: tuple, **extra) -> str:
+    pairs = [*labels, *extra.items()]
+
+    if not pairs:
+        return ""
+
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+def to_prometheus() -> str:
+    """Every recorded series in the prometheus text exposition format"""
+    lines = []
+
+    for metric in REGISTRY.values():
+        series = metric.series()
+
+        if not series:
+            continue
+
+        name = f"{config.METRICS_NAMESPACE}_{metric.name}"
+        lines += [f"# HELP {name} {metric.description}", f"# TYPE {name} {metric.kind}"]
+
+        for labels, value in sorted(series.items()):
+            if metric.kind == "counter":
+                lines.append(f"{name}{_labels(labels)} {value}")
+                continue
+
+            cumulative = 0
+            for bound, count in zip([*metric.buckets, "+Inf"], value.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels, le=bound)} {cumulative}")
+
+            lines += [f"{name}_sum{_labels(labels)} {value.sum}", f"{name}_count{_labels(labels)} {value.count}"]
+
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def _emf_values(observations: _Observations) -> dict:
+    """
+    A histogram as emf Values/Counts - one value per non-empty bucket (the mean of what it
+    holds) weighted by its count so SampleCount and Sum stay exact however many observations
+    there were and percentiles are accurate to within a bucket
+    """
+    buckets = [(total / count, count) for total, count in zip(observations.sums, observations.counts) if count]
+
+    return {"Values": [value for value, _ in buckets], "Counts": [count for _, count in buckets]}
+
+
+def to_emf() -> str:
+    """Every recorded series as CloudWatch embedded metric format json lines"""
+    timestamp = int(time.time() * 1000)
+    lines = []
+
+    for metric in REGISTRY.values():
+        for labels, value in sorted(metric.series().items()):
+            record = {
+                "_aws": {
+                    "Timestamp": timestamp,
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": config.METRICS_NAMESPACE,
+                            "Dimensions": [[name for name, _ in labels]],
+                            "Metrics": [{"Name": metric.name, "Unit": metric.unit}],
+                        }
+                    ],
+                },
+                **dict(labels),
+                metric.name: value if metric.kind == "counter" else _emf_values(value),
+            }
+
+            lines.append(json.dumps(record))
+
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def reset():
+    for metric in REGISTRY.values():
+        metric.reset()
+
+
+def flush() -> str:
+    """
+    Write everything recorded since the last flush in METRICS_FORMAT (prometheus or emf)
+    to METRICS_PATH, or stdout when no path is set, and start over. Nothing is written
+    when no format is configured.
+    """
+    renderers = {"prometheus": to_prometheus, "emf": to_emf}
+
+    if config.METRICS_FORMAT and config.METRICS_FORMAT not in renderers:
+        raise ValueError(f"Unknown metrics format {config.METRICS_FORMAT}")
+
+    output = renderers[config.METRICS_FORMAT]() if config.METRICS_FORMAT else ""
+    reset()
+
+    if not output:
+        return output
+
+    if config.METRICS_PATH:
+        with open(config.METRICS_PATH, "w") as fp:
+            fp.write(output)
+    else:
+        sys.stdout.write(output)
+        sys.stdout.flush()
+
+    return output
@@ -1,4 +1,5 @@
 import dataclasses
+import hashlib
 import json
 from dataclasses import (
     dataclass,
@@ -6,7 +7,7 @@ from dataclasses import (
 )
 from datetime import datetime
 
-from sleeperbot import config
+from sleeperbot import sources
 
 GUID = str
 
@@ -21,10 +22,25 @@ class Model:
     def __init__(self, *args, **kwargs):
         self._type = type(self).__name__
 
+    @property
+    def cache_key(self) -> str:
+        """
+        Stable content hash used by memoize - computed once per instance so models are
+        treated as immutable once they have been used as a memoize argument.
+        """
+        if "_cache_key" not in self.__dict__:
+            raw_bytes = serialize(self, sort_keys=True).encode()
+            self.__dict__["_cache_key"] = hashlib.blake2b(raw_bytes, digest_size=16).hexdigest()
+
+        return self.__dict__["_cache_key"]
+
     def __repr__(self):
         kws = []
 
         for key, value in self.__dict__.items():
+            if key.startswith("_"):
+                continue
+
             _lines = repr(value).split("\n")
             lines = [f"    {line}" for line in _lines[1:]]
 
@@ -46,15 +62,16 @@ class PlayerValue(Model):
 
     def _compute_value(self, only: list[str] | None = None) -> float:
         value_num, value_denom = 0.0, 0.0
-        only = only or ["fantasy_calc", "ktc"]
+        only = only or list(self.values)
+
+        for source in only:
+            if self.values.get(source) is None:
+                continue
 
-        if "ktc" in only and self.values.get("ktc") is not None:
-            value_num += config.WEIGHT_KTC * self.values["ktc"]
-            value_denom += config.WEIGHT_KTC * 1
+            weight = sources.weight(source)
 
-        if "fantasy_calc" in only and self.values.get("fantasy_calc") is not None:
-            value_num += config.WEIGHT_FANTASY_CALC * self.values["fantasy_calc"]
-            value_denom += config.WEIGHT_FANTASY_CALC * 1
+            value_num += weight * self.values[source]
+            value_denom += weight * 1
 
         if not value_denom:
             return 0
@@ -66,20 +83,23 @@ class PlayerValue(Model):
         return {key for key, value in self.values.items() if value is not None}
 
     def __lt__(self, pv: "PlayerValue") -> bool:
-        sources = list(self.sources & pv.sources)
-        return self._compute_value(only=sources) < pv._compute_value(only=sources)
+        common = list(self.sources & pv.sources)
+        return self._compute_value(only=common) < pv._compute_value(only=common)
 
     def __le__(self, pv: "PlayerValue") -> bool:
-        sources = list(self.sources & pv.sources)
-        return self._compute_value(only=sources) <= pv._compute_value(only=sources)
+        common = list(self.sources & pv.sources)
+        return self._compute_value(only=common) <= pv._compute_value(only=common)
 
     def __gt__(self, pv: "PlayerValue") -> bool:
-        sources = list(self.sources & pv.sources)
-        return self._compute_value(only=sources) > pv._compute_value(only=sources)
+        common = list(self.sources & pv.sources)
+        return self._compute_value(only=common) > pv._compute_value(only=common)
 
     def __ge__(self, pv: "PlayerValue") -> bool:
-        sources = list(self.sources & pv.sources)
-        return self._compute_value(only=sources) >= pv._compute_value(only=sources)
+        common = list(self.sources & pv.sources)
+        return self._compute_value(only=common) >= pv._compute_value(only=common)
+
+    def copy(self) -> "PlayerValue":
+        return PlayerValue(trends=dict(self.trends), values=dict(self.values))
 
     def update(self, player_value: "PlayerValue"):
         self.trends.update({key: value for key, value in player_value.trends.items() if value is not None})
@@ -145,11 +165,37 @@ class Player(Model):
         """
         return f"{self.first_name} {self.last_name}"
 
+    def copy(self) -> "Player":
+        """Copy that can be updated (values, bye week) without touching this player"""
+        return dataclasses.replace(self, dynasty=self.dynasty.copy(), redraft=self.redraft.copy())
+
     def update_value(self, player: "Player"):
         self.dynasty.update(player.dynasty)
         self.redraft.update(player.redraft)
 
 
+@dataclass(repr=False)
+class DraftPick(Model):
+    season: int
+    round: int
+
+    # roster the pick originally belonged to - picks are keyed by (season, round, roster)
+    roster: GUID
+
+    # roster currently holding the pick
+    owner: GUID | None = None
+
+    dynasty: PlayerValue = field(default_factory=PlayerValue)
+
+    @property
+    def guid(self) -> GUID:
+        return f"{self.season}_{self.round}_{self.roster}"
+
+    @property
+    def name(self):
+        return f"{self.season} Round {self.round} ({self.roster})"
+
+
 @dataclass(repr=False)
 class Roster(Model):
     guid: GUID
@@ -162,6 +208,12 @@ class Roster(Model):
 
     player_ids: list[GUID] = field(default_factory=list)
     players: list[Player] = field(default_factory=list)
+    picks: list[DraftPick] = field(default_factory=list)
+
+    wins: int = 0
+    losses: int = 0
+    ties: int = 0
+    points_for: float = 0.0
 
 
 @dataclass(repr=False)
@@ -171,6 +223,39 @@ class Matchup(Model):
     home_roster: GUID
 
 
+@dataclass(repr=False)
+class Transaction(Model):
+    guid: GUID
+
+    # trade
+    # free_agent
+    # waiver
+    # commissioner
+    type: str
+
+    # complete
+    # failed
+    # pending
+    status: str
+
+    week: int
+    updated: int  # epoch milliseconds
+    roster_ids: list[GUID] = field(default_factory=list)
+
+    # player ID -> roster ID
+    adds: dict[GUID, GUID] = field(default_factory=dict)
+    drops: dict[GUID, GUID] = field(default_factory=dict)
+
+
+@dataclass(repr=False)
+class PlayerChange(Model):
+    guid: GUID  # player ID
+    at: float  # epoch seconds of the refresh that saw the change
+
+    # changed Player fields - "active" when the player entered or left the players dump
+    fields: list[str] = field(default_factory=list)
+
+
 @dataclass(repr=False)
 class Game(Model):
     guid: GUID
@@ -206,6 +291,65 @@ class Owner(Model):
     matchup: Matchup | None = None
 
 
+@dataclass(repr=False)
+class Projections(Model):
+    """Projected points for every player in a week stored as columns keyed by sleeper ID"""
+
+    season: int
+    week: int
+    player_ids: list[GUID] = field(default_factory=list)
+    points: list[float] = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.player_ids)
+
+    @property
+    def _index(self) -> dict[GUID, int]:
+        if "_index_cache" not in self.__dict__:
+            self.__dict__["_index_cache"] = {guid: idx for idx, guid in enumerate(self.player_ids)}
+
+        return self.__dict__["_index_cache"]
+
+    def get(self, guid: GUID, default: float = 0.0) -> float:
+        idx = self._index.get(guid)
+        return default if idx is None else self.points[idx]
+
+    def lookup(self, guids: list[GUID], default: float = 0.0) -> list[float]:
+        """Projected points for many players at once - missing players get default"""
+        index, points = self._index, self.points
+        return [points[idx] if (idx := index.get(guid)) is not None else default for guid in guids]
+
+
+@dataclass(repr=False)
+class LineupReport(Model):
+    roster: GUID
+    owner: str | None
+    actual_value: float
+    optimal_value: float
+    optimal: Roster
+    drop: list[GUID] = field(default_factory=list)
+
+    @property
+    def value_lost(self) -> float:
+        return self.optimal_value - self.actual_value
+
+
+@dataclass(repr=False)
+class SeasonOutlook(Model):
+    roster: GUID
+    owner: str | None
+    wins: float
+    projected_wins: float
+    playoff_odds: float
+
+    # probability of finishing as each seed - index 0 is the first seed
+    seed_odds: list[float] = field(default_factory=list)
+
+    @property
+    def projected_seed(self) -> float:
+        return sum((seed + 1) * odds for seed, odds in enumerate(self.seed_odds)) / (sum(self.seed_odds) or 1)
+
+
 @dataclass(repr=False)
 class LeagueSettings(Model):
     guid: GUID
@@ -222,6 +366,16 @@ class LeagueSettings(Model):
     ppr: float
     te_ppr: float
 
+    playoff_teams: int = 6
+    playoff_week_start: int = 15
+    draft_rounds: int = 4
+
+    @property
+    def pick_seasons(self) -> list[int]:
+        """Seasons with tradable draft picks - sleeper allows trading three drafts out"""
+        first = self.season if self.status in ("pre_draft", "drafting") else self.season + 1
+        return list(range(first, first + 3))
+
     @property
     def bench_slots(self):
         return self.roster_positions.count("BN")
@@ -0,0 +1,247 @@
+import json
+import math
+import struct
+from array import array
+from collections.abc import (
+    Iterable,
+    Iterator,
+    Mapping,
+)
+from multiprocessing import shared_memory
+from typing import TYPE_CHECKING
+
+from sleeperbot.models import (
+    Player,
+    PlayerValue,
+    Projections,
+)
+
+if TYPE_CHECKING:
+    from sleeperbot.league import League
+
+# a table is a single shared memory block laid out as
+#
+#     8 byte header length | header json | columns
+#
+# column offsets are relative to the first column (8 byte aligned after the header).
+# number columns are float64 arrays (NaN when missing) and text columns are n + 1
+# uint32 offsets followed by the utf-8 values back to back
+_HEADER_SIZE = struct.Struct("<Q")
+
+TEXT_COLUMNS = ("guid", "first_name", "last_name", "team", "position", "status", "injury_status")
+
+# stands in for None in text columns - no real value is a lone NUL
+_NONE = "\x00"
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) // 8 * 8
+
+
+def _encode_numbers(values: list[float | None]) -> bytes:
+    return array("d", [math.nan if value is None else float(value) for value in values]).tobytes()
+
+
+def _encode_text(values: list[str | None]) -> tuple[bytes, bytes]:
+    encoded = [(_NONE if value is None else value).encode() for value in values]
+
+    offsets = array("I", [0])
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+
+    return offsets.tobytes(), b"".join(encoded)
+
+
+class PlayerTable(Mapping):
+    """
+    Read-only columnar copy of a league's players (positions, teams, statuses, per source
+    values and projected points) in shared memory. Process pool workers attach by name
+    instead of unpickling every player - rows are sorted by sleeper ID and found by
+    binary search so attaching builds nothing.
+
+    Behaves like League.players keyed by sleeper ID - players are materialized on access.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool = False):
+        self._shm = shm
+        self._owner = owner
+
+        buf = shm.buf
+        (header_size,) = _HEADER_SIZE.unpack_from(buf)
+        header = json.loads(bytes(buf[_HEADER_SIZE.size : _HEADER_SIZE.size + header_size]))
+
+        self.rows: int = header["rows"]
+        self.sources: list[str] = header["sources"]
+
+        # every view into the block is tracked so close() can release them first
+        self._views: list[memoryview] = []
+        self._numbers: dict[str, memoryview] = {}
+        self._text: dict[str, tuple[memoryview, memoryview]] = {}
+
+        start = _align(_HEADER_SIZE.size + header_size)
+
+        for name, column in header["columns"].items():
+            offset = start + column["offset"]
+
+            if column["kind"] == "number":
+                self._numbers[name] = self._view(offset, column["length"], "d")
+            else:
+                offsets = self._view(offset, 4 * (self.rows + 1), "I")
+                self._text[name] = (offsets, self._view(offset + len(offsets) * 4, column["length"]))
+
+    def _view(self, offset: int, length: int, fmt: str | None = None) -> memoryview:
+        view = self._shm.buf[offset : offset + length]
+        self._views.append(view)
+
+        if fmt:
+            view = view.cast(fmt)
+            self._views.append(view)
+
+        return view
+
+    @classmethod
+    def build(cls, players: Iterable[Player], projections: Projections | None = None) -> "PlayerTable":
+        """Copy players (and their projected points) into a new shared memory block"""
+        players = sorted({player.guid: player for player in players}.values(), key=lambda player: player.guid)
+        guids = [player.guid for player in players]
+
+        sources = sorted({source for player in players for source in [*player.dynasty.values, *player.redraft.values]})
+
+        numbers = {
+            "number": [player.number for player in players],
+            "bye_week": [player.bye_week for player in players],
+            "points": projections.lookup(guids, None) if projections is not None else [None] * len(players),
+        }
+
+        for source in sources:
+            numbers[f"dynasty.{source}"] = [player.dynasty.values.get(source) for player in players]
+            numbers[f"redraft.{source}"] = [player.redraft.values.get(source) for player in players]
+
+        columns, blobs, offset = {}, [], 0
+
+        def add(name: str, column: dict, blob: bytes):
+            nonlocal offset
+
+            columns[name] = {**column, "offset": offset}
+            blobs.append((offset, blob))
+            offset = _align(offset + len(blob))
+
+        for name, values in numbers.items():
+            blob = _encode_numbers(values)
+            add(name, {"kind": "number", "length": len(blob)}, blob)
+
+        for name in TEXT_COLUMNS:
+            offsets, data = _encode_text([getattr(player, name) for player in players])
+            add(name, {"kind": "text", "length": len(data)}, offsets + data)
+
+        raw_header = json.dumps({"rows": len(players), "sources": sources, "columns": columns}).encode()
+        start = _align(_HEADER_SIZE.size + len(raw_header))
+
+        shm = shared_memory.SharedMemory(create=True, size=max(1, start + offset))
+
+        _HEADER_SIZE.pack_into(shm.buf, 0, len(raw_header))
+        shm.buf[_HEADER_SIZE.size : _HEADER_SIZE.size + len(raw_header)] = raw_header
+
+        for column_offset, blob in blobs:
+            shm.buf[start + column_offset : start + column_offset + len(blob)] = blob
+
+        return cls(shm, owner=True)
+
+    @classmethod
+    def from_league(cls, league: "League") -> "PlayerTable":
+        return cls.build(league.players.values(), league.projections)
+
+    @classmethod
+    def attach(cls, name: str) -> "PlayerTable":
+        """Open a table another process built - close it when done but never unlink it"""
+        return cls(shared_memory.SharedMemory(name=name))
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def size(self) -> int:
+        return self._shm.size
+
+    def close(self):
+        """Release this process's mapping - the owner also frees the block"""
+        for view in reversed(self._views):
+            view.release()
+
+        self._views.clear()
+        self._numbers.clear()
+        self._text.clear()
+
+        self._shm.close()
+
+        if self._owner:
+            self._shm.unlink()
+
+    def __enter__(self) -> "PlayerTable":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def text(self, column: str, row: int) -> str | None:
+        offsets, data = self._text[column]
+        value = bytes(data[offsets[row] : offsets[row + 1]]).decode()
+
+        return None if value == _NONE else value
+
+    def number(self, column: str, row: int) -> float | None:
+        value = self._numbers[column][row]
+        return None if math.isnan(value) else value
+
+    def column(self, name: str) -> memoryview:
+        """Zero-copy float64 view of a number column in row order - NaN when missing"""
+        return self._numbers[name]
+
+    def index(self, guid: str) -> int | None:
+        """Row of a player by sleeper ID"""
+        offsets, data = self._text["guid"]
+        target = guid.encode()
+        low, high = 0, self.rows
+
+        while low < high:
+            middle = (low + high) // 2
+
+            if bytes(data[offsets[middle] : offsets[middle + 1]]) < target:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < self.rows and bytes(data[offsets[low] : offsets[low + 1]]) == target:
+            return low
+
+        return None
+
+    def player(self, row: int) -> Player:
+        def value(kind: str) -> PlayerValue:
+            values = {source: self.number(f"{kind}.{source}", row) for source in self.sources}
+            return PlayerValue(values={source: value for source, value in values.items() if value is not None})
+
+        number, bye_week = self.number("number", row), self.number("bye_week", row)
+
+        return Player(
+            **{name: self.text(name, row) for name in TEXT_COLUMNS},
+            number=None if number is None else int(number),
+            bye_week=None if bye_week is None else int(bye_week),
+            dynasty=value("dynasty"),
+            redraft=value("redraft"),
+        )
+
+    def __getitem__(self, guid: str) -> Player:
+        row = self.index(guid)
+
+        if row is None:
+            raise KeyError(guid)
+
+        return self.player(row)
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.text("guid", row) for row in range(self.rows))
+
+    def __len__(self) -> int:
+        return self.rows
@@ -0,0 +1,138 @@
+import json
+import time
+from collections.abc import Callable
+from datetime import (
+    datetime,
+    timedelta,
+)
+
+import structlog
+
+from sleeperbot.clients import sleeper
+from sleeperbot.models import Game
+
+log = structlog.get_logger()
+
+# run after inactives are announced (90 minutes before kickoff) and again shortly
+# before lock to catch late scratches
+KICKOFF_OFFSETS = (timedelta(minutes=85), timedelta(minutes=20))
+
+# NFL injury reports are published mid afternoon eastern on Wednesday through Friday
+INJURY_REPORT_DAYS = (2, 3, 4)  # datetime.weekday()
+INJURY_REPORT_TIME = timedelta(hours=21)  # UTC
+
+# cache warming runs this long before each scheduled run
+WARM_LEAD = timedelta(minutes=5)
+
+# runs closer together than this are collapsed into the earliest one
+MIN_GAP = timedelta(minutes=10)
+
+# how long to wait before checking for a new schedule once this week's runs are done
+IDLE_INTERVAL = timedelta(hours=6)
+
+# wait before loading the schedule again after a failure - doubled on every consecutive failure
+RETRY_BACKOFF = timedelta(minutes=1)
+MAX_RETRY_BACKOFF = timedelta(minutes=30)
+
+
+def run_times(games: dict[str, Game], now: datetime | None = None) -> list[datetime]:
+    """The minimal set of (UTC) times the manager needs to run for the remaining games"""
+    now = now or datetime.utcnow()
+
+    kickoffs = sorted({game.kickoff for game in games.values() if game.status == "pre_game" and game.kickoff > now})
+
+    if not kickoffs:
+        return []
+
+    times = {kickoff - offset for kickoff in kickoffs for offset in KICKOFF_OFFSETS}
+
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    while day < kickoffs[-1]:
+        if day.weekday() in INJURY_REPORT_DAYS:
+            times.add(day + INJURY_REPORT_TIME)
+
+        day += timedelta(days=1)
+
+    schedule: list[datetime] = []
+    for run_time in sorted(times):
+        if run_time > now and (not schedule or run_time - schedule[-1] >= MIN_GAP):
+            schedule.append(run_time)
+
+    return schedule
+
+
+def schedule() -> list[datetime]:
+    return run_times(sleeper.get_games())
+
+
+def warm_times(times: list[datetime]) -> list[datetime]:
+    return [run_time - WARM_LEAD for run_time in times]
+
+
+def to_cron(run_time: datetime) -> str:
+    """EventBridge style cron expression for a single (UTC) run"""
+    return f"cron({run_time.minute} {run_time.hour} {run_time.day} {run_time.month} ? {run_time.year})"
+
+
+def emit(times: list[datetime], output_format: str = "json") -> str:
+    """Render a schedule for an external scheduler - json, crontab or eventbridge"""
+    if output_format == "json":
+        return json.dumps([run_time.isoformat() + "Z" for run_time in times], indent=2)
+
+    if output_format == "crontab":
+        return "\n".join(f"{t.minute} {t.hour} {t.day} {t.month} * manager" for t in times)
+
+    if output_format == "eventbridge":
+        return "\n".join(to_cron(run_time) for run_time in times)
+
+    raise ValueError(f"Unknown schedule format {output_format}")
+
+
+def _run(job: Callable[[], object]):
+    try:
+        job()
+    except Exception:
+        # the next scheduled run tries again
+        log.exception("Scheduled job failed", job=getattr(job, "__name__", repr(job)))
+
+
+def run_forever(job: Callable[[], object], warm_job: Callable[[], object] | None = None):
+    """
+    Long running mode - sleep until each scheduled time, run job and reschedule. warm_job
+    additionally runs WARM_LEAD before each scheduled run. Failures are logged rather than
+    ending the process - the schedule is loaded again after a backoff.
+    """
+    warmed = None
+    backoff = RETRY_BACKOFF
+
+    while True:
+        try:
+            upcoming = schedule()
+        except Exception:
+            log.exception("Unable to load the schedule", retry=str(backoff))
+            time.sleep(backoff.total_seconds())
+
+            backoff = min(backoff * 2, MAX_RETRY_BACKOFF)
+            continue
+
+        backoff = RETRY_BACKOFF
+
+        if not upcoming:
+            log.info("no upcoming runs scheduled", idle=str(IDLE_INTERVAL))
+            time.sleep(IDLE_INTERVAL.total_seconds())
+            continue
+
+        next_run = upcoming[0]
+        log.info("next run scheduled", at=next_run.isoformat(), remaining=len(upcoming))
+
+        warm_at = next_run - WARM_LEAD
+        if warm_job is not None and warmed != next_run and warm_at > datetime.utcnow():
+            time.sleep(max(0.0, (warm_at - datetime.utcnow()).total_seconds()))
+            _run(warm_job)
+
+            # the schedule may have moved while warming so it is loaded again before sleeping
+            warmed = next_run
+            continue
+
+        time.sleep(max(0.0, (next_run - datetime.utcnow()).total_seconds()))
+        _run(job)
@@ -0,0 +1,133 @@
+import math
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from sleeperbot.clients import sleeper
+from sleeperbot.league import League
+from sleeperbot.models import SeasonOutlook
+
+# weekly score standard deviation as a fraction of a roster's lineup strength
+VOLATILITY = 0.25
+
+DEFAULT_SEASONS = 20000
+
+
+def _win_probability(home: tuple[float, float], away: tuple[float, float]) -> float:
+    """P(home outscores away) when both weekly scores are normally distributed"""
+    (home_mean, home_sd), (away_mean, away_sd) = home, away
+    spread = math.sqrt(home_sd**2 + away_sd**2)
+
+    if not spread:
+        return 0.5 if home_mean == away_mean else float(home_mean > away_mean)
+
+    return 0.5 * (1 + math.erf((home_mean - away_mean) / (spread * math.sqrt(2))))
+
+
+def simulate(
+    records: dict[str, tuple[float, float]],
+    schedule: list[tuple[str, str]],
+    strength: dict[str, tuple[float, float]],
+    playoff_teams: int,
+    seasons: int = DEFAULT_SEASONS,
+    seed: int | None = None,
+) -> dict[str, dict]:
+    """
+    Simulate the rest of the season.
+
+    records maps roster ID to (wins, points for), schedule is every remaining game as
+    (home, away) roster IDs and strength maps roster ID to (mean, sd) of its weekly
+    score. Returns per roster projected wins and how often it finished at each position.
+    """
+    rng = random.Random(seed)
+    rosters = list(records)
+    index = {guid: idx for idx, guid in enumerate(rosters)}
+
+    # a game only depends on its two rosters so win probabilities are computed once and
+    # each simulated game is a single uniform draw
+    games = [(index[home], index[away], _win_probability(strength[home], strength[away])) for home, away in schedule]
+
+    # ties in wins are broken by points for plus the expected points still to be scored
+    tiebreak = [records[guid][1] for guid in rosters]
+    for home, away, _ in games:
+        tiebreak[home] += strength[rosters[home]][0]
+        tiebreak[away] += strength[rosters[away]][0]
+
+    base_wins = [records[guid][0] for guid in rosters]
+    finishes = [[0] * len(rosters) for _ in rosters]
+    total_wins = [0.0] * len(rosters)
+
+    for _ in range(seasons):
+        wins = base_wins.copy()
+
+        for home, away, probability in games:
+            if rng.random() < probability:
+                wins[home] += 1
+            else:
+                wins[away] += 1
+
+        standings = sorted(range(len(rosters)), key=lambda idx: (wins[idx], tiebreak[idx]), reverse=True)
+
+        for position, idx in enumerate(standings):
+            finishes[idx][position] += 1
+            total_wins[idx] += wins[idx]
+
+    return {
+        guid: {
+            "projected_wins": total_wins[idx] / seasons,
+            "playoff_odds": sum(finishes[idx][:playoff_teams]) / seasons,
+            "seed_odds": [count / seasons for count in finishes[idx]],
+        }
+        for idx, guid in enumerate(rosters)
+    }
+
+
+def remaining_schedule(league: League) -> list[tuple[str, str]]:
+    """Every regular season game from the current week on - weeks are fetched concurrently"""
+    weeks = range(league.settings.week, league.settings.playoff_week_start)
+
+    with ThreadPoolExecutor(max_workers=max(1, len(weeks))) as executor:
+        matchups = list(executor.map(lambda week: sleeper.get_matchups(week=week), weeks))
+
+    return [(matchup.home_roster, matchup.away_roster) for week in matchups for matchup in week]
+
+
+def lineup_strength(league: League) -> dict[str, tuple[float, float]]:
+    """Mean and sd of each roster's weekly score from its best full strength lineup"""
+    ranks = league.value_ranks()
+    strength = {}
+
+    for roster in league.rosters.values():
+        optimal, _ = league.optimize_roster(roster, locked_teams=set(), ranks=ranks)
+        mean = league.lineup_value(optimal.starters)
+        strength[roster.guid] = (mean, mean * VOLATILITY)
+
+    return strength
+
+
+def season_outlook(league: League, seasons: int = DEFAULT_SEASONS, seed: int | None = None) -> list[SeasonOutlook]:
+    records = {guid: (roster.wins + roster.ties / 2, roster.points_for) for guid, roster in league.rosters.items()}
+
+    results = simulate(
+        records=records,
+        schedule=remaining_schedule(league),
+        strength=lineup_strength(league),
+        playoff_teams=league.settings.playoff_teams,
+        seasons=seasons,
+        seed=seed,
+    )
+
+    owners = {owner.roster.guid: owner.display_name for owner in league.owners.values() if owner.roster}
+
+    outlooks = [
+        SeasonOutlook(
+            roster=guid,
+            owner=owners.get(guid),
+            wins=records[guid][0],
+            projected_wins=result["projected_wins"],
+            playoff_odds=result["playoff_odds"],
+            seed_odds=result["seed_odds"],
+        )
+        for guid, result in results.items()
+    ]
+
+    return sorted(outlooks, key=lambda outlook: outlook.projected_seed)
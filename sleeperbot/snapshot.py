@@ -0,0 +1,227 @@
+import json
+import os
+import struct
+import threading
+import time
+
+import brotli
+import structlog
+
+from sleeperbot import config
+from sleeperbot.clients import sleeper
+from sleeperbot.models import serialize
+from sleeperbot.sources import SOURCES
+from sleeperbot.utils import (
+    MEMOIZED,
+    get_cache,
+    memoized_name,
+    resolve_ttl,
+)
+
+log = structlog.get_logger()
+
+# a snapshot holds the raw memoize cache entries for the expensive league-independent
+# fetches (players dump, team table, KTC and FantasyCalc values) so loading one seeds
+# the cache without decoding anything. layout before compression is:
+#
+#     4 byte header length | header json | entry payloads back to back
+#
+# keyed (hash) entries are stored as a json object of each field's cached value
+MAGIC = b"SLEEPERBOT_SNAPSHOT"
+SNAPSHOT_VERSION = 2
+
+_HEADER_SIZE = struct.Struct("<I")
+
+
+def _entries() -> list[tuple]:
+    """Memoized calls captured by a snapshot - args must match how League calls them"""
+    settings = sleeper.get_league_settings()
+
+    return [
+        (sleeper.get_player_map, (), {}),
+        (sleeper._initialize_app, (settings.season, settings.week), {}),
+    ] + [
+        (source.fetch, (), {"dynasty": dynasty, "settings": settings})
+        for source in SOURCES.values()
+        for dynasty in (True, False)
+    ]
+
+
+def _read(path: str) -> tuple[dict, bytes] | None:
+    try:
+        with open(path, "rb") as fp:
+            raw = fp.read()
+    except FileNotFoundError:
+        return None
+
+    if not raw.startswith(MAGIC):
+        log.warning("ignoring invalid snapshot", path=path)
+        return None
+
+    payload = brotli.decompress(raw[len(MAGIC) :])
+    (header_size,) = _HEADER_SIZE.unpack_from(payload)
+
+    header = json.loads(payload[_HEADER_SIZE.size : _HEADER_SIZE.size + header_size])
+
+    if header["version"] != SNAPSHOT_VERSION:
+        log.warning("ignoring snapshot from another version", path=path, version=header["version"])
+        return None
+
+    return header, payload[_HEADER_SIZE.size + header_size :]
+
+
+def _write(path: str, entries: dict[str, tuple[str, float, bytes]]):
+    header: dict = {"version": SNAPSHOT_VERSION, "created": time.time(), "entries": {}}
+    blobs, offset = [], 0
+
+    for key, (func_name, expires, blob) in entries.items():
+        header["entries"][key] = {"func": func_name, "expires": expires, "offset": offset, "length": len(blob)}
+        blobs.append(blob)
+        offset += len(blob)
+
+    raw_header = json.dumps(header).encode()
+    payload = _HEADER_SIZE.pack(len(raw_header)) + raw_header + b"".join(blobs)
+
+    # write to a temporary file first so a concurrent load never sees a partial snapshot
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as fp:
+        fp.write(MAGIC + brotli.compress(payload, quality=5))
+
+    os.replace(tmp_path, path)
+
+
+def _text(value) -> str:
+    if isinstance(value, bytes):
+        return value.decode()
+
+    # live objects from a cache that stores objects
+    return value if isinstance(value, str) else serialize(value)
+
+
+def _build_keyed(func, key: str, args, kwargs, force: bool) -> tuple[str, float, bytes]:
+    cache = get_cache()
+
+    fields = {} if force else dict(cache.hscan(key))
+    remaining = cache.ttl(key) if fields else None
+
+    if not fields or remaining is None:
+        fields = func.refresh(*args, **kwargs)
+        remaining = resolve_ttl(func.ttl)
+
+    blob = json.dumps({field: _text(value) for field, value in fields.items()}).encode()
+
+    return memoized_name(func), time.time() + remaining, blob
+
+
+def build(path: str | None = None, force: bool = False) -> int:
+    """
+    Materialize the snapshot to path and return the number of entries written.
+
+    Entries are read through the memoize cache (so a warm cache is not refetched)
+    unless force is set, in which case every upstream is fetched again.
+    """
+    path = path or config.SNAPSHOT_PATH
+    entries: dict[str, tuple[str, float, bytes]] = {}
+    cache = get_cache()
+
+    for func, args, kwargs in _entries():
+        key = func.cache_key(*args, **kwargs)
+
+        if func.keyed:
+            entries[key] = _build_keyed(func, key, args, kwargs, force)
+            continue
+
+        value = None if force else cache.get(key)
+        if value is not None and not isinstance(value, bytes):  # cache is storing live objects
+            value = serialize(value).encode()
+
+        remaining = cache.ttl(key) if value is not None else None
+
+        if value is None or remaining is None:
+            value = serialize(func.__wrapped__(*args, **kwargs)).encode()
+            remaining = resolve_ttl(func.ttl)
+            cache.set(key, value, remaining)
+
+        entries[key] = (memoized_name(func), time.time() + remaining, bytes(value))
+
+    _write(path, entries)
+    log.info("wrote snapshot", path=path, entries=len(entries))
+
+    return len(entries)
+
+
+def load(paths: list[str] | None = None) -> bool | None:
+    """
+    Seed the memoize cache from the freshest snapshot available and return whether
+    it was fresh (None when there was no snapshot). Entries already cached or past
+    their expiry are skipped.
+    """
+    paths = paths or [config.SNAPSHOT_PATH, config.SNAPSHOT_BUNDLE_PATH]
+
+    snapshots = [snapshot for snapshot in (_read(path) for path in paths if path) if snapshot]
+
+    if not snapshots:
+        return None
+
+    header, blobs = max(snapshots, key=lambda snapshot: snapshot[0]["created"])
+
+    cache = get_cache()
+
+    now = time.time()
+    fresh = now - header["created"] < config.SNAPSHOT_MAX_AGE
+
+    values, hashes, ttls = {}, {}, {}
+
+    # keys are seeded as-is rather than recomputed so loading never has to call
+    # upstream for the league settings the keys were derived from
+    for key, entry in header["entries"].items():
+        remaining = int(entry["expires"] - now)
+
+        if entry["func"] not in MEMOIZED or remaining <= 0:
+            fresh = False
+            continue
+
+        blob = blobs[entry["offset"] : entry["offset"] + entry["length"]]
+        (hashes if MEMOIZED[entry["func"]].keyed else values)[key] = blob
+        ttls[key] = remaining
+
+    # don't clobber entries another process already refreshed
+    cached = cache.mget(list(values))
+    values = {key: value for (key, value), hit in zip(values.items(), cached) if hit is None}
+
+    cache.mset(values, {key: ttls[key] for key in values})
+
+    for key, blob in hashes.items():
+        if cache.ttl(key) is None:
+            cache.hset(key, json.loads(blob), ttls[key])
+
+    log.info("loaded snapshot", created=header["created"], fresh=fresh)
+
+    return fresh
+
+
+def refresh_in_background(path: str | None = None) -> threading.Thread:
+    def refresh():
+        try:
+            build(path)
+        except Exception:
+            log.exception("Unable to refresh snapshot")
+
+    thread = threading.Thread(target=refresh, name="snapshot-refresh", daemon=True)
+    thread.start()
+
+    return thread
+
+
+def warm_start():
+    """Load the latest snapshot and kick off a background refresh when it is stale"""
+    try:
+        fresh = load()
+    except Exception:
+        log.exception("Unable to load snapshot")
+        return
+
+    # without a snapshot the first run fetches (and caches) everything itself - refreshing
+    # alongside it would only duplicate every fetch (and lambda freezes the thread anyway)
+    if fresh is False:
+        refresh_in_background()
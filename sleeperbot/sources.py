@@ -0,0 +1,64 @@
+from collections.abc import Callable
+from dataclasses import (
+    dataclass,
+    field,
+)
+from typing import TYPE_CHECKING
+
+from sleeperbot import config
+
+if TYPE_CHECKING:
+    from sleeperbot.models import (
+        LeagueSettings,
+        Player,
+    )
+
+
+@dataclass
+class ValueSource:
+    """
+    A third party player valuation. Client modules register one of these for each
+    source they provide and League fans out to every registered source.
+    """
+
+    name: str
+
+    # memoized fetch called as fetch(dynasty=..., settings=...)
+    fetch: Callable[..., list["Player"]]
+
+    # which Player attribute links this source's players to sleeper players - "guid"
+    # when the source knows sleeper IDs and "alternate_id" when matching on names
+    id_strategy: str = "guid"
+
+    # raise when a fetched dynasty player can't be linked to a sleeper player - dynasty
+    # rankings cover every relevant player so a miss there means matching is broken
+    require_mapped: bool = False
+
+    # entries returned by the source that are draft picks rather than players
+    is_pick: Callable[["Player"], bool] = field(default=lambda player: False)
+
+    @property
+    def weight(self) -> float:
+        return weight(self.name)
+
+    def get_players(self, dynasty: bool, settings: "LeagueSettings") -> tuple[list["Player"], list["Player"]]:
+        """Split fetched entries into (players, draft picks)"""
+        players, picks = [], []
+
+        for player in self.fetch(dynasty=dynasty, settings=settings):
+            (picks if self.is_pick(player) else players).append(player)
+
+        return players, picks
+
+
+SOURCES: dict[str, ValueSource] = {}
+
+
+def register(source: ValueSource) -> ValueSource:
+    SOURCES[source.name] = source
+    return source
+
+
+def weight(name: str) -> float:
+    """Weight of a source in composite values - configured as WEIGHT_<NAME>"""
+    return getattr(config, f"WEIGHT_{name.upper()}", 1.0)
@@ -0,0 +1,150 @@
+import json
+from dataclasses import (
+    dataclass,
+    field,
+)
+
+import structlog
+
+from sleeperbot import config
+from sleeperbot.clients import sleeper
+from sleeperbot.models import (
+    PlayerChange,
+    Transaction,
+)
+from sleeperbot.utils import get_cache
+
+log = structlog.get_logger()
+
+# the synced state is our source of truth for what has been seen so keep it well past a week
+STATE_TTL = 30 * 24 * 3600
+
+
+@dataclass
+class Changes:
+    transactions: list[Transaction] = field(default_factory=list)
+
+    # no previous state existed so every roster must be treated as changed
+    bootstrapped: bool = False
+
+    # players dump changes (status, injury status, team...) since the last sync
+    player_changes: list[PlayerChange] = field(default_factory=list)
+
+    # the players dump was replaced without a diff so any player may have changed
+    players_reset: bool = False
+
+    # synced roster ID -> player IDs used to tell which rosters player changes touch
+    rosters: dict[str, list[str]] = field(default_factory=dict)
+
+    def affects(self, roster_guid: str) -> bool:
+        if self.bootstrapped or self.players_reset:
+            return True
+
+        if any(roster_guid in transaction.roster_ids for transaction in self.transactions):
+            return True
+
+        rostered = set(self.rosters.get(roster_guid, ()))
+        return any(change.guid in rostered for change in self.player_changes)
+
+    def players(self) -> set[str]:
+        """Every player added or dropped by the new transactions"""
+        return {player_id for tx in self.transactions for player_id in [*tx.adds, *tx.drops]}
+
+
+def _state_key() -> str:
+    return f"league_state_{config.SLEEPER_LEAGUE_ID}"
+
+
+def load_state() -> dict | None:
+    raw = get_cache().get(_state_key())
+
+    if raw is None:
+        return None
+
+    return json.loads(raw)
+
+
+def _save_state(state: dict):
+    get_cache().set(_state_key(), json.dumps(state), STATE_TTL)
+
+
+def _bootstrap(season: int, week: int) -> dict:
+    # bypass the memoized rosters since they may be older than the transactions we mark seen
+    rosters = sleeper.get_rosters.__wrapped__()
+
+    return {
+        "season": season,
+        "week": week,
+        "rosters": {roster.guid: list(roster.player_ids) for roster in rosters},
+        "seen": {str(week): [tx.guid for tx in sleeper.get_transactions(week)]},
+        "players_synced": sleeper.player_changes_cursor(),
+    }
+
+
+def apply(state: dict, transaction: Transaction):
+    """Apply a single completed transaction to the synced rosters"""
+    for player_id, roster_guid in transaction.drops.items():
+        players = state["rosters"].setdefault(roster_guid, [])
+        if player_id in players:
+            players.remove(player_id)
+
+    for player_id, roster_guid in transaction.adds.items():
+        players = state["rosters"].setdefault(roster_guid, [])
+        if player_id not in players:
+            players.append(player_id)
+
+
+def sync() -> Changes:
+    """
+    Bring the locally synced league state up to date by applying only the transactions
+    not seen since the last sync and return them as a change feed.
+    """
+    settings = sleeper.get_league_settings()
+    state = load_state()
+
+    # refreshed here rather than while building the league so this sync sees what changed
+    if get_cache().ttl(sleeper.get_player_map.cache_key()) is None:
+        sleeper.get_player_map.refresh()
+
+    if state is None or state["season"] != settings.season:
+        _save_state(_bootstrap(settings.season, settings.week))
+        log.info("bootstrapped league state", season=settings.season, week=settings.week)
+        return Changes(bootstrapped=True)
+
+    changes = Changes()
+
+    # the previous week is rechecked since transactions can still land on it after rollover
+    for week in range(max(1, state["week"] - 1), settings.week + 1):
+        seen = set(state["seen"].get(str(week), []))
+
+        for transaction in sleeper.get_transactions(week):
+            if transaction.guid in seen or transaction.status != "complete":
+                continue
+
+            apply(state, transaction)
+            seen.add(transaction.guid)
+            changes.transactions.append(transaction)
+
+        state["seen"][str(week)] = sorted(seen)
+
+    # only the current and previous week can still receive transactions we haven't seen
+    state["seen"] = {week: ids for week, ids in state["seen"].items() if int(week) >= settings.week - 1}
+    state["week"] = settings.week
+
+    since = state.get("players_synced", 0.0)
+    changes.player_changes, reset = sleeper.get_player_changes(since)
+    changes.players_reset = reset is not None
+    changes.rosters = state["rosters"]
+
+    # the cursor comes from the feed rather than the clock so a refresh racing this sync is never skipped
+    state["players_synced"] = max([since, *(change.at for change in changes.player_changes), reset or 0.0])
+
+    _save_state(state)
+
+    if changes.transactions:
+        log.info("synced league transactions", transactions=len(changes.transactions))
+
+    if changes.player_changes or changes.players_reset:
+        log.info("synced player changes", players=len(changes.player_changes), reset=changes.players_reset)
+
+    return changes
@@ -0,0 +1,460 @@
+import contextlib
+import json
+import random
+import re
+from dataclasses import (
+    dataclass,
+    field,
+)
+from datetime import (
+    datetime,
+    timedelta,
+)
+
+from sleeperbot import config
+
+# every generated league is owned (roster 1) by the user the token resolves to
+USER_ID = "synthetic_user"
+
+SEASON = 2023
+WEEK = 4
+
+NFL_TEAMS = tuple(
+    "ARI ATL BAL BUF CAR CHI CIN CLE DAL DEN DET GB HOU IND JAX KC LAC LAR LV MIA MIN NE NO NYG NYJ PHI PIT SEA SF TB"
+    " TEN WAS".split()
+)
+
+# share of the player pool at each position - roughly what sleeper's active players look like
+POSITION_SHARE = {"QB": 0.14, "RB": 0.28, "WR": 0.4, "TE": 0.18}
+
+# leagues cycle through these starting lineups so every scale covers 1QB, superflex and TE premium
+ROSTER_FORMATS = (
+    ("QB", "RB", "RB", "WR", "WR", "TE", "FLEX", "FLEX"),
+    ("QB", "QB", "RB", "RB", "WR", "WR", "WR", "TE", "FLEX", "FLEX"),
+    ("QB", "RB", "RB", "WR", "WR", "WR", "TE", "TE", "FLEX"),
+)
+
+SCORING_FORMATS = (
+    {"rec": 1.0},
+    {"rec": 0.5},
+    {"rec": 1.0, "bonus_rec_te": 0.5},
+)
+
+FLEX_POSITIONS = {"FLEX": ("RB", "WR", "TE")}
+
+_FIRST_NAMES = tuple(
+    "Aaron Brandon Calvin Darius Elijah Frank Garrett Hunter Isaiah Jalen Keenan Lamar Marcus Nate Omar Patrick Quinn"
+    " Rashad Stefon Tyler Vince Wes Xavier Zach".split()
+)
+
+_SYLLABLES = tuple(
+    "son man ley ton ers well ford ham ridge wood field more dale worth ins ard berg wick by ling ster land ell ick".split()
+)
+
+_PICK_TIERS = ("Early", "Mid", "Late")
+_ORDINALS = {1: "1st", 2: "2nd", 3: "3rd"}
+
+
+@dataclass
+class Scale:
+    """How big the generated world is - every league gets the same number of rosters"""
+
+    leagues: int = 1
+    teams: int = 12
+    bench: int = 15
+    taxi: int = 3
+    reserve: int = 3
+
+    # players in the dump per rostered player - sleeper's dump is mostly unrostered players
+    depth: float = 2.0
+
+    seed: int = 0
+
+
+@dataclass
+class SyntheticBackend:
+    """Canned upstream responses for a generated world - answers requests for StubAdapter"""
+
+    league_ids: list[str]
+    routes: dict[tuple[str, str], object] = field(default_factory=dict)
+    graphql: dict[str, object] = field(default_factory=dict)
+    fantasy_calc: dict[bool, list] = field(default_factory=dict)
+
+    def handle(self, method: str, host: str, path: str, query: dict, body: dict | None) -> tuple[int, object]:
+        if host == "sleeper.com" and path == "/graphql":
+            fields = re.findall(r"op\d+: (\w+)", body["query"])
+            # mutations only need to succeed - everything else is a canned query result
+            return 200, {"data": {f"op{idx}": self.graphql.get(name, {}) for idx, name in enumerate(fields)}}
+
+        if host == "api.fantasycalc.com" and path == "/values/current":
+            return 200, self.fantasy_calc[query["isDynasty"][0] == "True"]
+
+        if (host, path) not in self.routes:
+            return 404, {"error": f"no synthetic route for {method} {host}{path}"}
+
+        return 200, self.routes[(host, path)]
+
+
+def _compact_json(value) -> str:
+    # KTC embeds the players array on a single line
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _unique_names(rng: random.Random, count: int) -> list[tuple[str, str]]:
+    names: set[tuple[str, str]] = set()
+
+    while len(names) < count:
+        last = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+        names.add((rng.choice(_FIRST_NAMES), last))
+
+    return sorted(names)
+
+
+def _players(rng: random.Random, count: int) -> list[dict]:
+    """Sleeper players dump entries - values and projections are attached by the caller"""
+    positions = [position for position, share in POSITION_SHARE.items() for _ in range(round(count * share))]
+    names = _unique_names(rng, len(positions))
+    rng.shuffle(names)
+
+    players = []
+
+    for idx, (position, (first, last)) in enumerate(zip(positions, names)):
+        status, injury_status = "Active", None
+        roll = rng.random()
+
+        if roll < 0.03:
+            status, injury_status = "Inactive", "IR"
+        elif roll < 0.08:
+            injury_status = rng.choice(["Out", "Doubtful"])
+        elif roll < 0.15:
+            injury_status = "Questionable"
+
+        players.append(
+            {
+                "player_id": str(1000 + idx),
+                "first_name": first,
+                "last_name": last,
+                "position": position,
+                "number": rng.randint(1, 99),
+                "team": rng.choice(NFL_TEAMS),
+                "status": status,
+                "injury_status": injury_status,
+                "active": True,
+                # not part of the dump - used to generate values and projections
+                "_value": rng.betavariate(1.2, 4),
+            }
+        )
+
+    return players
+
+
+def _ktc_values(value: int, trend: int) -> dict:
+    return {
+        "value": value,
+        "overall7DayTrend": trend,
+        "tep": {"value": int(value * 1.02)},
+        "tepp": {"value": int(value * 1.04)},
+        "teppp": {"value": int(value * 1.06)},
+    }
+
+
+def _ktc_entry(player: dict, rng: random.Random, bye_weeks: dict[str, int]) -> dict:
+    def values(scale: float) -> dict:
+        return _ktc_values(int(player["_value"] * 9999 * scale), rng.randint(-300, 300))
+
+    return {
+        "playerID": int(player["player_id"]) + 100000,
+        "playerName": f"{player['first_name']} {player['last_name']}",
+        "position": player["position"],
+        "number": player["number"],
+        "team": player["team"],
+        "byeWeek": bye_weeks.get(player["team"]),
+        "superflexValues": values(1.3 if player["position"] == "QB" else 1.0),
+        "oneQBValues": values(1.0),
+    }
+
+
+def _ktc_pick(player_id: int, name: str, value: int) -> dict:
+    return {
+        "playerID": player_id,
+        "playerName": name,
+        "position": "RDP",
+        "number": 0,
+        "team": "FA",
+        "byeWeek": None,
+        "superflexValues": _ktc_values(value, 0),
+        "oneQBValues": _ktc_values(value, 0),
+    }
+
+
+def _fantasy_calc_entry(player: dict, rng: random.Random, dynasty: bool) -> dict:
+    return {
+        "player": {
+            "name": f"{player['first_name']} {player['last_name']}",
+            "sleeperId": player["player_id"],
+            "position": player["position"],
+            "maybeTeam": player["team"],
+        },
+        "value": int(player["_value"] * (10000 if dynasty else 8000) * rng.uniform(0.85, 1.15)),
+        "trend30Day": rng.randint(-500, 500),
+    }
+
+
+def _draft(
+    rng: random.Random, available: dict[str, list[dict]], positions: tuple[str, ...], scale: Scale
+) -> list[dict]:
+    """
+    Every slot is drafted a healthy starter and a healthy backup so a valid lineup always
+    exists whatever the injuries and byes - the rest of the roster is random depth.
+    """
+    skipped: list[dict] = []
+
+    def take(position: str, healthy: bool) -> dict:
+        players = available[position] or next(players for players in available.values() if players)
+
+        while True:
+            player = players.pop()
+
+            if not healthy or (player["status"] == "Active" and player["injury_status"] is None):
+                return player
+
+            skipped.append(player)
+
+    drafted = [
+        take(rng.choice(FLEX_POSITIONS.get(slot, (slot,))), healthy=True) for slot in positions for _ in range(2)
+    ]
+
+    while len(drafted) < len(positions) + scale.bench + scale.taxi:
+        if skipped and rng.random() < 0.5:
+            drafted.append(skipped.pop())
+        else:
+            drafted.append(take(rng.choices(list(POSITION_SHARE), weights=POSITION_SHARE.values())[0], healthy=False))
+
+    # injured players passed over for a starting slot are still available to other rosters
+    for player in skipped:
+        available[player["position"]].insert(0, player)
+
+    return drafted
+
+
+def _league(rng: random.Random, idx: int, players: list[dict], scale: Scale, league_id: str) -> dict:
+    positions = ROSTER_FORMATS[idx % len(ROSTER_FORMATS)]
+    scoring = SCORING_FORMATS[idx % len(SCORING_FORMATS)]
+
+    # each league drafts from its own shuffled copy of the shared player pool
+    available = {
+        position: rng.sample(position_players, len(position_players))
+        for position in POSITION_SHARE
+        for position_players in [[player for player in players if player["position"] == position]]
+    }
+
+    owners = [USER_ID] + [f"{league_id}_user_{roster_id}" for roster_id in range(2, scale.teams + 1)]
+    routes: dict[str, object] = {}
+
+    rosters = []
+    for roster_id, owner_id in enumerate(owners, start=1):
+        drafted = _draft(rng, available, positions, scale)
+        starters = [player["player_id"] for player in drafted[: 2 * len(positions) : 2]]
+        taxi = [player["player_id"] for player in drafted[-scale.taxi :]] if scale.taxi else []
+        reserve = [
+            player["player_id"]
+            for player in drafted
+            if player["status"] == "Inactive" and player["player_id"] not in taxi
+        ][: scale.reserve]
+        wins = rng.randint(0, WEEK - 1)
+
+        rosters.append(
+            {
+                "roster_id": roster_id,
+                "owner_id": owner_id,
+                "co_owners": None,
+                "players": [player["player_id"] for player in drafted],
+                "starters": starters,
+                "reserve": reserve,
+                "taxi": taxi,
+                "settings": {
+                    "wins": wins,
+                    "losses": WEEK - 1 - wins,
+                    "ties": 0,
+                    "fpts": rng.randint(250, 400),
+                    "fpts_decimal": rng.randint(0, 99),
+                },
+            }
+        )
+
+    routes[f"/v1/league/{league_id}"] = {
+        "name": f"Synthetic League {idx}",
+        "status": "in_season",
+        "total_rosters": scale.teams,
+        "roster_positions": list(positions) + ["BN"] * scale.bench,
+        "scoring_settings": scoring,
+        "settings": {
+            "taxi_slots": scale.taxi,
+            "reserve_slots": scale.reserve,
+            "playoff_teams": min(6, scale.teams),
+            "playoff_week_start": 15,
+            "draft_rounds": 4,
+        },
+    }
+    routes[f"/v1/league/{league_id}/users"] = [
+        {"user_id": owner_id, "display_name": f"Owner {roster_id}", "avatar": None}
+        for roster_id, owner_id in enumerate(owners, start=1)
+    ]
+    routes[f"/v1/league/{league_id}/rosters"] = rosters
+    routes[f"/v1/league/{league_id}/traded_picks"] = [
+        {
+            "season": str(SEASON + rng.randint(1, 3)),
+            "round": rng.randint(1, 4),
+            "roster_id": rng.randint(1, scale.teams),
+            "owner_id": rng.randint(1, scale.teams),
+        }
+        for _ in range(scale.teams)
+    ]
+
+    # round robin schedule through the regular season - rosters are paired differently each week
+    roster_ids = [roster["roster_id"] for roster in rosters]
+    for week in range(1, 15):
+        rng.shuffle(roster_ids)
+        routes[f"/v1/league/{league_id}/matchups/{week}"] = [
+            {"matchup_id": slot // 2 + 1, "roster_id": roster_id} for slot, roster_id in enumerate(roster_ids)
+        ]
+        routes[f"/v1/league/{league_id}/transactions/{week}"] = []
+
+    return routes
+
+
+def generate(scale: Scale | None = None, now: datetime | None = None) -> SyntheticBackend:
+    """
+    Deterministic (for a given scale) world of leagues sharing one NFL - the players dump,
+    KTC and FantasyCalc values, projections and schedule. Kickoffs are placed relative to
+    now so lineups are never locked.
+    """
+    scale = scale or Scale()
+    now = now or datetime.utcnow()
+    rng = random.Random(scale.seed)
+
+    if scale.teams % 2:
+        raise ValueError("Synthetic leagues need an even number of teams to schedule matchups")
+
+    deepest = 2 * max(len(positions) for positions in ROSTER_FORMATS) + scale.bench + scale.taxi
+    players = _players(rng, int(scale.teams * deepest * scale.depth))
+
+    bye_weeks = {team: 5 + idx % 10 for idx, team in enumerate(NFL_TEAMS)}
+    league_ids = [f"synthetic_{idx}" for idx in range(scale.leagues)]
+
+    backend = SyntheticBackend(league_ids=league_ids)
+    routes = backend.routes
+
+    routes[("api.sleeper.app", "/v1/state/nfl")] = {"leg": WEEK, "season": str(SEASON)}
+    routes[("api.sleeper.app", "/v1/players/nfl")] = {
+        player["player_id"]: {key: value for key, value in player.items() if not key.startswith("_")}
+        for player in players
+    }
+    routes[("api.sleeper.app", f"/projections/nfl/{SEASON}/{WEEK}")] = [
+        {
+            "player_id": player["player_id"],
+            "player": {"position": player["position"]},
+            "stats": {"pts_std": round(player["_value"] * 25, 2), "rec": round(rng.uniform(0, 8), 1)},
+        }
+        for player in players
+    ]
+
+    shuffled = list(NFL_TEAMS)
+    rng.shuffle(shuffled)
+    backend.graphql = {
+        "me": {"user_id": USER_ID},
+        "scores": [
+            {
+                "game_id": f"{SEASON}{WEEK:02}{idx:02}",
+                "date": (now + timedelta(days=2)).date().isoformat(),
+                "start_time": int((now + timedelta(days=2, hours=idx % 3 * 3)).timestamp() * 1000),
+                "status": "pre_game",
+                "metadata": {"home_team": home, "away_team": away},
+            }
+            for idx, (home, away) in enumerate(zip(shuffled[::2], shuffled[1::2]))
+        ],
+        "teams": [
+            {
+                "team": team,
+                "name": team,
+                "active": True,
+                "aliases": None,
+                "sport": "nfl",
+                "metadata": {"bye_week": str(bye_week)},
+            }
+            for team, bye_week in bye_weeks.items()
+        ],
+    }
+
+    # dynasty pick values by tier - KTC names picks like "2024 Early 1st"
+    pick_values = [
+        (f"{SEASON + offset} {tier} {_ORDINALS.get(draft_round, f'{draft_round}th')}", value)
+        for offset in range(1, 4)
+        for draft_round in range(1, 5)
+        for step, tier in enumerate(_PICK_TIERS)
+        for value in [int(6000 / draft_round**1.5) - step * 300]
+    ]
+    picks = [_ktc_pick(900000 + idx, name, value) for idx, (name, value) in enumerate(pick_values)]
+
+    ktc = [_ktc_entry(player, rng, bye_weeks) for player in players]
+    routes[("keeptradecut.com", "/dynasty-rankings")] = f"var playersArray = {_compact_json(ktc + picks)};"
+    routes[("keeptradecut.com", "/fantasy-rankings")] = f"var playersArray = {_compact_json(ktc)};"
+
+    pick_entries = [
+        {
+            "player": {"name": pick["playerName"], "sleeperId": None, "position": "PICK", "maybeTeam": None},
+            "value": pick["superflexValues"]["value"],
+            "trend30Day": 0,
+        }
+        for pick in picks
+    ]
+    backend.fantasy_calc = {
+        dynasty: [_fantasy_calc_entry(player, rng, dynasty) for player in players] + (pick_entries if dynasty else [])
+        for dynasty in (True, False)
+    }
+
+    for idx, league_id in enumerate(league_ids):
+        for path, payload in _league(rng, idx, players, scale, league_id).items():
+            routes[("api.sleeper.app", path)] = payload
+
+    return backend
+
+
+@contextlib.contextmanager
+def serve(backend: SyntheticBackend):
+    """
+    Answer every client request from backend for the duration of the block. The in
+    memory cache is flushed on the way in and out and the league ID and rate limiting
+    are restored when done.
+    """
+    from sleeperbot import utils
+    from sleeperbot.clients import (
+        fantasy_calc,
+        ktc,
+        sleeper,
+    )
+    from sleeperbot.clients.stub import StubAdapter
+
+    if config.redis:
+        raise RuntimeError("Synthetic leagues must not be served through a shared redis cache")
+
+    factories = (sleeper._rest, sleeper._graphql, ktc._session, fantasy_calc._session)
+    adapter = StubAdapter(backend)
+
+    previous = config.SLEEPER_LEAGUE_ID, config.RATE_LIMIT_ENABLED
+    config.SLEEPER_LEAGUE_ID, config.RATE_LIMIT_ENABLED = backend.league_ids[0], False
+
+    utils.get_cache().flush()
+
+    for factory in factories:
+        factory.cache_clear()
+        factory().mount("https://", adapter)
+
+    try:
+        yield adapter
+    finally:
+        for factory in factories:
+            factory.cache_clear()
+
+        utils.get_cache().flush()
+        config.SLEEPER_LEAGUE_ID, config.RATE_LIMIT_ENABLED = previous
@@ -0,0 +1,84 @@
+from dataclasses import dataclass
+from datetime import (
+    datetime,
+    timedelta,
+)
+
+import structlog
+
+log = structlog.get_logger()
+
+# games are volatile (inactives, late scratches, live stats) from this long before kickoff
+# until they are over - games without a final status are assumed over this long after kickoff
+VOLATILE_LEAD = timedelta(hours=2)
+GAME_LENGTH = timedelta(hours=4)
+
+# injury reports flip practice and game statuses for a while after they are published
+REPORT_WINDOW = timedelta(hours=2)
+
+
+def _windows(now: datetime) -> tuple[list[tuple[datetime, datetime]], bool] | None:
+    """
+    Volatile (start, end) windows for the rest of the week and whether any game is left
+    this week - None when no schedule was recorded (resolving a ttl never fetches).
+    """
+    # imported here - clients memoize with these policies so they can't be imported at load
+    from sleeperbot import scheduler
+    from sleeperbot.clients import sleeper
+
+    games = sleeper.peek_games()
+    if games is None:
+        return None
+
+    kickoffs = sorted({game.kickoff for game in games.values() if game.status != "complete"})
+
+    windows = [(kickoff - VOLATILE_LEAD, kickoff + GAME_LENGTH) for kickoff in kickoffs]
+
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    while kickoffs and day < kickoffs[-1]:
+        if day.weekday() in scheduler.INJURY_REPORT_DAYS:
+            published = day + scheduler.INJURY_REPORT_TIME
+            windows.append((published, published + REPORT_WINDOW))
+
+        day += timedelta(days=1)
+
+    return windows, bool(kickoffs)
+
+
+@dataclass(frozen=True)
+class SchedulePolicy:
+    """
+    memoize ttl following the NFL calendar. Results cached during a volatile window (game
+    day and injury report publication) live volatile seconds, default seconds during the
+    rest of a game week and quiet seconds once no games are left (after Monday night,
+    the offseason). Longer ttls are cut short at the start of the next volatile window.
+    """
+
+    volatile: int
+    default: int
+    quiet: int
+
+    def __call__(self, now: datetime | None = None) -> int:
+        now = now or datetime.utcnow()
+
+        try:
+            calendar = _windows(now)
+        except Exception:
+            log.exception("Unable to read the schedule - using the default ttl")
+            calendar = None
+
+        if calendar is None:
+            return self.default
+
+        windows, games_left = calendar
+
+        if any(start <= now < end for start, end in windows):
+            return self.volatile
+
+        ttl = self.default if games_left else self.quiet
+
+        upcoming = [start for start, _ in windows if start > now]
+        if upcoming:
+            ttl = min(ttl, max(self.volatile, int((min(upcoming) - now).total_seconds())))
+
+        return ttl
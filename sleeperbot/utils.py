@@ -1,18 +1,48 @@
 import functools
 import hashlib
+import inspect
 import logging
 import sys
+import time
+from collections.abc import (
+    Callable,
+    Iterator,
+)
 
 import structlog
 
-from sleeperbot import config
+from sleeperbot import (
+    config,
+    metrics,
+)
+from sleeperbot.cache import (
+    Cache,
+    InMemoryCache,
+    RedisCache,
+)
 from sleeperbot.models import (
+    Model,
     deserialize,
     serialize,
 )
 
+log = structlog.get_logger()
+
 DEFAULT_TTL = 3600
 
+# every memoized function keyed by memoized_name
+MEMOIZED: dict = {}
+
+MEMOIZE_HITS = metrics.Counter("memoize_hits_total", "Count", "Memoized calls served from the cache")
+MEMOIZE_MISSES = metrics.Counter("memoize_misses_total", "Count", "Memoized calls that had to be computed")
+MEMOIZE_SECONDS = metrics.Histogram("memoize_compute_seconds", "Seconds", "Time to compute a memoized miss")
+MEMOIZE_FALLBACKS = metrics.Counter(
+    "memoize_fallbacks_total", "Count", "Memoized calls that failed and returned the last known good result"
+)
+MEMOIZE_BYTES = metrics.Histogram(
+    "memoize_value_bytes", "Bytes", "Serialized size of memoized results", buckets=metrics.SIZE_BUCKETS
+)
+
 
 def setup_logging():
     logging.basicConfig(
@@ -44,49 +74,319 @@ def setup_logging():
     )
 
 
-class InMemoryCache:
-    def __init__(self):
-        self._cache = {}
+_memory_cache = InMemoryCache(max_bytes=config.CACHE_MEMORY_BYTES, store_objects=config.CACHE_STORE_OBJECTS)
+_redis_cache: RedisCache | None = None
+
+# raw entries fetched ahead of time by prefetch - consumed by the first memoized call
+_prefetched: dict[str, bytes] = {}
+
+
+def get_cache() -> Cache:
+    """Resolved on use (not at import or decoration time) so redis is only connected when needed"""
+    global _redis_cache
+
+    if not config.redis:
+        return _memory_cache
+
+    if _redis_cache is None:
+        _redis_cache = RedisCache(config.redis)
+
+    return _redis_cache
+
+
+def prefetch(calls: list[tuple]) -> list[str]:
+    """
+    Fetch the cached results for many memoized calls in a single round trip. Each call
+    is a (memoized function, args, kwargs) tuple matching exactly how it will be called.
+    Returns the keys that were prefetched - discard them once the calls have been made.
+    """
+    # keyed results are hashes which are read field by field instead
+    keys = [func.cache_key(*args, **kwargs) for func, args, kwargs in calls if not func.keyed]
+    prefetched = []
+
+    for key, value in zip(keys, get_cache().mget(keys)):
+        if value is not None:
+            _prefetched[key] = value
+            prefetched.append(key)
+
+    return prefetched
+
+
+def discard_prefetched(keys: list[str]):
+    """Drop prefetched entries that were never read so they can't be served once stale"""
+    for key in keys:
+        _prefetched.pop(key, None)
 
-    def exists(self, key: str) -> bool:
-        return key in self._cache
 
-    def set(self, key: str, value: str):
-        self._cache[key] = value.encode()
+def memoized_name(func) -> str:
+    return f"{func.__module__}.{func.__name__}"
 
-    def expire(self, key: str, ttl: int):
-        ...
 
-    def get(self, key: str) -> bytes:
-        return self._cache[key]
+def _key_token(value) -> str:
+    """Unambiguous string for a single memoize argument - type tagged so 1, "1" and True differ"""
+    if isinstance(value, Model):
+        return f"{type(value).__name__}:{value.cache_key}"
 
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return f"{type(value).__name__}:{value!r}"
 
-def memoize(ttl=DEFAULT_TTL):
-    _cache = config.redis or InMemoryCache()
+    return f"json:{serialize(value, sort_keys=True)}"
+
+
+def resolve_ttl(ttl) -> int:
+    """Seconds for a memoize ttl - either a number or a policy called when a result is stored"""
+    return int(ttl()) if callable(ttl) else ttl
+
+
+def memoize(
+    ttl=DEFAULT_TTL,
+    key: tuple[str, ...] | None = None,
+    config_keys: tuple[str, ...] = (),
+    fallback_ttl: int | None = None,
+    keyed: bool = False,
+    on_change: Callable[[dict | None, dict], None] | None = None,
+    baseline_ttl: int | None = None,
+):
+    """
+    Cache results of the decorated function.
+
+    ttl is seconds or a policy (ex. ttl.SchedulePolicy) called for the seconds each time a
+    result is stored - so results fetched while data is volatile expire sooner.
+
+    key limits which arguments participate in the cache key (all of them by default) and
+    config_keys names config attributes the result implicitly depends on (ex. the league
+    ID) so results for different leagues or tokens never collide.
+
+    fallback_ttl keeps a last known good copy of every result for that long. When the
+    function raises the copy is returned instead (without caching it as a fresh result).
+
+    keyed caches a dict result as a hash with a field per entry. Besides returning the
+    whole dict the wrapper then has get_many(fields, ...) to read only some entries and
+    scan(...) to stream every entry without holding them all at once. A keyed result
+    still cached when it is recomputed is diffed against the new one and only changed
+    entries are written back - on_change(previous, current) is then called with the old
+    and new values of just those entries (previous is None when there was nothing to diff).
+    baseline_ttl keeps a copy of a keyed result for that long so a result recomputed after
+    it expired is still diffed (against the copy) instead of being replaced wholesale.
+    """
+    if keyed and fallback_ttl is not None:
+        raise ValueError("keyed results can't keep a last known good copy")
+
+    if on_change is not None and not keyed:
+        raise ValueError("on_change requires keyed results")
+
+    if baseline_ttl is not None and not keyed:
+        raise ValueError("baseline_ttl requires keyed results")
 
     def outer(func):
+        parameters = inspect.signature(func).parameters
+        names = list(parameters)
+        defaults = {name: param.default for name, param in parameters.items() if param.default is not param.empty}
+        key_names = list(key) if key is not None else names
+
+        name = memoized_name(func)
+        hits, misses = MEMOIZE_HITS.labels(func=name), MEMOIZE_MISSES.labels(func=name)
+
         def hash_args(args, kwargs):
-            raw_bytes = serialize([args, kwargs], sort_keys=True).encode()
+            arguments = {**defaults, **dict(zip(names, args)), **kwargs}
+
+            parts = [f"{name}={_key_token(arguments.get(name))}" for name in key_names]
+            parts += [f"config.{name}={_key_token(getattr(config, name))}" for name in config_keys]
 
-            unsecure_hash = hashlib.new("md5", usedforsecurity=False)
-            unsecure_hash.update(raw_bytes)
+            return hashlib.blake2b("\x1f".join(parts).encode(), digest_size=16).hexdigest()
 
-            return unsecure_hash.hexdigest()
+        def cache_key(*args, **kwargs) -> str:
+            return f"memoize_{func.__module__}_{func.__name__}_{hash_args(args, kwargs)}"
+
+        def decode(cached):
+            # live objects come back as is from a cache that stores objects
+            return deserialize(cached.decode()) if isinstance(cached, bytes) else cached
 
         @functools.wraps(func)
         def inner(*args, **kwargs):
-            cache_key = f"memoize_{func.__module__}_{func.__name__}_{hash_args(args, kwargs)}"
+            if keyed:
+                return dict(scan(*args, **kwargs))
+
+            key = cache_key(*args, **kwargs)
+            cache = get_cache()
+
+            cached = _prefetched.pop(key, None)
+            if cached is None:
+                cached = cache.get(key)
+
+            if cached is not None:
+                hits.incr()
+                return decode(cached)
+
+            return compute(cache, key, args, kwargs)
+
+        def compute(cache: Cache, key: str, args, kwargs):
+            misses.incr()
+
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                fallback = cache.get(f"{key}_last_good") if fallback_ttl is not None else None
 
-            if _cache.exists(cache_key):
-                return deserialize(_cache.get(cache_key).decode())
+                if fallback is None:
+                    raise
 
+                log.warning("serving last known good result", func=name, exc_info=True)
+                MEMOIZE_FALLBACKS.incr(func=name)
+
+                return decode(fallback)
+
+            MEMOIZE_SECONDS.observe(time.perf_counter() - start, func=name)
+            store(cache, key, result)
+
+            return result
+
+        def store(cache: Cache, key: str, result):
+            if keyed:
+                store_keyed(cache, key, result)
+                return
+
+            if cache.stores_objects:
+                value = result
+            else:
+                value = serialize(result)
+                MEMOIZE_BYTES.observe(len(value), func=name)
+
+            if fallback_ttl is None:
+                cache.set(key, value, resolve_ttl(ttl))
+            else:
+                cache.mset(
+                    {key: value, f"{key}_last_good": value},
+                    {key: resolve_ttl(ttl), f"{key}_last_good": fallback_ttl},
+                )
+
+        def store_keyed(cache: Cache, key: str, result: dict):
+            values = result
+            if not cache.stores_objects:
+                values = {field: serialize(value).encode() for field, value in result.items()}
+                MEMOIZE_BYTES.observe(sum(len(value) for value in values.values()), func=name)
+
+            baseline = f"{key}_baseline"
+
+            previous = dict(cache.hscan(key))
+            cached = bool(previous)
+
+            # an expired result is diffed against its baseline copy instead
+            if not cached and baseline_ttl is not None:
+                previous = dict(cache.hscan(baseline))
+
+            if not previous:
+                cache.hset(key, values, resolve_ttl(ttl))
+
+                if baseline_ttl is not None:
+                    cache.hset(baseline, values, baseline_ttl)
+
+                if on_change is not None:
+                    on_change(None, result)
+
+                return
+
+            changed = {field: value for field, value in values.items() if previous.get(field) != value}
+            removed = [field for field in previous if field not in values]
+
+            if cached:
+                cache.hupdate(key, changed, removed, resolve_ttl(ttl))
+            else:
+                cache.hset(key, values, resolve_ttl(ttl))
+
+            if baseline_ttl is not None:
+                # the baseline only shares the cached result's changes when it holds the same entries
+                if cached and cache.ttl(baseline) is None:
+                    cache.hset(baseline, values, baseline_ttl)
+                else:
+                    cache.hupdate(baseline, changed, removed, baseline_ttl)
+
+            if on_change is not None and (changed or removed):
+                on_change(
+                    {field: decode(previous[field]) for field in [*changed, *removed] if field in previous},
+                    {field: result[field] for field in changed},
+                )
+
+        def scan(*args, **kwargs) -> Iterator[tuple[str, object]]:
+            """Every (field, value) of a keyed result, read from the cache in batches"""
+            key = cache_key(*args, **kwargs)
+            cache = get_cache()
+
+            entries = cache.hscan(key)
+            first = next(entries, None)
+
+            if first is None:
+                yield from compute(cache, key, args, kwargs).items()
+                return
+
+            hits.incr()
+
+            yield first[0], decode(first[1])
+            for field, cached in entries:
+                yield field, decode(cached)
+
+        def get_many(fields, *args, **kwargs) -> dict:
+            """Only the given fields of a keyed result - fields the result doesn't have are left out"""
+            fields = list(fields)
+            if not fields:
+                return {}
+
+            key = cache_key(*args, **kwargs)
+            cache = get_cache()
+
+            cached = cache.hmget(key, fields)
+
+            # none of the fields being cached is either a miss or fields the result doesn't have
+            if any(value is not None for value in cached) or cache.ttl(key) is not None:
+                hits.incr()
+                return {field: decode(value) for field, value in zip(fields, cached) if value is not None}
+
+            result = compute(cache, key, args, kwargs)
+
+            return {field: result[field] for field in fields if field in result}
+
+        def refresh(*args, **kwargs):
+            """Recompute and replace the cached result without reading (or first dropping) it"""
+            key = cache_key(*args, **kwargs)
             result = func(*args, **kwargs)
 
-            _cache.set(cache_key, serialize(result))
-            _cache.expire(cache_key, ttl)
+            _prefetched.pop(key, None)
+            store(get_cache(), key, result)
 
             return result
 
+        def peek(*args, **kwargs):
+            """The cached result or None - never computes (keyed results are read in full)"""
+            key = cache_key(*args, **kwargs)
+
+            if keyed:
+                return {field: decode(cached) for field, cached in get_cache().hscan(key)} or None
+
+            cached = get_cache().get(key)
+
+            return None if cached is None else decode(cached)
+
+        def invalidate(*args, **kwargs):
+            key = cache_key(*args, **kwargs)
+
+            _prefetched.pop(key, None)
+            get_cache().delete(key)
+
+        # exposed so callers like the warm snapshot can read and seed cached entries directly
+        inner.cache_key = cache_key
+        inner.invalidate = invalidate
+        inner.refresh = refresh
+        inner.peek = peek
+        inner.ttl = ttl
+        inner.keyed = keyed
+
+        if keyed:
+            inner.get_many = get_many
+            inner.scan = scan
+
+        MEMOIZED[memoized_name(inner)] = inner
+
         return inner
 
     return outer
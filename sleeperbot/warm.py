@@ -0,0 +1,130 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import structlog
+
+from sleeperbot import (
+    config,
+    metrics,
+    scheduler,
+)
+from sleeperbot.clients import sleeper
+from sleeperbot.league import (
+    SNAPSHOT_TTL,
+    League,
+    memoized_calls,
+)
+from sleeperbot.utils import (
+    get_cache,
+    memoized_name,
+    resolve_ttl,
+)
+
+log = structlog.get_logger()
+
+WARMED = metrics.Counter("cache_warm_total", "Count", "Memoized entries refreshed ahead of their expiry")
+
+
+def _until_next_run() -> float | None:
+    """Seconds until the next scheduled manager run or None when nothing is scheduled"""
+    try:
+        upcoming = scheduler.schedule()
+    except Exception:
+        log.exception("Unable to load the schedule - warming by margin only")
+        return None
+
+    return (upcoming[0] - datetime.utcnow()).total_seconds() if upcoming else None
+
+
+def _deadline(ttl: int, until: float | None, margin: int) -> float:
+    """Entries with fewer seconds than this left are refreshed"""
+    # refreshing early only helps the next run when the fresh entry is still cached by then
+    if until is not None and until + margin <= ttl:
+        return until + margin
+
+    return margin
+
+
+def stale(calls: list[tuple], until: float | None, margin: int, force: bool = False) -> list[tuple]:
+    """The memoized (function, args, kwargs) calls that are missing or due to expire"""
+    cache = get_cache()
+    due = []
+
+    for func, args, kwargs in calls:
+        remaining = None if force else cache.ttl(func.cache_key(*args, **kwargs))
+
+        if remaining is None or remaining < _deadline(resolve_ttl(func.ttl), until, margin):
+            due.append((func, args, kwargs))
+
+    return due
+
+
+def _refresh(calls: list[tuple]) -> tuple[list[str], list[str]]:
+    """Refresh calls in parallel and return the names of the ones that were refreshed and that failed"""
+    if not calls:
+        return [], []
+
+    def refresh(call) -> bool:
+        func, args, kwargs = call
+
+        try:
+            func.refresh(*args, **kwargs)
+        except Exception:
+            # the current entry (or its last known good copy) is left for the next run to use
+            log.exception("Unable to warm cache entry", func=memoized_name(func))
+            WARMED.incr(func=memoized_name(func), status="failed")
+            return False
+
+        WARMED.incr(func=memoized_name(func), status="refreshed")
+        return True
+
+    with ThreadPoolExecutor(max_workers=min(config.WARM_WORKERS, len(calls))) as pool:
+        outcomes = list(pool.map(refresh, calls))
+
+    names = [memoized_name(func) for func, _, _ in calls]
+
+    return (
+        [name for name, refreshed in zip(names, outcomes) if refreshed],
+        [name for name, refreshed in zip(names, outcomes) if not refreshed],
+    )
+
+
+def warm(margin: int | None = None, force: bool = False) -> dict:
+    """
+    Refresh every memoized call League makes that expires within margin seconds (WARM_MARGIN
+    by default) or before the next scheduled run, then rebuild the league snapshot when any
+    of them changed - so the run right before lock never fetches upstream inline.
+    """
+    margin = config.WARM_MARGIN if margin is None else margin
+    start = time.perf_counter()
+
+    until = _until_next_run()
+
+    refreshed, failed = _refresh(stale(memoized_calls(), until, margin, force))
+
+    # the remaining calls are keyed by the (possibly just refreshed) league settings
+    settings = sleeper.get_league_settings()
+    more_refreshed, more_failed = _refresh(stale(memoized_calls(settings), until, margin, force))
+
+    refreshed += more_refreshed
+    failed += more_failed
+
+    remaining = get_cache().ttl(League.snapshot_key(settings))
+    rebuild = bool(refreshed) or remaining is None or remaining < _deadline(resolve_ttl(SNAPSHOT_TTL), until, margin)
+
+    if rebuild:
+        # stored over the previous snapshot so concurrent runs never find it missing
+        League().store()
+
+    result = {
+        "refreshed": refreshed,
+        "failed": failed,
+        "league": rebuild,
+        "next_run": until,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+    log.info("warmed cache", **result)
+
+    return result
@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+# config is loaded when sleeperbot is first imported and both of these are required
+os.environ.setdefault("SLEEPER_TOKEN", "test-token")
+os.environ.setdefault("SLEEPER_LEAGUE_ID", "test-league")
+
+
+class Clock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    """Frozen time.time that only moves when advanced"""
+    clock = Clock()
+    monkeypatch.setattr("time.time", clock)
+
+    return clock
+
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    """Fresh in-memory cache used by memoize for the duration of a test"""
+    from sleeperbot import (
+        config,
+        utils,
+    )
+    from sleeperbot.cache import InMemoryCache
+
+    cache = InMemoryCache()
+
+    monkeypatch.setattr(config, "REDIS_HOST", "")
+    monkeypatch.setattr(utils, "_memory_cache", cache)
+    monkeypatch.setattr(utils, "_prefetched", {})
+
+    return cache
@@ -0,0 +1,100 @@
+import pytest
+
+from sleeperbot import config
+from sleeperbot.clients.breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+)
+
+
+@pytest.fixture
+def breaker(memory_cache, monkeypatch) -> CircuitBreaker:
+    monkeypatch.setattr(config, "BREAKER_FAILURES", 2)
+    monkeypatch.setattr(config, "BREAKER_COOLDOWN", 60)
+    monkeypatch.setattr(config, "BREAKER_LATENCY", 10.0)
+
+    return CircuitBreaker("test")
+
+
+def _failing():
+    raise ConnectionError("down")
+
+
+def test_opens_after_consecutive_failures(breaker, clock):
+    call = breaker(_failing)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            call()
+
+    assert breaker.is_open
+
+    with pytest.raises(CircuitOpenError):
+        call()
+
+
+def test_success_resets_failures(breaker, clock):
+    outcomes = iter([ConnectionError("down"), "ok", ConnectionError("down"), "ok"])
+
+    @breaker
+    def call():
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    for _ in range(4):
+        try:
+            call()
+        except ConnectionError:
+            pass
+
+    assert not breaker.is_open
+
+
+def test_only_one_trial_call_after_cooldown(breaker, clock):
+    rejected = []
+
+    @breaker
+    def call(trial: bool = False):
+        if trial:
+            # a concurrent caller arriving while the trial call is still running
+            try:
+                call()
+            except CircuitOpenError:
+                rejected.append(True)
+
+            return "ok"
+
+        raise ConnectionError("down")
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            call()
+
+    clock.advance(60)
+
+    assert call(trial=True) == "ok"
+    assert rejected == [True]
+    assert not breaker.is_open
+
+
+def test_failed_trial_restarts_cooldown(breaker, clock):
+    call = breaker(_failing)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            call()
+
+    clock.advance(60)
+
+    with pytest.raises(ConnectionError):
+        call()
+
+    clock.advance(30)
+    with pytest.raises(CircuitOpenError):
+        call()
+
+    clock.advance(30)
+    with pytest.raises(ConnectionError):
+        call()
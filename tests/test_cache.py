@@ -0,0 +1,157 @@
+import pytest
+
+from sleeperbot.cache import InMemoryCache
+
+
+def test_expired_entries_are_not_returned(clock):
+    cache = InMemoryCache()
+    cache.set("key", "value", 10)
+
+    clock.advance(9)
+    assert cache.get("key") == b"value"
+    assert cache.ttl("key") == 1
+
+    clock.advance(1)
+    assert cache.get("key") is None
+    assert cache.ttl("key") is None
+
+
+def test_expired_entries_can_be_added_again(clock):
+    cache = InMemoryCache()
+
+    assert cache.add("key", "first", 10)
+    assert not cache.add("key", "second", 10)
+
+    clock.advance(10)
+    assert cache.add("key", "third", 10)
+    assert cache.get("key") == b"third"
+
+
+def test_expired_hashes_are_empty(clock):
+    cache = InMemoryCache()
+    cache.hset("key", {"a": "1", "b": "2"}, 10)
+
+    assert dict(cache.hscan("key")) == {"a": b"1", "b": b"2"}
+
+    clock.advance(10)
+    assert dict(cache.hscan("key")) == {}
+    assert cache.hmget("key", ["a", "b"]) == [None, None]
+
+
+def test_hupdate_writes_only_changes_and_resets_ttl(clock):
+    cache = InMemoryCache()
+    cache.hset("key", {"a": "1", "b": "2"}, 10)
+
+    clock.advance(5)
+    cache.hupdate("key", {"b": "3", "c": "4"}, ["a"], 10)
+
+    assert dict(cache.hscan("key")) == {"b": b"3", "c": b"4"}
+    assert cache.ttl("key") == 10
+
+
+def test_size_stays_within_max_bytes():
+    cache = InMemoryCache(max_bytes=1000)
+
+    for idx in range(100):
+        cache.set(f"key{idx}", b"x" * 100, 60)
+        assert cache.size <= 1000
+
+    assert cache.get("key0") is None
+    assert cache.get("key99") == b"x" * 100
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = InMemoryCache(max_bytes=300)
+
+    cache.set("a", b"x" * 100, 60)
+    cache.set("b", b"x" * 100, 60)
+    cache.set("c", b"x" * 100, 60)
+
+    # reading a makes b the least recently used entry
+    cache.get("a")
+    cache.set("d", b"x" * 100, 60)
+
+    assert cache.get("b") is None
+    assert [cache.get(key) is not None for key in ("a", "c", "d")] == [True, True, True]
+
+
+def test_expired_entries_are_evicted_before_live_ones(clock):
+    cache = InMemoryCache(max_bytes=300)
+
+    cache.set("live", b"x" * 100, 60)
+    cache.set("expiring", b"x" * 100, 5)
+    cache.set("other", b"x" * 100, 60)
+
+    clock.advance(5)
+    cache.set("new", b"x" * 100, 60)
+
+    assert cache.get("live") == b"x" * 100
+    assert cache.size == 300
+
+
+def test_overwriting_a_key_replaces_its_size():
+    cache = InMemoryCache(max_bytes=1000)
+
+    cache.set("key", b"x" * 500, 60)
+    cache.set("key", b"x" * 100, 60)
+
+    assert cache.size == 100
+
+
+def test_hashes_count_towards_max_bytes():
+    cache = InMemoryCache(max_bytes=1000)
+
+    cache.hset("hash", {str(idx): b"x" * 100 for idx in range(8)}, 60)
+    assert cache.size == 800
+
+    cache.set("key", b"x" * 300, 60)
+
+    assert cache.size <= 1000
+    assert dict(cache.hscan("hash")) == {}
+
+
+def test_hash_and_value_keys_are_not_mixed():
+    cache = InMemoryCache()
+    cache.set("value", "1", 60)
+    cache.hset("hash", {"a": "1"}, 60)
+
+    with pytest.raises(TypeError):
+        cache.get("hash")
+
+    with pytest.raises(TypeError):
+        list(cache.hscan("value"))
+
+
+def test_league_does_not_mutate_stored_objects(memory_cache, monkeypatch):
+    from sleeperbot import (
+        synthetic,
+        utils,
+    )
+    from sleeperbot.league import League
+
+    monkeypatch.setattr(utils, "_memory_cache", InMemoryCache(store_objects=True))
+
+    # measured as each league is built since mutated rosters would be shared by all of them
+    picks, values = set(), set()
+
+    with synthetic.serve(synthetic.generate(synthetic.Scale(teams=4))):
+        for _ in range(3):
+            league = League()
+            roster = next(iter(league.rosters.values()))
+
+            picks.add(len(roster.picks))
+            values.add(round(league.roster_value(roster), 6))
+
+    assert len(picks) == 1
+    assert len(values) == 1
+
+
+def test_incomplete_backends_fail_when_constructed():
+    from sleeperbot.cache import Cache
+
+    class Incomplete(Cache):
+        def get(self, key: str):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
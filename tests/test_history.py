@@ -0,0 +1,74 @@
+import time
+from datetime import (
+    UTC,
+    datetime,
+    timedelta,
+)
+
+import pytest
+
+from sleeperbot import (
+    config,
+    history,
+)
+from sleeperbot.models import (
+    Player,
+    PlayerValue,
+)
+
+
+@pytest.fixture
+def local_time(monkeypatch):
+    """Run on a host whose local time isn't UTC"""
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+
+    yield
+
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.fixture
+def history_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "VALUE_HISTORY_PATH", str(tmp_path))
+
+
+def _players(value: float) -> list[Player]:
+    return [
+        Player(guid="1", first_name="First", last_name="Last", dynasty=PlayerValue(values={"ktc": value})),
+    ]
+
+
+def _record(value: float, when: datetime):
+    history.record("ktc", True, _players(value), when.replace(tzinfo=UTC).timestamp())
+
+
+def test_record_uses_utc_epoch(history_path, local_time, clock):
+    history.record("ktc", True, _players(100.0))
+
+    day = datetime.utcfromtimestamp(clock.now).date()
+    (frame,) = history.frames(day, day)
+
+    assert frame.timestamp == clock.now
+
+
+def test_values_at_reads_naive_datetimes_as_utc(history_path, local_time):
+    now = datetime(2023, 10, 1, 12)
+
+    _record(100.0, now - timedelta(hours=2))
+    _record(200.0, now)
+
+    # a local time read would be hours off and pick the wrong frame
+    assert history.values_at("ktc", True, now - timedelta(hours=1)) == {"First Last": 100.0}
+    assert history.values_at("ktc", True, now) == {"First Last": 200.0}
+    assert history.values_at("ktc", True, now.replace(tzinfo=UTC)) == {"First Last": 200.0}
+
+
+def test_series_points_are_utc(history_path, local_time):
+    now = datetime(2023, 10, 1, 23, 30)
+    _record(100.0, now)
+
+    (point,) = history.series("ktc", True, "1", now.date(), now.date())
+
+    assert point.when == now
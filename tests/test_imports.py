@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from sleeperbot.benchmarks import (
+    DEFERRED_MODULES,
+    IMPORT_BUDGET_MS,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_SCRIPT = """
+import json, sys, time
+
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+
+print(json.dumps({{"ms": elapsed * 1000, "modules": sorted(sys.modules)}}))
+"""
+
+
+def _import(module: str, tmp_path) -> dict:
+    env = {
+        **os.environ,
+        "SLEEPER_TOKEN": "test-token",
+        "SLEEPER_LEAGUE_ID": "test-league",
+        # no snapshot to load so importing the lambda never touches the network
+        "SNAPSHOT_PATH": str(tmp_path / "missing.snapshot"),
+        "SNAPSHOT_BUNDLE_PATH": str(tmp_path / "missing.bundle.snapshot"),
+        "REDIS_HOST": "",
+    }
+
+    result = subprocess.run(
+        [sys.executable, "-c", _SCRIPT.format(module=module)],
+        capture_output=True,
+        check=True,
+        cwd=ROOT,
+        env=env,
+        text=True,
+    )
+
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+@pytest.mark.parametrize("module", ["lambda_function", "sleeperbot.cli"])
+def test_startup_defers_heavy_imports(module, tmp_path):
+    imported = _import(module, tmp_path)
+
+    assert [module for module in DEFERRED_MODULES if module in imported["modules"]] == []
+
+
+@pytest.mark.parametrize("module", ["lambda_function", "sleeperbot.cli"])
+def test_startup_import_time_within_budget(module, tmp_path):
+    # best of a few runs so a busy machine doesn't fail the budget
+    elapsed = min(_import(module, tmp_path)["ms"] for _ in range(3))
+
+    assert elapsed <= IMPORT_BUDGET_MS
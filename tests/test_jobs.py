@@ -0,0 +1,164 @@
+import dataclasses
+import json
+
+import pytest
+
+from sleeperbot import (
+    config,
+    jobs,
+)
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def redis(monkeypatch, clock):
+    client = fakeredis.FakeRedis()
+
+    monkeypatch.setattr(config, "REDIS_HOST", "fakeredis")
+    monkeypatch.setattr(config, "_redis", client, raising=False)
+
+    return client
+
+
+def _processing(redis) -> list[str]:
+    return [raw.decode() for raw in redis.lrange(jobs.PROCESSING, 0, -1)]
+
+
+def _pending(redis) -> list[str]:
+    return [raw.decode() for raw in redis.lrange(jobs.PENDING, 0, -1)]
+
+
+def test_claim_leases_the_oldest_job(redis):
+    first, second = jobs.enqueue([jobs.Job(league_id="1"), jobs.Job(league_id="2")])
+
+    job = jobs.claim(timeout=1)
+
+    assert job.guid == first
+    assert job.attempts == 1
+    assert redis.exists(jobs._lease_key(first))
+    assert _processing(redis) == [first]
+    assert _pending(redis) == [second]
+
+
+def test_leased_jobs_are_not_reaped(redis, clock):
+    (guid,) = jobs.enqueue([jobs.Job(league_id="1")])
+    jobs.claim(timeout=1)
+
+    clock.advance(jobs.CLAIM_GRACE)
+
+    assert jobs.reap() == 0
+    assert _processing(redis) == [guid]
+
+
+def test_just_claimed_jobs_without_a_lease_get_a_grace_period(redis, clock):
+    (guid,) = jobs.enqueue([jobs.Job(league_id="1")])
+
+    # a worker that has moved the job but not set its lease yet
+    redis.lmove(jobs.PENDING, jobs.PROCESSING, "RIGHT", "LEFT")
+
+    assert jobs.reap() == 0
+    assert _processing(redis) == [guid]
+
+    # the worker sets its lease and clears what the reaper saw
+    redis.set(jobs._lease_key(guid), "worker", ex=jobs.LEASE_SECONDS)
+    redis.delete(jobs._orphaned_key(guid))
+
+    clock.advance(jobs.CLAIM_GRACE)
+
+    assert jobs.reap() == 0
+    assert _processing(redis) == [guid]
+
+
+def test_jobs_whose_lease_expired_are_requeued(redis, clock):
+    (guid,) = jobs.enqueue([jobs.Job(league_id="1")])
+    jobs.claim(timeout=1)
+
+    # the worker died so its lease runs out
+    clock.advance(jobs.LEASE_SECONDS + 1)
+
+    # first seen without a lease
+    assert jobs.reap() == 0
+
+    clock.advance(jobs.CLAIM_GRACE)
+
+    assert jobs.reap() == 1
+    assert _processing(redis) == []
+    assert _pending(redis) == [guid]
+    assert not redis.exists(jobs._orphaned_key(guid))
+
+
+def test_jobs_out_of_attempts_are_abandoned(redis, clock):
+    (guid,) = jobs.enqueue([jobs.Job(league_id="1", attempts=jobs.MAX_ATTEMPTS - 1)])
+    jobs.claim(timeout=1)
+
+    clock.advance(jobs.LEASE_SECONDS + 1)
+    jobs.reap()
+    clock.advance(jobs.CLAIM_GRACE)
+
+    assert jobs.reap() == 0
+    assert _pending(redis) == []
+    assert [(result.job, result.status) for result in jobs.results()] == [(guid, "abandoned")]
+
+
+def test_failed_jobs_are_retried_until_out_of_attempts(redis, monkeypatch):
+    def fail():
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(jobs.manager, "run", fail)
+    (guid,) = jobs.enqueue([jobs.Job(league_id="1")])
+
+    statuses = []
+    for _ in range(jobs.MAX_ATTEMPTS):
+        statuses.append(jobs.process(jobs.claim(timeout=1)).status)
+
+    assert statuses == ["retrying"] * (jobs.MAX_ATTEMPTS - 1) + ["failed"]
+    assert _pending(redis) == [] and _processing(redis) == []
+    assert [(result.job, result.status) for result in jobs.results()] == [(guid, "failed")]
+
+
+def test_completed_jobs_store_their_result(redis, monkeypatch):
+    monkeypatch.setattr(jobs.manager, "run", lambda: {"applied": True})
+    (guid,) = jobs.enqueue([jobs.Job(league_id="1")])
+
+    result = jobs.process(jobs.claim(timeout=1))
+
+    assert result.status == "complete"
+    assert jobs.results()[0].output == {"applied": True}
+    assert not redis.exists(jobs._lease_key(guid))
+
+
+def test_jobs_can_only_reference_token_variables(redis):
+    with pytest.raises(ValueError):
+        jobs.enqueue([jobs.Job(league_id="1", token_ref="AWS_SECRET_ACCESS_KEY")])
+
+    assert _pending(redis) == []
+
+    jobs.enqueue([jobs.Job(league_id="1"), jobs.Job(league_id="2", token_ref="SLEEPER_TOKEN_LEAGUE2")])
+    assert len(_pending(redis)) == 2
+
+
+def test_jobs_pushed_without_enqueue_cant_read_other_variables(redis, monkeypatch):
+    monkeypatch.setattr(jobs.manager, "run", lambda: {"applied": True})
+
+    job = jobs.Job(league_id="1", token_ref="AWS_SECRET_ACCESS_KEY")
+    redis.set(jobs._job_key(job.guid), json.dumps(dataclasses.asdict(job)))
+    redis.lpush(jobs.PENDING, job.guid)
+
+    result = jobs.process(jobs.claim(timeout=1))
+
+    assert result.status == "failed"
+    assert result.attempts == 1
+
+
+def test_jobs_whose_token_is_missing_fail_without_retrying(redis, monkeypatch):
+    monkeypatch.setattr(jobs.manager, "run", lambda: {"applied": True})
+    monkeypatch.delenv("SLEEPER_TOKEN_MISSING", raising=False)
+
+    (guid,) = jobs.enqueue([jobs.Job(league_id="1", token_ref="SLEEPER_TOKEN_MISSING")])
+
+    result = jobs.process(jobs.claim(timeout=1))
+
+    assert result.status == "failed"
+    assert "SLEEPER_TOKEN_MISSING" in result.error
+    assert _pending(redis) == [] and _processing(redis) == []
@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+import pytest
+
+from sleeperbot import manager
+from sleeperbot.clients import sleeper
+from sleeperbot.models import Roster
+
+PLAYER_IDS = ["1", "2", "3"]
+
+
+@pytest.fixture
+def applied(memory_cache, monkeypatch) -> list[list[str]]:
+    """Starters of every lineup sent to sleeper"""
+    applied = []
+
+    def update_roster(settings, roster, drop_players, taxi=False):
+        applied.append(roster.starters)
+
+    monkeypatch.setattr(sleeper, "update_roster", update_roster)
+
+    return applied
+
+
+def _league():
+    return SimpleNamespace(settings=SimpleNamespace(guid="league", week=4))
+
+
+def _roster(*starters: str) -> Roster:
+    return Roster(guid="1", owners=["owner"], starters=list(starters), player_ids=PLAYER_IDS)
+
+
+def _run(league, live: Roster, planned: Roster) -> Roster:
+    """Apply planned to the live roster - returns the live roster afterwards"""
+    return planned if manager._apply_once(league, live, planned, []) else live
+
+
+def test_retried_changes_are_applied_once(applied):
+    league, live = _league(), _roster("1")
+
+    assert manager._apply_once(league, live, _roster("2"), [])
+    assert not manager._apply_once(league, live, _roster("2"), [])
+    assert applied == [["2"]]
+
+
+def test_changes_are_applied_again_once_the_roster_moved_away(applied):
+    league = _league()
+
+    # X is set, a starter goes out so Z is set, then they are upgraded so X is planned again
+    live = _run(league, _roster("1"), _roster("2"))
+    live = _run(league, live, _roster("3"))
+    live = _run(league, live, _roster("2"))
+
+    assert live.starters == ["2"]
+    assert applied == [["2"], ["3"], ["2"]]
+
+
+def test_failed_changes_can_be_retried(applied, monkeypatch):
+    league, live = _league(), _roster("1")
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("upstream failed")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(sleeper, "update_roster", fail)
+
+        with pytest.raises(RuntimeError):
+            manager._apply_once(league, live, _roster("2"), [])
+
+    assert manager._apply_once(league, live, _roster("2"), [])
+    assert applied == [["2"]]
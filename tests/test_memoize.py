@@ -0,0 +1,148 @@
+from sleeperbot import utils
+from sleeperbot.utils import (
+    discard_prefetched,
+    memoize,
+    prefetch,
+)
+
+
+def _counted(**kwargs):
+    calls = []
+
+    @memoize(ttl=60, **kwargs)
+    def fetch(value="a"):
+        calls.append(value)
+        return {"value": value, "call": len(calls)}
+
+    return fetch, calls
+
+
+def test_invalidate_drops_prefetched_result(memory_cache):
+    fetch, calls = _counted()
+    fetch()
+
+    prefetch([(fetch, (), {})])
+    fetch.invalidate()
+
+    assert fetch()["call"] == 2
+    assert utils._prefetched == {}
+
+
+def test_discard_prefetched_drops_unread_results(memory_cache):
+    fetch, _ = _counted()
+    fetch()
+    fetch("b")
+
+    keys = prefetch([(fetch, (), {}), (fetch, ("b",), {})])
+    assert len(keys) == 2
+
+    fetch()
+    discard_prefetched(keys)
+
+    assert utils._prefetched == {}
+
+
+def test_refresh_replaces_prefetched_result(memory_cache):
+    fetch, _ = _counted()
+    fetch()
+
+    prefetch([(fetch, (), {})])
+    fetch.refresh()
+
+    assert fetch()["call"] == 2
+
+
+def test_league_build_leaves_nothing_prefetched(memory_cache):
+    from sleeperbot import synthetic
+    from sleeperbot.league import League
+
+    with synthetic.serve(synthetic.generate(synthetic.Scale(teams=4))):
+        League()
+        League()
+
+    assert utils._prefetched == {}
+
+
+def _keyed(**kwargs):
+    source, changes = {}, []
+
+    @memoize(ttl=60, keyed=True, on_change=lambda previous, current: changes.append((previous, current)), **kwargs)
+    def fetch():
+        return dict(source)
+
+    return fetch, source, changes
+
+
+def test_keyed_first_result_reports_nothing_to_diff(memory_cache):
+    fetch, source, changes = _keyed()
+    source.update(a=1, b=2)
+
+    assert fetch() == {"a": 1, "b": 2}
+    assert changes == [(None, {"a": 1, "b": 2})]
+
+
+def test_keyed_refresh_reports_only_changed_and_removed_entries(memory_cache):
+    fetch, source, changes = _keyed()
+    source.update(a=1, b=2, c=3)
+    fetch()
+
+    source.update(b=20, d=4)
+    del source["c"]
+    fetch.refresh()
+
+    assert changes[-1] == ({"b": 2, "c": 3}, {"b": 20, "d": 4})
+    assert fetch() == {"a": 1, "b": 20, "d": 4}
+
+
+def test_keyed_refresh_without_changes_does_not_call_on_change(memory_cache):
+    fetch, source, changes = _keyed()
+    source.update(a=1)
+    fetch()
+
+    fetch.refresh()
+
+    assert len(changes) == 1
+
+
+def test_keyed_expired_result_is_replaced_wholesale(memory_cache, clock):
+    fetch, source, changes = _keyed()
+    source.update(a=1)
+    fetch()
+
+    clock.advance(60)
+    source.update(a=2)
+
+    assert fetch() == {"a": 2}
+    assert changes[-1] == (None, {"a": 2})
+
+
+def test_keyed_expired_result_is_diffed_against_baseline(memory_cache, clock):
+    fetch, source, changes = _keyed(baseline_ttl=600)
+    source.update(a=1, b=2)
+    fetch()
+
+    clock.advance(60)
+    source.update(b=3)
+
+    assert fetch() == {"a": 1, "b": 3}
+    assert changes[-1] == ({"b": 2}, {"b": 3})
+
+    # the baseline holds the latest result once it has been diffed
+    clock.advance(60)
+    source.update(a=5)
+
+    fetch()
+    assert changes[-1] == ({"a": 1}, {"a": 5})
+
+
+def test_keyed_get_many_and_scan(memory_cache):
+    fetch, source, _ = _keyed()
+    source.update(a=1, b=2, c=3)
+
+    assert fetch.get_many(["a", "c", "missing"]) == {"a": 1, "c": 3}
+    assert dict(fetch.scan()) == {"a": 1, "b": 2, "c": 3}
+
+    # both read the cached hash rather than computing again
+    source.clear()
+    assert fetch.get_many(["b"]) == {"b": 2}
+    assert fetch.get_many(["missing"]) == {}
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from sleeperbot import metrics
+
+
+@pytest.fixture
+def histogram():
+    histogram = metrics.Histogram("test_seconds", "Seconds", "Test histogram", buckets=(0.1, 1.0))
+
+    yield histogram
+
+    metrics.REGISTRY.pop(histogram.name)
+
+
+def _emf(name: str) -> dict:
+    records = [json.loads(line) for line in metrics.to_emf().splitlines()]
+    return next(record for record in records if name in record)
+
+
+def test_emf_histograms_keep_exact_count_and_sum(histogram):
+    values = [0.05] * 150 + [0.5] * 40 + [0.7] * 10 + [3.0] * 2
+
+    for value in values:
+        histogram.observe(value, host="example.com")
+
+    record = _emf(histogram.name)
+    emitted = record[histogram.name]
+
+    assert record["host"] == "example.com"
+    assert emitted["Counts"] == [150, 50, 2]
+    assert sum(emitted["Counts"]) == len(values)
+    assert sum(value * count for value, count in zip(emitted["Values"], emitted["Counts"])) == pytest.approx(
+        sum(values)
+    )
+    assert emitted["Values"] == pytest.approx([0.05, 0.54, 3.0])
+
+
+def test_emf_histograms_skip_empty_buckets(histogram):
+    histogram.observe(2.0)
+
+    assert _emf(histogram.name)[histogram.name] == {"Values": [2.0], "Counts": [1]}
@@ -0,0 +1,68 @@
+from sleeperbot.clients import sleeper
+from sleeperbot.models import Player
+
+
+def _player(guid: str, **kwargs) -> Player:
+    return Player(guid=guid, first_name="First", last_name="Last", **kwargs)
+
+
+def test_changed_and_removed_players_are_recorded(memory_cache, clock):
+    sleeper._record_player_changes(
+        {"1": _player("1", team="KC"), "2": _player("2")},
+        {"1": _player("1", team="KC", injury_status="Out"), "3": _player("3")},
+    )
+
+    changes, reset = sleeper.get_player_changes(0.0)
+
+    assert [(change.guid, change.fields) for change in changes] == [
+        ("1", ["injury_status"]),
+        ("2", ["active"]),
+        ("3", ["active"]),
+    ]
+    assert reset is None
+    assert sleeper.player_changes_cursor() == clock.now
+
+
+def test_concurrent_refreshes_keep_each_others_changes(memory_cache, clock, monkeypatch):
+    hscan = memory_cache.hscan
+
+    def interleaved(key):
+        # another worker's refresh lands while this one is recording
+        monkeypatch.setattr(memory_cache, "hscan", hscan)
+        sleeper._record_player_changes({"2": _player("2")}, {"2": _player("2", status="Inactive")})
+
+        return hscan(key)
+
+    monkeypatch.setattr(memory_cache, "hscan", interleaved)
+    sleeper._record_player_changes({"1": _player("1")}, {"1": _player("1", injury_status="Out")})
+
+    changes, _ = sleeper.get_player_changes(0.0)
+
+    assert sorted(change.guid for change in changes) == ["1", "2"]
+
+
+def test_replaced_map_is_recorded_as_a_reset(memory_cache, clock):
+    sleeper._record_player_changes(None, {"1": _player("1")})
+    since = clock.now
+
+    clock.advance(1)
+    sleeper._record_player_changes({"1": _player("1")}, {"1": _player("1", team="KC")})
+
+    changes, reset = sleeper.get_player_changes(0.0)
+    assert reset == since
+    assert [change.guid for change in changes] == ["1"]
+
+    changes, reset = sleeper.get_player_changes(since)
+    assert reset is None
+    assert [change.at for change in changes] == [clock.now]
+
+
+def test_changes_expire(memory_cache, clock):
+    sleeper._record_player_changes({"1": _player("1")}, {"1": _player("1", team="KC")})
+
+    clock.advance(sleeper.PLAYER_CHANGES_TTL)
+    sleeper._record_player_changes({"2": _player("2")}, {"2": _player("2", team="KC")})
+
+    changes, _ = sleeper.get_player_changes(0.0)
+
+    assert [change.guid for change in changes] == ["2"]
@@ -0,0 +1,103 @@
+import pytest
+
+from sleeperbot import config
+from sleeperbot.clients import rate_limit
+
+
+@pytest.fixture
+def monotonic(monkeypatch, clock):
+    """Frozen time.monotonic that moves with clock"""
+    monkeypatch.setattr("time.monotonic", clock)
+
+    return clock
+
+
+def test_burst_is_free_then_requests_wait_for_tokens(monotonic):
+    bucket = rate_limit.TokenBucket(rate=2.0, capacity=3.0)
+
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+
+    # each further request waits for its token on top of the ones already reserved
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert bucket.acquire() == pytest.approx(1.0)
+
+
+def test_tokens_refill_up_to_capacity(monotonic):
+    bucket = rate_limit.TokenBucket(rate=2.0, capacity=3.0)
+
+    for _ in range(3):
+        bucket.acquire()
+
+    monotonic.advance(1.0)
+    assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.5)
+
+    monotonic.advance(60.0)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+
+
+def test_block_delays_requests_until_retry_after(monotonic):
+    bucket = rate_limit.TokenBucket(rate=2.0, capacity=3.0)
+
+    bucket.block(30.0)
+    assert bucket.acquire() == pytest.approx(30.0)
+
+    # a shorter block never shortens the one already in place
+    bucket.block(5.0)
+    monotonic.advance(10.0)
+    assert bucket.acquire() == pytest.approx(20.0)
+
+    monotonic.advance(20.0)
+    assert bucket.acquire() == 0.0
+
+
+class _Redis:
+    def __init__(self, wait: float = 0.0, fail: bool = False):
+        self.wait, self.fail = wait, fail
+        self.registered = 0
+
+    def register_script(self, script: str):
+        self.registered += 1
+
+        def run(keys, args):
+            if self.fail:
+                raise ConnectionError("redis is down")
+
+            return str(self.wait).encode()
+
+        return run
+
+    def pttl(self, key: str) -> int:
+        raise ConnectionError("redis is down")
+
+
+@pytest.fixture
+def shared(monkeypatch, monotonic):
+    def use(client: _Redis) -> rate_limit.RedisTokenBucket:
+        monkeypatch.setattr(config, "REDIS_HOST", "redis")
+        monkeypatch.setattr(config, "_redis", client, raising=False)
+
+        return rate_limit.RedisTokenBucket(host="api.sleeper.app", rate=2.0, capacity=1.0)
+
+    return use
+
+
+def test_shared_script_is_registered_once(shared):
+    client = _Redis(wait=0.25)
+    bucket = shared(client)
+
+    assert [bucket.acquire() for _ in range(3)] == [0.25, 0.25, 0.25]
+    assert client.registered == 1
+
+
+def test_shared_bucket_falls_back_in_process_when_redis_fails(shared):
+    bucket = shared(_Redis(fail=True))
+    rate_limit.FALLBACKS.reset()
+
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(0.5)
+
+    bucket.block(10.0)
+    assert bucket.acquire() == pytest.approx(10.0)
+
+    assert rate_limit.FALLBACKS.series() == {(("host", "api.sleeper.app"),): 4.0}